@@ -0,0 +1,80 @@
+"""
+Maintenance commands, run against DATABASE_URL:
+
+    python -m app.cli migrate [--list]
+    python -m app.cli compact-balance-history [--retention-days 90]
+    python -m app.cli rebuild-spending-rollups
+    python -m app.cli rebuild-debts
+"""
+import argparse
+from app.database import engine
+from app.middlewares import SessionLocal
+from app.migrations import MIGRATIONS, applied_versions, migrate
+from app.services.balance_history_service import BalanceHistoryService, BALANCE_HISTORY_RETENTION_DAYS
+from app.services.expense_service import ExpenseService
+from app.services.spending_rollup_service import SpendingRollupService
+
+def run_migrations(args):
+    if args.list:
+        with engine.connect() as connection:
+            applied = set(applied_versions(connection))
+            connection.commit()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:04d} {name} {'applied' if version in applied else 'pending'}")
+        return
+    applied = migrate(engine)
+    for version, name in applied:
+        print(f"Applied {version:04d} {name}")
+    if not applied:
+        print("Schema is up to date")
+
+def compact_balance_history(args):
+    db = SessionLocal()
+    try:
+        removed = BalanceHistoryService.compact(db, args.retention_days)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Compacted {removed} balance ledger entries older than {args.retention_days} days")
+
+def rebuild_spending_rollups(args):
+    db = SessionLocal()
+    try:
+        written = SpendingRollupService.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt {written} spending rollups")
+
+def rebuild_debts(args):
+    db = SessionLocal()
+    try:
+        written = ExpenseService.rebuild_debts(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt {written} pairwise debts")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Splitwise maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrations = commands.add_parser("migrate", help="Apply pending schema migrations")
+    migrations.add_argument("--list", action="store_true", help="show each migration and whether it is applied")
+    migrations.set_defaults(handler=run_migrations)
+
+    compact = commands.add_parser("compact-balance-history", help="Fold old balance ledger entries into daily checkpoints")
+    compact.add_argument("--retention-days", type=int, default=BALANCE_HISTORY_RETENTION_DAYS)
+    compact.set_defaults(handler=compact_balance_history)
+
+    rollups = commands.add_parser("rebuild-spending-rollups", help="Regenerate the spending rollups from the expenses and splits")
+    rollups.set_defaults(handler=rebuild_spending_rollups)
+
+    debts = commands.add_parser("rebuild-debts", help="Regenerate the pairwise debts from the open splits")
+    debts.set_defaults(handler=rebuild_debts)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base
 from dotenv import load_dotenv
+from app.utils.metrics import instrument_engine
 
 import os
 
@@ -8,5 +10,59 @@ load_dotenv()
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-engine = create_engine(DATABASE_URL)
+# Opt-in async mode: aiosqlite locally, asyncpg in production
+DB_ASYNC = os.getenv('DB_ASYNC', 'false').lower() in ('1', 'true', 'yes')
+
+# Connection pool, applied to the primary and every replica
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '-1'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'false').lower() in ('1', 'true', 'yes')
+
+# Optional comma-separated read replicas for read-only requests
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv('REPLICA_DATABASE_URLS', '').split(',') if url.strip()]
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+}
+
+def to_async_url(url: str) -> str:
+    """
+    Maps a sync database URL onto its async driver, e.g. postgresql:// -> postgresql+asyncpg://.
+    """
+    scheme, separator, rest = url.partition('://')
+    driver = ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)
+    return f"{driver}{separator}{rest}"
+
+def engine_options(url: str) -> dict:
+    """
+    Pool settings for an engine on url. In-memory SQLite keeps its single-connection pool.
+    """
+    options = {'pool_pre_ping': DB_POOL_PRE_PING, 'pool_recycle': DB_POOL_RECYCLE}
+    parsed = make_url(url)
+    if not (parsed.get_backend_name() == 'sqlite' and parsed.database in (None, '', ':memory:')):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine)
 Base = declarative_base()
+
+replica_engines = [create_engine(url, **engine_options(url)) for url in REPLICA_DATABASE_URLS]
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine)
+
+async_engine = None
+async_replica_engines = []
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or to_async_url(DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(DATABASE_URL))
+    instrument_engine(async_engine.sync_engine)
+    async_replica_engines = [create_async_engine(to_async_url(url), **engine_options(url)) for url in REPLICA_DATABASE_URLS]
+    for replica_engine in async_replica_engines:
+        instrument_engine(replica_engine.sync_engine)
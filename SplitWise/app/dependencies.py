@@ -1,20 +1,39 @@
 # app/dependencies.py
+import time
 from fastapi import Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from app.utils.auth import verify_token
-from app.models.user import User
+from app.schemas import user as user_schema
+from app.utils.auth import oauth2_scheme, principal_cache, verify_token
+from app.services.async_service import AsyncUserService
 
-def get_db(request: Request):
+async def get_db(request: Request):
     """
-    Dependency to get the DB session from the request.
+    Dependency to get the DB session from the request, opening it on first use.
+    This is a sync Session, or an AsyncSession when DB_ASYNC is enabled.
     """
-    return request.state.db
+    return request.state.db.get()
 
-def get_current_user(token_data=Depends(verify_token), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """
     Dependency to get the current authenticated user.
+    Resolved principals are cached per token until the token or cache entry expires.
     """
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if not user:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
+    token_data = verify_token(token)
+    if token_data.user_id is not None:
+        user = await AsyncUserService.get_user_by_id(db, token_data.user_id)
+    else:
+        user = await AsyncUserService.get_user_by_email(db, token_data.email)
+    if not user or user.email != token_data.email:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    return user
+
+    principal = user_schema.User.model_validate(user)
+    ttl = principal_cache.ttl
+    if token_data.expires_at is not None:
+        ttl = min(ttl, token_data.expires_at - time.time())
+    if ttl > 0:
+        principal_cache.set(token, principal, ttl=ttl, tags=[user.id])
+    return principal
@@ -1,7 +1,29 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import core_router,user_router, expense_router
-from app.database import Base, engine
-from app.middlewares import DBSessionMiddleware
+from starlette.concurrency import run_in_threadpool
+from app.routers import core_router,user_router, expense_router, group_router
+from app.database import engine
+from app.middlewares import AdmissionMiddleware, DBSessionMiddleware, MetricsMiddleware
+from app.migrations import setup_schema
+from app.services.balance_journal_service import BALANCE_PROJECTOR
+from app.services.balance_projector import balance_projector
+from app.utils.hashing import password_hasher
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the schema up to date (or check it is) before serving, not at import
+    await run_in_threadpool(setup_schema, engine)
+    # Fold the balance journal into balances in the background while serving
+    if BALANCE_PROJECTOR:
+        balance_projector.start()
+    yield
+    await balance_projector.stop()
+    # Stop the password hashing worker processes instead of leaving them to interpreter exit
+    password_hasher.shutdown()
 
 app = FastAPI(
     title="Splitwise",
@@ -14,16 +36,17 @@ app = FastAPI(
     license_info={
         "name": "MIT License",
         "url": "https://opensource.org/licenses/MIT",
-    }
+    },
+    lifespan=lifespan
 )
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
-
-# Add middleware
+# Add middleware (the last added runs first)
 app.add_middleware(DBSessionMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(core_router)
 app.include_router(user_router)
 app.include_router(expense_router)
+app.include_router(group_router)
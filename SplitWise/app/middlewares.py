@@ -1,43 +1,269 @@
+import itertools
+import json
+import os
 import time
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.orm import sessionmaker
-from app.database import engine
-from fastapi.responses import JSONResponse
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.database import engine, async_engine, replica_engines, async_replica_engines
+from app.utils import metrics
+from app.utils.admission import ADMISSION_EXEMPT_PATHS, AdmissionRejected, admission_controller
+from app.utils.auth import token_subject
+from app.utils.cache import TTLCache
 from fastapi import status
 from traceback import format_exc
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 
-class DBSessionMiddleware(BaseHTTPMiddleware):
+AsyncSessionLocal = None
+if async_engine is not None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# After a write, the user's reads stay on the primary this long so they see their own write
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+# A replica that failed to connect is skipped this long before it is tried again
+REPLICA_RETRY_SECONDS = float(os.getenv('REPLICA_RETRY_SECONDS', '30'))
+
+class SessionRouter:
+    """
+    Picks the session factory for a request. Read-only requests go to the replicas round-robin,
+    skipping replicas that recently failed to connect, unless their user wrote within the
+    read-your-writes window; everything else goes to the primary. Recent writers are tracked
+    per process, so behind a load balancer the window holds for the worker that took the write.
+    """
+    def __init__(self, primary, replicas):
+        self.primary = primary
+        self.replicas = replicas
+        self.recent_writers = TTLCache(ttl=READ_YOUR_WRITES_SECONDS)
+        self._unhealthy_until = {}
+        self._turn = itertools.count()
+        for factory, replica_engine in replicas:
+            event.listen(replica_engine, 'handle_error', self._on_error(factory))
+
+    def factory_for(self, read_only: bool, subject: Optional[str]):
+        if not (read_only and self.replicas) or (subject is not None and self.recent_writers.get(subject)):
+            return self.primary
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            factory, _ = self.replicas[(start + offset) % len(self.replicas)]
+            if not self.is_unavailable(factory):
+                metrics.db_routed_sessions.inc(target='replica')
+                return factory
+        metrics.db_routed_sessions.inc(target='primary_fallback')
+        return self.primary
+
+    def is_unavailable(self, factory) -> bool:
+        return self._unhealthy_until.get(factory, 0) > time.monotonic()
+
+    def record_write(self, subject: Optional[str]):
+        if self.replicas and subject is not None:
+            self.recent_writers.set(subject, True)
+
+    def _on_error(self, factory):
+        def handle_error(context):
+            # Connection failures and dropped connections take the replica out of rotation
+            if context.connection is None or context.is_disconnect:
+                logger.warning("Replica unavailable, routing reads elsewhere for %ss: %s", REPLICA_RETRY_SECONDS, context.original_exception)
+                self._unhealthy_until[factory] = time.monotonic() + REPLICA_RETRY_SECONDS
+        return handle_error
+
+if AsyncSessionLocal is not None:
+    session_router = SessionRouter(AsyncSessionLocal, [
+        (async_sessionmaker(bind=replica, expire_on_commit=False), replica.sync_engine) for replica in async_replica_engines
+    ])
+else:
+    session_router = SessionRouter(SessionLocal, [
+        (sessionmaker(bind=replica, expire_on_commit=False), replica) for replica in replica_engines
+    ])
+
+class LazySession:
+    """
+    Per-request handle that opens the DB session only when get_db first asks for it.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self.session = None
+
+    def get(self):
+        if self.session is None:
+            self.session = self.factory()
+        return self.session
+
+    async def commit(self):
+        await self._call("commit")
+
+    async def rollback(self):
+        await self._call("rollback")
+
+    async def close(self):
+        await self._call("close")
+        self.session = None
+
+    async def _call(self, method: str):
+        if self.session is None:
+            return
+        if isinstance(self.session, Session):
+            await run_in_threadpool(getattr(self.session, method))
+        else:
+            await getattr(self.session, method)()
+
+def request_subject(scope) -> Optional[str]:
+    """
+    The verified token subject of a request, for routing and admission decisions.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            return token_subject(value.decode("latin-1"))
+    return None
+
+class AdmissionMiddleware:
     """
-    Middleware to manage DB sessions and transactions per request.
+    Pure ASGI middleware in front of DBSessionMiddleware that admits requests through the
+    admission controller: at most ADMISSION_MAX_IN_FLIGHT run at once and the next
+    ADMISSION_QUEUE_LIMIT wait up to ADMISSION_QUEUE_TIMEOUT_MS; anything beyond gets a 503,
+    and a user over ADMISSION_PER_USER_LIMIT a 429, both with Retry-After. Requests without a
+    valid token are capped per client address by ADMISSION_ANONYMOUS_LIMIT, when it is set.
     """
-    async def dispatch(self, request: Request, call_next):
-        response = None
+    def __init__(self, app, controller=admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled or scope["path"].startswith(ADMISSION_EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        user = request_subject(scope)
+        client = scope["client"][0] if user is None and scope.get("client") else None
+        try:
+            await self.controller.acquire(user, client)
+        except AdmissionRejected as e:
+            body = json.dumps({"detail": str(e)}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": e.status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"retry-after", b"1")],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            # The slot is held until the response, streamed or not, is fully sent
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(user, client)
+
+class DBSessionMiddleware:
+    """
+    Pure ASGI middleware to manage DB sessions and transactions per request.
+    The session (an AsyncSession when DB_ASYNC is enabled) is only opened if a route
+    resolves get_db, and read-only requests are never committed. Time to response start
+    is reported in the Server-Timing header.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        read_only = scope["method"] in READ_ONLY_METHODS
+        subject = None
+        if session_router.replicas:
+            subject = request_subject(scope)
+        db = LazySession(session_router.factory_for(read_only, subject))
+        scope.setdefault("state", {})["db"] = db
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                # Finish the transaction before the client can observe the result
+                if not read_only:
+                    if 200 <= message["status"] < 400:
+                        await db.commit()
+                        if db.session is not None:
+                            session_router.record_write(subject)
+                    else:
+                        await db.rollback()
+                process_time = (time.perf_counter() - start_time) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f"app;dur={process_time:.2f}".encode()))
+                message = {**message, "headers": headers}
+                response_started = True
+            await send(message)
+
         try:
-            start_time = time.time()
-            request.state.db = SessionLocal()
-            response = await call_next(request)
-            if 200 <= response.status_code < 400:
-                request.state.db.commit()
-            else:
-                request.state.db.rollback()
-            process_time = (time.time() - start_time) * 1000
-            logger.info(f"Request completed in {process_time:.2f} ms")
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except Exception:
+                if not (read_only and not response_started and session_router.is_unavailable(db.factory)):
+                    raise
+                # The replica went away before anything was sent; serve the read from the primary
+                await db.close()
+                db.factory = session_router.primary
+                await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            request.state.db.rollback()
-            logger.error(f"Unhandled error: {str(e)}")
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={"success": False, "error": str(e), "traceback": format_exc()},
-            )
+            await db.rollback()
+            logger.error("Unhandled error: %s", e)
+            if response_started:
+                raise
+            body = json.dumps({"success": False, "error": str(e), "traceback": format_exc()}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
         finally:
-            request.state.db.close()
-        return response
+            await db.close()
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency, status and SQL statement counts.
+    SQL time and statement count are also reported in the Server-Timing header.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        start_time = time.perf_counter()
+        stats = metrics.RequestStats()
+        token = metrics.current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if stats.queries:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", f'db;dur={stats.query_seconds * 1000:.2f};desc="{stats.queries} queries"'.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.current_request_stats.reset(token)
+            route = scope.get("route")
+            metrics.record_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status_code,
+                time.perf_counter() - start_time,
+                stats,
+            )
@@ -0,0 +1,99 @@
+"""
+Versioned schema migrations.
+
+Each migration is a module in this package with an upgrade(connection) function, listed
+in MIGRATIONS in order. Applied versions are recorded in the schema_migrations table, and
+migrate() runs the pending ones in a single transaction. Migrations must be safe to run on
+a database whose tables were created by earlier create_all calls, so they create objects
+with checkfirst rather than assuming they are missing. The baseline (0001) only creates
+missing tables and never alters existing ones, so columns and keys added to tables that
+earlier releases created get explicit steps of their own (0005 expenses.group_id, 0006
+the unique keys of the balance tables), and derived tables are filled from the existing
+rows (0003 search, 0004 rollups, 0007 debts).
+
+SCHEMA_SETUP picks what the application does with the schema on startup: "migrate" applies
+pending migrations, "verify" only refuses to start while any are pending (for fleets where
+a deploy step runs python -m app.cli migrate once) and "skip" does neither.
+"""
+import os
+from datetime import datetime
+from typing import List, Tuple
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from app.migrations import v0001_initial, v0002_hot_path_indexes, v0003_expense_search, v0004_spending_rollups, v0005_expense_group_column, v0006_balance_unique_keys, v0007_debts_backfill
+
+MIGRATIONS = [
+    (1, 'initial', v0001_initial.upgrade),
+    (2, 'hot_path_indexes', v0002_hot_path_indexes.upgrade),
+    (3, 'expense_search', v0003_expense_search.upgrade),
+    (4, 'spending_rollups', v0004_spending_rollups.upgrade),
+    (5, 'expense_group_column', v0005_expense_group_column.upgrade),
+    (6, 'balance_unique_keys', v0006_balance_unique_keys.upgrade),
+    (7, 'debts_backfill', v0007_debts_backfill.upgrade),
+]
+
+# Kept out of Base.metadata so create_all never touches it
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String),
+    Column('applied_at', DateTime, default=datetime.utcnow),
+)
+
+# Serializes concurrent migrate() calls on PostgreSQL
+MIGRATION_LOCK_ID = 7243001
+
+SCHEMA_SETUP = os.getenv('SCHEMA_SETUP', 'migrate')
+SCHEMA_SETUP_MODES = ('migrate', 'verify', 'skip')
+
+def applied_versions(connection: Connection) -> List[int]:
+    schema_migrations.create(connection, checkfirst=True)
+    return list(connection.scalars(select(schema_migrations.c.version).order_by(schema_migrations.c.version)))
+
+def pending_migrations(connection: Connection) -> List[Tuple[int, str]]:
+    applied = set(applied_versions(connection))
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+def unapplied_migrations(engine: Engine) -> List[Tuple[int, str]]:
+    """
+    Like pending_migrations, but read-only: a missing schema_migrations table is not created.
+    """
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(schema_migrations.name):
+            applied = set()
+        else:
+            applied = set(connection.scalars(select(schema_migrations.c.version)))
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+def migrate(engine: Engine) -> List[Tuple[int, str]]:
+    """
+    Applies every pending migration and returns the (version, name) pairs applied.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+        applied = set(applied_versions(connection))
+        done = []
+        for version, name, upgrade in MIGRATIONS:
+            if version in applied:
+                continue
+            upgrade(connection)
+            connection.execute(insert(schema_migrations), [{'version': version, 'name': name}])
+            done.append((version, name))
+    return done
+
+def setup_schema(engine: Engine, mode: str = SCHEMA_SETUP) -> List[Tuple[int, str]]:
+    """
+    Brings the schema to the state SCHEMA_SETUP asks for on startup and returns the
+    migrations applied. Raises RuntimeError in verify mode when migrations are pending.
+    """
+    if mode not in SCHEMA_SETUP_MODES:
+        raise ValueError(f"SCHEMA_SETUP must be one of {', '.join(SCHEMA_SETUP_MODES)}, not {mode!r}")
+    if mode == 'migrate':
+        return migrate(engine)
+    if mode == 'verify':
+        pending = unapplied_migrations(engine)
+        if pending:
+            names = ', '.join(f'{version:04d} {name}' for version, name in pending)
+            raise RuntimeError(f"Schema is behind, pending migrations: {names}. Run python -m app.cli migrate")
+    return []
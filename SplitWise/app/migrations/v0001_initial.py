@@ -0,0 +1,9 @@
+"""
+Baseline: creates every table declared by the models that does not exist yet.
+"""
+from sqlalchemy.engine import Connection
+from app.database import Base
+import app.models  # noqa: F401 - registers the tables on Base.metadata
+
+def upgrade(connection: Connection):
+    Base.metadata.create_all(bind=connection)
@@ -0,0 +1,16 @@
+"""
+Composite indexes for the expense listing, settlement and debt lookups, which scanned
+whole tables before. Balance lookups by (user_id, currency) already use the
+uq_balances_user_currency constraint.
+"""
+from sqlalchemy.engine import Connection
+from app.models import Debt, Expense, ExpenseSplit
+
+INDEXES = ['ix_expense_splits_user_expense', 'ix_expense_splits_expense_settled', 'ix_expenses_created_by', 'ix_debts_other_user']
+
+def upgrade(connection: Connection):
+    # Databases created by 0001 after these were declared on the models already have them
+    for model in (ExpenseSplit, Expense, Debt):
+        for index in model.__table__.indexes:
+            if index.name in INDEXES:
+                index.create(connection, checkfirst=True)
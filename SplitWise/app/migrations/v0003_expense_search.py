@@ -0,0 +1,34 @@
+"""
+Full-text index over expense descriptions for GET /expenses/search (see
+app/models/expense_search.py), filled with the existing expenses in batches.
+"""
+from collections import defaultdict
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.models import Expense, ExpenseSplit
+from app.models.expense_search import create_search_index
+from app.services.search_service import SearchService
+
+BATCH_SIZE = 10000
+
+def upgrade(connection: Connection):
+    create_search_index(connection)
+    if connection.dialect.name not in ('sqlite', 'postgresql'):
+        return
+    db = Session(bind=connection)
+    last_id = 0
+    while True:
+        expenses = db.execute(
+            select(Expense.id, Expense.description).where(Expense.id > last_id).order_by(Expense.id).limit(BATCH_SIZE)
+        ).all()
+        if not expenses:
+            break
+        last_id = expenses[-1].id
+        participants = defaultdict(list)
+        for expense_id, user_id in db.execute(
+            select(ExpenseSplit.expense_id, ExpenseSplit.user_id)
+            .where(ExpenseSplit.expense_id > expenses[0].id - 1, ExpenseSplit.expense_id <= last_id)
+        ):
+            participants[expense_id].append(user_id)
+        SearchService.index_expenses(db, [(expense_id, description, participants[expense_id]) for expense_id, description in expenses])
@@ -0,0 +1,12 @@
+"""
+Spending rollups for GET /expenses/summary (see app/models/spending_rollup.py), filled
+from the existing expenses and splits.
+"""
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.models import SpendingRollup
+from app.services.spending_rollup_service import SpendingRollupService
+
+def upgrade(connection: Connection):
+    SpendingRollup.__table__.create(connection, checkfirst=True)
+    SpendingRollupService.rebuild(Session(bind=connection))
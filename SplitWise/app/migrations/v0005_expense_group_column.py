@@ -0,0 +1,15 @@
+"""
+Adds expenses.group_id and its index to databases whose expenses table predates groups;
+create_all in 0001 never alters a table that already exists.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from app.models import Expense
+
+def upgrade(connection: Connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('expenses')}
+    if 'group_id' not in columns:
+        connection.execute(text('ALTER TABLE expenses ADD COLUMN group_id INTEGER REFERENCES groups (id)'))
+    for index in Expense.__table__.indexes:
+        if index.columns.keys() == ['group_id']:
+            index.create(connection, checkfirst=True)
@@ -0,0 +1,46 @@
+"""
+Unique keys behind the ON CONFLICT upserts of ExpenseService._apply_deltas, for balances,
+debts and group_balances tables created before the keys were declared. Rows duplicated
+under the old read-modify-write updates are first merged into the oldest row of their key.
+SQLite cannot add a constraint to an existing table, so it gets a unique index of the same
+name, which ON CONFLICT accepts just as well.
+"""
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.engine import Connection
+from app.models import Balance, Debt, GroupBalance
+
+def upgrade(connection: Connection):
+    for model in (Balance, Debt, GroupBalance):
+        table = model.__table__.name
+        for constraint in model.__table__.constraints:
+            if not isinstance(constraint, UniqueConstraint):
+                continue
+            columns = constraint.columns.keys()
+            if has_unique_key(connection, table, columns):
+                continue
+            merge_duplicates(connection, table, columns)
+            column_list = ', '.join(columns)
+            if connection.dialect.name == 'postgresql':
+                connection.execute(text(f'ALTER TABLE {table} ADD CONSTRAINT {constraint.name} UNIQUE ({column_list})'))
+            else:
+                connection.execute(text(f'CREATE UNIQUE INDEX {constraint.name} ON {table} ({column_list})'))
+
+def has_unique_key(connection: Connection, table: str, columns) -> bool:
+    inspector = inspect(connection)
+    keys = [key['column_names'] for key in inspector.get_unique_constraints(table)]
+    keys += [index['column_names'] for index in inspector.get_indexes(table) if index['unique']]
+    return any(set(key) == set(columns) for key in keys)
+
+def merge_duplicates(connection: Connection, table: str, columns):
+    # Rows with a NULL key column never conflict, so they are left alone
+    not_null = ' AND '.join(f'{column} IS NOT NULL' for column in columns)
+    same_key = ' AND '.join(f'duplicate.{column} = {table}.{column}' for column in columns)
+    column_list = ', '.join(columns)
+    connection.execute(text(
+        f'UPDATE {table} SET amount = (SELECT SUM(duplicate.amount) FROM {table} AS duplicate WHERE {same_key}) '
+        f'WHERE id IN (SELECT MIN(id) FROM {table} WHERE {not_null} GROUP BY {column_list} HAVING COUNT(*) > 1)'
+    ))
+    connection.execute(text(
+        f'DELETE FROM {table} WHERE {not_null} '
+        f'AND id NOT IN (SELECT MIN(id) FROM {table} WHERE {not_null} GROUP BY {column_list})'
+    ))
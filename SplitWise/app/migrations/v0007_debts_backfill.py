@@ -0,0 +1,12 @@
+"""
+Pairwise debts for GET /expenses/simplified_debts (see app/models/debt.py), filled from
+the open splits written before the debts table was maintained.
+"""
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.models import Debt
+from app.services.expense_service import ExpenseService
+
+def upgrade(connection: Connection):
+    Debt.__table__.create(connection, checkfirst=True)
+    ExpenseService.rebuild_debts(Session(bind=connection))
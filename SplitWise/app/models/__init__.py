@@ -2,7 +2,14 @@ from .user import User
 from .expense import Expense
 from .balance import Balance
 from .expense_split import ExpenseSplit
+from .debt import Debt
+from .balance_history import BalanceEntry, BalanceCheckpoint
+from .group import Group, GroupMember, GroupBalance
+from .balance_journal import BalanceJournalEntry
+from .user_version import UserVersion
+from .spending_rollup import SpendingRollup
+from . import expense_search  # noqa: F401 - creates the search index with the expenses table
 from .enum import SplitTypeEnum
 
 
-__all__ = ['User', 'Expense', 'ExpenseSplit', 'SplitTypeEnum', 'Balance']
\ No newline at end of file
+__all__ = ['User', 'Expense', 'ExpenseSplit', 'SplitTypeEnum', 'Balance', 'Debt', 'BalanceEntry', 'BalanceCheckpoint', 'Group', 'GroupMember', 'GroupBalance', 'BalanceJournalEntry', 'UserVersion', 'SpendingRollup']
\ No newline at end of file
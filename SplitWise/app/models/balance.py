@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -14,3 +14,5 @@ class Balance(Base):
     amount = Column(Float, default=0.0)
 
     user = relationship('User', back_populates='balances')
+
+    __table_args__ = (UniqueConstraint('user_id', 'currency', name='uq_balances_user_currency'),)
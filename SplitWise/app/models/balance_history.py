@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
+from datetime import datetime
+from app.database import Base
+
+class BalanceEntry(Base):
+    """
+    Append-only ledger of balance changes for a user in a specific currency.
+    """
+    __tablename__ = 'balance_entries'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    currency = Column(String)
+    amount = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index('ix_balance_entries_user_currency_id', 'user_id', 'currency', 'id'),)
+
+class BalanceCheckpoint(Base):
+    """
+    Snapshot of a user's balance in a currency after every ledger entry up to entry_id.
+    created_at is the time of that entry; for the anchor written before a user's first entry
+    in a currency, the time of that first entry.
+    """
+    __tablename__ = 'balance_checkpoints'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    currency = Column(String)
+    entry_id = Column(Integer)
+    balance = Column(Float)
+    created_at = Column(DateTime)
+
+    __table_args__ = (Index('ix_balance_checkpoints_user_currency_entry', 'user_id', 'currency', 'entry_id'),)
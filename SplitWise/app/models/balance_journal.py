@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Index
+from datetime import datetime
+from app.database import Base
+
+class BalanceJournalEntry(Base):
+    """
+    Balance change appended by an expense write when BALANCE_PROJECTOR is enabled.
+    Entries with a group_id change the member's GroupBalance, the others their Balance.
+    The id doubles as the version token returned to clients.
+    """
+    __tablename__ = 'balance_journal'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    currency = Column(String)
+    group_id = Column(Integer, ForeignKey('groups.id'), nullable=True)
+    amount = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    projected = Column(Boolean, default=False)
+
+    __table_args__ = (Index('ix_balance_journal_projected_id', 'projected', 'id'),)
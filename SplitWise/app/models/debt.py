@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, UniqueConstraint
+from app.database import Base
+
+class Debt(Base):
+    """
+    Represents the net amount owed between two users in a specific currency.
+    Pairs are stored once with user_id < other_user_id; a positive amount means
+    user_id owes other_user_id, a negative amount the reverse.
+    """
+    __tablename__ = 'debts'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    other_user_id = Column(Integer, ForeignKey('users.id'))
+    currency = Column(String)
+    amount = Column(Float, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'other_user_id', 'currency', name='uq_debts_user_other_user_currency'),
+        # Pairs where the user is the higher id
+        Index('ix_debts_other_user', 'other_user_id'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -17,6 +17,9 @@ class Expense(Base):
     split_type = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_settled = Column(Boolean, default=False)
+    group_id = Column(Integer, ForeignKey('groups.id'), nullable=True, index=True)
 
     creator = relationship('User', back_populates='expenses_created')
     splits = relationship('ExpenseSplit', back_populates='expense')
+
+    __table_args__ = (Index('ix_expenses_created_by', 'expense_created_by'),)
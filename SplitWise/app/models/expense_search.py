@@ -0,0 +1,50 @@
+"""
+Full-text index over expense descriptions, maintained by SearchService. Not an ORM model:
+neither an FTS5 virtual table nor a tsvector column can be declared portably, so the DDL
+runs with the expenses table (create_all, drop_all) and in migration 0003.
+
+The words of each expense are indexed once per split user, each prefixed with the user
+id ("12_rent"). A query then only reads the posting lists of its user, so its cost
+follows the size of their matching history rather than of the whole table:
+
+- SQLite: an FTS5 table whose rowid is the expense id.
+- PostgreSQL: a tsvector of the prefixed words with a GIN index.
+
+Other databases have no index; search falls back to LIKE there.
+"""
+from sqlalchemy import event, text
+from app.models.expense import Expense
+
+CREATE_STATEMENTS = {
+    'sqlite': [
+        # Words arrive lowercased and without diacritics; '_' keeps "12_rent" one token
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS expense_search USING fts5(terms, tokenize = "unicode61 tokenchars '_'")
+        """,
+    ],
+    'postgresql': [
+        """
+        CREATE TABLE IF NOT EXISTS expense_search (
+            expense_id INTEGER PRIMARY KEY REFERENCES expenses (id) ON DELETE CASCADE,
+            terms TSVECTOR NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_expense_search_terms ON expense_search USING gin (terms)",
+    ],
+}
+
+DROP_STATEMENTS = {
+    'sqlite': ["DROP TABLE IF EXISTS expense_search"],
+    'postgresql': ["DROP TABLE IF EXISTS expense_search"],
+}
+
+def create_search_index(connection):
+    for statement in CREATE_STATEMENTS.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+def drop_search_index(connection):
+    for statement in DROP_STATEMENTS.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+event.listen(Expense.__table__, 'after_create', lambda target, connection, **kw: create_search_index(connection))
+event.listen(Expense.__table__, 'before_drop', lambda target, connection, **kw: drop_search_index(connection))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, Float, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -16,3 +16,10 @@ class ExpenseSplit(Base):
 
     expense = relationship('Expense', back_populates='splits')
     user = relationship('User', back_populates='expense_splits')
+
+    __table_args__ = (
+        # A user's expenses, and their open splits for bulk settlement
+        Index('ix_expense_splits_user_expense', 'user_id', 'expense_id'),
+        # An expense's splits, and whether any is still open
+        Index('ix_expense_splits_expense_settled', 'expense_id', 'is_settled'),
+    )
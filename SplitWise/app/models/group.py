@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database import Base
+
+class Group(Base):
+    """
+    Represents a fixed set of users sharing expenses, such as a trip or a flat.
+    """
+    __tablename__ = 'groups'
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    created_by = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    members = relationship('GroupMember', back_populates='group')
+
+class GroupMember(Base):
+    """
+    Represents a user's membership in a group.
+    """
+    __tablename__ = 'group_members'
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey('groups.id'), index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+
+    group = relationship('Group', back_populates='members')
+
+    __table_args__ = (UniqueConstraint('group_id', 'user_id', name='uq_group_members_group_user'),)
+
+class GroupBalance(Base):
+    """
+    Represents a member's net balance from a group's expenses in a specific currency.
+    Maintained incrementally by ExpenseService alongside the user's overall Balance.
+    """
+    __tablename__ = 'group_balances'
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey('groups.id'), index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    currency = Column(String)
+    amount = Column(Float, default=0.0)
+
+    __table_args__ = (UniqueConstraint('group_id', 'user_id', 'currency', name='uq_group_balances_group_user_currency'),)
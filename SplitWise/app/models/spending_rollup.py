@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, UniqueConstraint
+from app.database import Base
+
+class SpendingRollup(Base):
+    """
+    Represents a user's spending in a specific currency over one calendar month (UTC) of
+    expense creation dates, starting on period. Maintained incrementally by ExpenseService.
+    """
+    __tablename__ = 'spending_rollups'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    currency = Column(String)
+    period = Column(Date)
+    # The user's own shares of expenses
+    spent = Column(Float, default=0.0)
+    # Totals of the expenses the user created, and so paid for
+    paid = Column(Float, default=0.0)
+    # The part of spent paid back to the creators of the expenses
+    settled = Column(Float, default=0.0)
+    expense_count = Column(Integer, default=0)
+
+    __table_args__ = (UniqueConstraint('user_id', 'currency', 'period', name='uq_spending_rollups_user_currency_period'),)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from app.database import Base
+
+class UserVersion(Base):
+    """
+    Per-user counter bumped by every write that changes the user's balances or expenses.
+    Used as the ETag for the user's balance and expense listings.
+    """
+    __tablename__ = 'user_versions'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    version = Column(Integer, default=0)
@@ -1,3 +1,4 @@
 from .core_router import core_router
 from .user_router import router as user_router
 from .expense_router import router as expense_router
+from .group_router import router as group_router
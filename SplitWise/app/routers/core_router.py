@@ -1,5 +1,7 @@
 import logging
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import registry
 
 core_router = APIRouter(prefix="/core")
 
@@ -7,3 +9,8 @@ core_router = APIRouter(prefix="/core")
 @core_router.get("/health")
 def health_api():
     return {"success": True, "version": "0.0.1", "message": "Hello From Splitwise!"}
+
+
+@core_router.get("/metrics", response_class=PlainTextResponse)
+def metrics_api():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
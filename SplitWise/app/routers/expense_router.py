@@ -1,62 +1,318 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from app.schemas import expense as expense_schema
+from app.services.async_service import AsyncExpenseService, AsyncSearchService, AsyncSpendingRollupService, commit, rollback, stream_db
 from app.services.expense_service import ExpenseService
+from app.services.balance_projector import BalanceVersionTimeout, balance_projector
 from app.dependencies import get_db, get_current_user
 from app.models.user import User
-from typing import List
+from app.utils import exporters, importers
+from app.utils.json_stream import NDJSON_MEDIA_TYPE, iter_json, wants_ndjson
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE
+from app.utils.response_cache import conditional_response
+from datetime import date, datetime
+from typing import List, Optional
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
+balance_list = TypeAdapter(List[expense_schema.Balance])
+spending_summary_list = TypeAdapter(List[expense_schema.SpendingSummary])
+
+def set_balance_version(response: Response, db):
+    # In projector mode writes return the journal version get_balance can wait for
+    version = db.info.get("balance_version")
+    if version is not None:
+        response.headers["X-Balance-Version"] = str(version)
+
 @router.post("/add_expense", response_model=expense_schema.Expense, summary="Add a new expense")
-def add_expense(
+async def add_expense(
     expense: expense_schema.ExpenseCreate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        new_expense = ExpenseService.create_expense(db, expense, current_user.id)
+        new_expense = await AsyncExpenseService.create_expense(db, expense, current_user.id)
+        set_balance_version(response, db)
         return new_expense
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/update_expense/{expense_id}", response_model=expense_schema.Expense, summary="Update an expense")
-def update_expense(
+async def update_expense(
     expense_id: int,
     expense: expense_schema.ExpenseUpdate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        updated_expense = ExpenseService.update_expense(db, expense_id, expense, current_user.id)
+        updated_expense = await AsyncExpenseService.update_expense(db, expense_id, expense, current_user.id)
+        set_balance_version(response, db)
         return updated_expense
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/get_balance", response_model=List[expense_schema.Balance], summary="Get user balance")
-def get_balance(
+async def get_balance(
+    request: Request,
+    as_of: Optional[datetime] = None,
+    min_version: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Returns the user's balances. Pass a write's X-Balance-Version as min_version to wait
+    until that write is reflected (projector mode only). Responses carry an ETag; send it
+    back in If-None-Match to get a 304 while nothing has changed.
+    """
+    if min_version is not None:
+        try:
+            await balance_projector.wait_for(db, min_version)
+        except BalanceVersionTimeout as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    # Read the version before the data, so a concurrent write can only make the body newer than its ETag
+    version = await AsyncExpenseService.get_user_version(db, current_user.id)
+
+    async def render():
+        balances = await AsyncExpenseService.get_user_balance(db, current_user.id, as_of)
+        return balance_list.dump_json(balance_list.validate_python(balances, from_attributes=True)), {}
+
+    return await conditional_response(request, "get_balance", current_user.id, version, {"as_of": as_of}, render)
+
+@router.get("/simplified_debts", response_model=List[expense_schema.SimplifiedDebt], summary="Get simplified debts")
+async def simplified_debts(
+    currency: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    balances = ExpenseService.get_user_balance(db, current_user.id)
-    return balances
+    return await AsyncExpenseService.get_simplified_debts(db, current_user.id, currency)
 
 @router.post("/settle_expense/{expense_id}", summary="Settle an expense")
-def settle_expense(
+async def settle_expense(
     expense_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        ExpenseService.settle_expense(db, expense_id, current_user.id)
+        await AsyncExpenseService.settle_expense(db, expense_id, current_user.id)
+        set_balance_version(response, db)
         return {"message": "Expense settled successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/settle_all", response_model=expense_schema.SettlementResult, summary="Settle all of the user's open splits")
+async def settle_all(
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    result = await AsyncExpenseService.settle_all_splits(db, current_user.id)
+    set_balance_version(response, db)
+    return result
+
+@router.post("/settle_with_user/{other_user_id}", response_model=expense_schema.SettlementResult, summary="Settle all open splits owed to one user")
+async def settle_with_user(
+    other_user_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    result = await AsyncExpenseService.settle_splits_with_user(db, current_user.id, other_user_id)
+    set_balance_version(response, db)
+    return result
+
+@router.post("/settle_whole_expense/{expense_id}", response_model=expense_schema.SettlementResult, summary="Settle every split of an expense")
+async def settle_whole_expense(
+    expense_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        result = await AsyncExpenseService.settle_whole_expense(db, expense_id, current_user.id)
+        set_balance_version(response, db)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/list_expenses", response_model=List[expense_schema.Expense], summary="List user expenses")
-def list_expenses(
+async def list_expenses(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    currency: Optional[str] = None,
+    is_settled: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lists expenses newest first. When more results exist, the cursor for the next page
+    is returned in the X-Next-Cursor header. Supports If-None-Match like get_balance.
+    The page is streamed as it is read: a JSON array, or NDJSON when the client accepts
+    application/x-ndjson.
+    """
+    version = await AsyncExpenseService.get_user_version(db, current_user.id)
+    ndjson = wants_ndjson(request)
+
+    async def render():
+        try:
+            expense_ids, next_cursor = await AsyncExpenseService.get_user_expense_ids(
+                db, current_user.id, limit, cursor, currency, is_settled, created_after, created_before
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        async def batches():
+            for start in range(0, len(expense_ids), STREAM_BATCH_SIZE):
+                yield await AsyncExpenseService.get_expense_rows(db, expense_ids[start:start + STREAM_BATCH_SIZE])
+
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return iter_json(batches(), ndjson), headers
+
+    params = {"limit": limit, "cursor": cursor, "currency": currency, "is_settled": is_settled,
+              "created_after": created_after, "created_before": created_before, "ndjson": ndjson or None}
+    return await conditional_response(request, "list_expenses", current_user.id, version, params, render,
+                                      media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json")
+
+@router.get("/search", response_model=List[expense_schema.Expense], summary="Search the user's expenses by description")
+async def search_expenses(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Full-text search over the descriptions of expenses the user has a split in, best match
+    first. Every word must match, the last one also as a prefix ("uber mar" finds "Uber
+    March"). Paginated and streamed like list_expenses, except that relevance scores shift
+    with every write to the index, so a row can repeat or be missed across pages.
+    """
+    try:
+        expense_ids, next_cursor = await AsyncSearchService.search_expense_ids(db, current_user.id, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ndjson = wants_ndjson(request)
+
+    async def batches():
+        for start in range(0, len(expense_ids), STREAM_BATCH_SIZE):
+            yield await AsyncExpenseService.get_expense_rows(db, expense_ids[start:start + STREAM_BATCH_SIZE])
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return StreamingResponse(iter_json(batches(), ndjson), headers=headers,
+                             media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json")
+
+@router.get("/summary", response_model=List[expense_schema.SpendingSummary], summary="Get the user's spending per month or year")
+async def spending_summary(
+    request: Request,
+    granularity: str = Query("month", pattern="^(month|year)$"),
+    currency: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    expenses = ExpenseService.get_user_expenses(db, current_user.id)
-    return expenses
+    """
+    Returns, per period and currency, the user's shares of expenses (spent), the totals of
+    the expenses they created (paid), the part of their shares paid back to the creators
+    (settled) and how many expenses they had a share in. Periods are calendar months (UTC)
+    of the expenses' creation dates; start and end select the months they fall in. Read from
+    the spending rollups, so the cost follows the number of periods, not the user's history.
+    Carries an ETag like get_balance.
+    """
+    version = await AsyncExpenseService.get_user_version(db, current_user.id)
+    params = {"granularity": granularity, "currency": currency, "start": start, "end": end}
+
+    async def render():
+        summary = await AsyncSpendingRollupService.get_summary(db, current_user.id, granularity, currency, start, end)
+        return spending_summary_list.dump_json(spending_summary_list.validate_python(summary)), {}
+
+    return await conditional_response(request, "spending_summary", current_user.id, version, params, render)
+
+@router.get("/export", summary="Export the user's full expense history as NDJSON or CSV")
+async def export_expenses(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams every expense involving the user with all of its splits, oldest first: NDJSON
+    with one expense per line, or CSV with one line per split. Rows are read from a
+    server-side cursor EXPORT_BATCH_SIZE at a time, so memory stays flat however long the
+    history is. With gzip=true the stream is compressed on the fly.
+    """
+    batches = stream_db(db, ExpenseService.user_export_query(current_user.id), exporters.EXPORT_BATCH_SIZE)
+    if format == "csv":
+        body, media_type, filename = exporters.iter_csv(batches), "text/csv", "expenses.csv"
+    else:
+        body, media_type, filename = exporters.iter_ndjson(batches), NDJSON_MEDIA_TYPE, "expenses.ndjson"
+    if gzip:
+        body, media_type, filename = exporters.gzip_chunks(body), "application/gzip", filename + ".gz"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@router.post("/import_expenses", response_model=expense_schema.ImportResult, summary="Bulk import expenses from NDJSON or CSV")
+async def import_expenses(
+    request: Request,
+    response: Response,
+    chunk_size: int = Query(importers.IMPORT_CHUNK_SIZE, ge=1, le=50000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams the request body line by line (CSV when the content type is text/csv, NDJSON otherwise)
+    and commits every `chunk_size` valid rows. Rows that fail are reported, the rest are imported.
+    A line that is not UTF-8 or longer than IMPORT_MAX_LINE_BYTES stops the import with a 400.
+    """
+    is_csv = request.headers.get("content-type", "").startswith("text/csv")
+    header = None
+    chunk = []
+    imported = 0
+    errors = []
+
+    async def flush_chunk():
+        nonlocal imported
+        try:
+            chunk_errors = await AsyncExpenseService.import_expenses(db, chunk, current_user.id)
+            await commit(db)
+        except SQLAlchemyError as e:
+            await rollback(db)
+            chunk_errors = [{"row": row_number, "error": str(e)} for row_number, _ in chunk]
+        imported += len(chunk) - len(chunk_errors)
+        errors.extend(chunk_errors)
+        chunk.clear()
+
+    row_number = 0
+    try:
+        async for line in importers.iter_lines(request.stream()):
+            if is_csv and header is None:
+                try:
+                    header = importers.parse_csv_header(line)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                continue
+            row_number += 1
+            try:
+                row = importers.parse_csv_row(line, header) if is_csv else importers.parse_ndjson_row(line)
+                chunk.append((row_number, expense_schema.ExpenseCreate(**row)))
+            except (ValueError, ValidationError) as e:
+                errors.append({"row": row_number, "error": str(e)})
+            if len(chunk) >= chunk_size:
+                await flush_chunk()
+    except importers.ImportFormatError as e:
+        # Chunks already committed stay imported
+        raise HTTPException(status_code=400, detail=str(e))
+    if chunk:
+        await flush_chunk()
+
+    errors.sort(key=lambda error: error["row"])
+    set_balance_version(response, db)
+    return {"imported": imported, "failed": len(errors), "errors": errors}
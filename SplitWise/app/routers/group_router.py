@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.schemas import group as group_schema
+from app.services.async_service import AsyncGroupService
+from app.dependencies import get_db, get_current_user
+from app.models.user import User
+
+router = APIRouter(prefix="/groups", tags=["groups"])
+
+@router.post("/create_group", response_model=group_schema.Group, summary="Create a group")
+async def create_group(
+    group: group_schema.GroupCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        return await AsyncGroupService.create_group(db, group, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{group_id}/add_members", response_model=group_schema.Group, summary="Add members to a group")
+async def add_members(
+    group_id: int,
+    members: group_schema.GroupMembersAdd,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        return await AsyncGroupService.add_members(db, group_id, members.member_ids, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{group_id}/summary", response_model=group_schema.GroupSummary, summary="Get group balance summary")
+async def get_group_summary(
+    group_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        return await AsyncGroupService.get_group_summary(db, group_id, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,3 +1,4 @@
 from .user import UserCreate, User, Token, TokenData
-from .expense import ExpenseCreate, ExpenseUpdate, Expense
+from .expense import ExpenseCreate, ExpenseUpdate, Expense, ImportResult, SimplifiedDebt
+from .group import GroupCreate, Group, GroupSummary
 from .enums import SplitTypeEnum
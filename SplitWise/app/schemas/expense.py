@@ -1,5 +1,5 @@
 from pydantic import BaseModel, model_validator
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 from .enums import SplitTypeEnum
 
@@ -8,6 +8,7 @@ class ExpenseBase(BaseModel):
     currency: str
     amount: float
     split_type: SplitTypeEnum
+    group_id: Optional[int] = None
 
 class ExpenseSplitBase(BaseModel):
     user_id: int
@@ -69,3 +70,30 @@ class Balance(BaseModel):
 
     class Config:
         from_attributes = True
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+
+class SettlementResult(BaseModel):
+    settled_splits: int
+    settled_expenses: int
+
+class SimplifiedDebt(BaseModel):
+    from_user_id: int
+    to_user_id: int
+    currency: str
+    amount: float
+
+class SpendingSummary(BaseModel):
+    period: date
+    currency: str
+    spent: float
+    paid: float
+    settled: float
+    expense_count: int
@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+class GroupBase(BaseModel):
+    name: str
+
+class GroupCreate(GroupBase):
+    member_ids: List[int] = []
+
+class GroupMembersAdd(BaseModel):
+    member_ids: List[int]
+
+class Group(GroupBase):
+    id: int
+    created_by: int
+    created_at: datetime
+    member_ids: List[int]
+
+class GroupMemberBalance(BaseModel):
+    user_id: int
+    currency: str
+    amount: float
+
+    class Config:
+        from_attributes = True
+
+class GroupSummary(BaseModel):
+    group_id: int
+    name: str
+    member_ids: List[int]
+    balances: List[GroupMemberBalance]
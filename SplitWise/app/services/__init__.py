@@ -1,2 +1,7 @@
 from .user_service import UserService
 from .expense_service import ExpenseService
+from .group_service import GroupService
+from .balance_journal_service import BalanceJournalService
+from .search_service import SearchService
+from .spending_rollup_service import SpendingRollupService
+from .async_service import AsyncExpenseService, AsyncGroupService, AsyncSearchService, AsyncSpendingRollupService, AsyncUserService, run_db
@@ -0,0 +1,81 @@
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.services.expense_service import ExpenseService
+from app.services.group_service import GroupService
+from app.services.search_service import SearchService
+from app.services.spending_rollup_service import SpendingRollupService
+from app.services.user_service import UserService
+from app.utils.hashing import password_hasher
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Runs sync ORM code against the request session without blocking the event loop.
+    Async sessions run it on their own connection via run_sync, sync sessions on the threadpool.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await db.run_sync(fn, *args, **kwargs)
+
+async def stream_db(db, statement, batch_size: int):
+    """
+    Yields the statement's rows in batches of batch_size from a server-side cursor, so only
+    one batch is held in memory. Sync sessions fetch each batch on the threadpool.
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    if isinstance(db, Session):
+        partitions = (await run_in_threadpool(db.execute, statement)).partitions()
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+    else:
+        result = await db.stream(statement)
+        async for rows in result.partitions():
+            yield rows
+
+async def commit(db):
+    await run_db(db, Session.commit)
+
+async def rollback(db):
+    await run_db(db, Session.rollback)
+
+class AsyncServiceProxy:
+    """
+    Exposes every static method of a service as a coroutine taking a sync or async session.
+    """
+    def __init__(self, service):
+        self._service = service
+
+    def __getattr__(self, name):
+        method = getattr(self._service, name)
+
+        async def call(db, *args, **kwargs):
+            return await run_db(db, method, *args, **kwargs)
+        return call
+
+class AsyncUserServiceProxy(AsyncServiceProxy):
+    """
+    Adds the password flows, which hash in the process pool before touching the session.
+    """
+    async def create_user(self, db, user):
+        hashed_password = await password_hasher.hash(user.password)
+        return await run_db(db, UserService.create_user, user, hashed_password)
+
+    async def authenticate_user(self, db, email: str, password: str):
+        user = await run_db(db, UserService.get_user_by_email, email)
+        if not user:
+            return False
+        valid, new_hash = await password_hasher.verify(password, user.password)
+        if not valid:
+            return False
+        if new_hash:
+            # Work factor changed since this hash was made; upgrade it transparently
+            await run_db(db, UserService.update_password_hash, user, new_hash)
+        return user
+
+AsyncExpenseService = AsyncServiceProxy(ExpenseService)
+AsyncUserService = AsyncUserServiceProxy(UserService)
+AsyncGroupService = AsyncServiceProxy(GroupService)
+AsyncSearchService = AsyncServiceProxy(SearchService)
+AsyncSpendingRollupService = AsyncServiceProxy(SpendingRollupService)
@@ -0,0 +1,183 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from sqlalchemy import and_, case, func, insert, select, tuple_
+from sqlalchemy.orm import Session
+from app.models.balance import Balance
+from app.models.balance_history import BalanceEntry, BalanceCheckpoint
+
+BALANCE_CHECKPOINT_INTERVAL = int(os.getenv('BALANCE_CHECKPOINT_INTERVAL', '100'))
+BALANCE_HISTORY_RETENTION_DAYS = int(os.getenv('BALANCE_HISTORY_RETENTION_DAYS', '90'))
+
+class BalanceHistoryService:
+    """
+    Service for the balance ledger: every balance change is appended as an entry, and a
+    checkpoint is written every BALANCE_CHECKPOINT_INTERVAL entries per (user, currency),
+    so a point-in-time balance is one checkpoint plus at most that many entries. The first
+    entry of a (user, currency) is preceded by a checkpoint of the balance it had then.
+    """
+
+    @staticmethod
+    def record(db: Session, deltas: Dict[Tuple[int, str], float]):
+        """
+        Appends balance deltas to the ledger; call after the Balance rows have been updated and flushed.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        now = datetime.utcnow()
+        db.execute(insert(BalanceEntry), [
+            {"user_id": user_id, "currency": currency, "amount": delta, "created_at": now}
+            for (user_id, currency), delta in deltas.items()
+        ])
+
+        # One query finds, per key, its last checkpoint and the entries since then
+        keys = list(deltas)
+        # The plain user_id IN lets SQLite search the (user_id, currency, ...) indexes; it
+        # does not use them for row-value IN lists
+        user_ids = sorted({user_id for user_id, _ in keys})
+        last_checkpoint = select(
+            BalanceCheckpoint.user_id, BalanceCheckpoint.currency, func.max(BalanceCheckpoint.entry_id).label("entry_id")
+        ).where(
+            BalanceCheckpoint.user_id.in_(user_ids),
+            tuple_(BalanceCheckpoint.user_id, BalanceCheckpoint.currency).in_(keys),
+        ).group_by(BalanceCheckpoint.user_id, BalanceCheckpoint.currency).subquery()
+        rows = db.execute(
+            select(
+                BalanceEntry.user_id, BalanceEntry.currency, func.max(BalanceEntry.id), func.count(),
+                func.max(last_checkpoint.c.entry_id),
+            )
+            .outerjoin(last_checkpoint, and_(
+                last_checkpoint.c.user_id == BalanceEntry.user_id, last_checkpoint.c.currency == BalanceEntry.currency
+            ))
+            .where(
+                BalanceEntry.user_id.in_(user_ids),
+                tuple_(BalanceEntry.user_id, BalanceEntry.currency).in_(keys),
+                BalanceEntry.id > func.coalesce(last_checkpoint.c.entry_id, 0),
+            )
+            .group_by(BalanceEntry.user_id, BalanceEntry.currency)
+        ).all()
+
+        # A key recorded for the first time is anchored just before its new entry with the balance
+        # it had then, so balances that predate the ledger are not replayed from zero. Each key has
+        # exactly one new entry, the last one. Keys with a full interval of entries get a checkpoint.
+        anchors = {}
+        due = {}
+        for user_id, currency, entry_id, count, checkpoint_id in rows:
+            if checkpoint_id is None:
+                anchors[(user_id, currency)] = entry_id - 1
+            elif count >= BALANCE_CHECKPOINT_INTERVAL:
+                due[(user_id, currency)] = entry_id
+        if not anchors and not due:
+            return
+
+        balances = db.query(Balance.user_id, Balance.currency, Balance.amount).filter(
+            tuple_(Balance.user_id, Balance.currency).in_([*anchors, *due])
+        )
+        checkpoints = []
+        for user_id, currency, amount in balances:
+            key = (user_id, currency)
+            if key in anchors:
+                checkpoints.append({"user_id": user_id, "currency": currency, "entry_id": anchors[key], "balance": amount - deltas[key], "created_at": now})
+            else:
+                checkpoints.append({"user_id": user_id, "currency": currency, "entry_id": due[key], "balance": amount, "created_at": now})
+        db.execute(insert(BalanceCheckpoint), checkpoints)
+
+    @staticmethod
+    def get_balances_as_of(db: Session, user_id: int, as_of: datetime) -> List[Dict]:
+        """
+        Returns the user's balance in every currency as it was at as_of.
+        """
+        if as_of.tzinfo is not None:
+            as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+
+        # The last checkpoint at or before as_of and the first one after it bound the entries to scan
+        bounds = select(
+            BalanceCheckpoint.currency,
+            func.max(case((BalanceCheckpoint.created_at <= as_of, BalanceCheckpoint.entry_id))).label("after"),
+            func.min(case((BalanceCheckpoint.created_at > as_of, BalanceCheckpoint.entry_id))).label("before"),
+        ).where(BalanceCheckpoint.user_id == user_id).group_by(BalanceCheckpoint.currency).subquery()
+
+        amounts = {
+            currency: balance
+            for currency, balance in db.execute(
+                select(BalanceCheckpoint.currency, BalanceCheckpoint.balance)
+                .join(bounds, and_(bounds.c.currency == BalanceCheckpoint.currency, bounds.c.after == BalanceCheckpoint.entry_id))
+                .where(BalanceCheckpoint.user_id == user_id)
+            )
+        }
+        deltas = db.execute(
+            select(BalanceEntry.currency, func.sum(BalanceEntry.amount))
+            .outerjoin(bounds, bounds.c.currency == BalanceEntry.currency)
+            .where(
+                BalanceEntry.user_id == user_id,
+                BalanceEntry.created_at <= as_of,
+                BalanceEntry.id > func.coalesce(bounds.c.after, 0),
+                (bounds.c.before == None) | (BalanceEntry.id <= bounds.c.before),
+            )
+            .group_by(BalanceEntry.currency)
+        )
+        for currency, delta in deltas:
+            amounts[currency] = amounts.get(currency, 0.0) + delta
+
+        balances = db.query(Balance).filter(Balance.user_id == user_id, Balance.currency.in_(list(amounts)))
+        return [
+            {"id": balance.id, "user_id": user_id, "currency": balance.currency, "amount": round(amounts[balance.currency], 10)}
+            for balance in balances
+        ]
+
+    @staticmethod
+    def compact(db: Session, retention_days: int = BALANCE_HISTORY_RETENTION_DAYS) -> int:
+        """
+        Folds ledger entries older than retention_days into one checkpoint per day and deletes them,
+        so the ledger only holds recent entries. Point-in-time queries into the compacted range
+        resolve to the end of the previous active day. Returns the number of entries removed.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        keys = db.execute(
+            select(BalanceEntry.user_id, BalanceEntry.currency).where(BalanceEntry.created_at < cutoff).distinct()
+        ).all()
+
+        removed = 0
+        for user_id, currency in keys:
+            key_filter = (BalanceEntry.user_id == user_id, BalanceEntry.currency == currency)
+            checkpoint_filter = (BalanceCheckpoint.user_id == user_id, BalanceCheckpoint.currency == currency)
+            entries = db.execute(
+                select(BalanceEntry.id, BalanceEntry.amount, BalanceEntry.created_at)
+                .where(*key_filter, BalanceEntry.created_at < cutoff)
+                .order_by(BalanceEntry.id)
+            ).all()
+            first_id, last_id = entries[0].id, entries[-1].id
+
+            # Replay from the checkpoint preceding the range, re-anchoring at checkpoints inside it,
+            # exactly as get_balances_as_of would have
+            base = db.execute(
+                select(BalanceCheckpoint.balance).where(*checkpoint_filter, BalanceCheckpoint.entry_id < first_id)
+                .order_by(BalanceCheckpoint.entry_id.desc()).limit(1)
+            ).scalar()
+            anchors = dict(db.execute(
+                select(BalanceCheckpoint.entry_id, BalanceCheckpoint.balance)
+                .where(*checkpoint_filter, BalanceCheckpoint.entry_id.between(first_id, last_id))
+            ).all())
+
+            running = base or 0.0
+            day_ends = []
+            for index, entry in enumerate(entries):
+                running = anchors.get(entry.id, running + entry.amount)
+                is_last = index == len(entries) - 1
+                if is_last or entries[index + 1].created_at.date() != entry.created_at.date():
+                    day_ends.append({
+                        "user_id": user_id,
+                        "currency": currency,
+                        "entry_id": entry.id,
+                        "balance": running,
+                        "created_at": entry.created_at,
+                    })
+
+            db.query(BalanceCheckpoint).filter(
+                *checkpoint_filter, BalanceCheckpoint.entry_id.between(first_id, last_id)
+            ).delete(synchronize_session=False)
+            db.execute(insert(BalanceCheckpoint), day_ends)
+            db.query(BalanceEntry).filter(*key_filter, BalanceEntry.id <= last_id).delete(synchronize_session=False)
+            removed += len(entries)
+        return removed
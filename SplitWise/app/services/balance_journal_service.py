@@ -0,0 +1,39 @@
+import os
+from typing import Dict, Tuple
+from sqlalchemy import exists, func, insert, select
+from sqlalchemy.orm import Session
+from app.models.balance_journal import BalanceJournalEntry
+
+# Opt-in: expense writes only append to the journal and the projector updates balances
+BALANCE_PROJECTOR = os.getenv('BALANCE_PROJECTOR', 'false').lower() in ('1', 'true', 'yes')
+
+class BalanceJournalService:
+    """
+    Service for the balance journal written by expense operations in projector mode.
+    """
+
+    @staticmethod
+    def append(db: Session, deltas: Dict[Tuple[int, str], float] = None, group_deltas: Dict[Tuple[int, int, str], float] = None):
+        """
+        Appends balance and group balance deltas in one insert and records the resulting
+        version token in db.info["balance_version"].
+        """
+        rows = [
+            {"user_id": user_id, "currency": currency, "group_id": None, "amount": delta}
+            for (user_id, currency), delta in (deltas or {}).items() if delta
+        ] + [
+            {"user_id": user_id, "currency": currency, "group_id": group_id, "amount": delta}
+            for (group_id, user_id, currency), delta in (group_deltas or {}).items() if delta
+        ]
+        if not rows:
+            return
+        db.execute(insert(BalanceJournalEntry), rows)
+        # Highest id visible to this transaction; at least as new as the rows just written
+        db.info["balance_version"] = db.scalar(select(func.max(BalanceJournalEntry.id)))
+
+    @staticmethod
+    def is_projected(db: Session, version: int) -> bool:
+        """
+        True once every committed journal entry up to version has been folded into the balances.
+        """
+        return not db.scalar(select(exists().where(BalanceJournalEntry.projected == False, BalanceJournalEntry.id <= version)))
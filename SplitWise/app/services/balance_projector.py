@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.database import engine
+from app.services.async_service import run_db
+from app.services.balance_journal_service import BalanceJournalService
+from app.services.expense_service import ExpenseService
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+PROJECTOR_BATCH_SIZE = int(os.getenv('PROJECTOR_BATCH_SIZE', '5000'))
+PROJECTOR_INTERVAL_MS = float(os.getenv('PROJECTOR_INTERVAL_MS', '50'))
+BALANCE_WAIT_TIMEOUT_SECONDS = float(os.getenv('BALANCE_WAIT_TIMEOUT_SECONDS', '5'))
+
+class BalanceVersionTimeout(Exception):
+    """
+    Raised when the requested balance version was not projected within the wait timeout.
+    """
+
+class BalanceProjector:
+    """
+    Background task folding the balance journal into balances in coalesced batches.
+    Every worker process may run one; batches are claimed with FOR UPDATE SKIP LOCKED,
+    so they never project the same entry twice.
+    """
+    def __init__(self, batch_size: int = PROJECTOR_BATCH_SIZE, interval_ms: float = PROJECTOR_INTERVAL_MS):
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self._session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_for(self, db, version: int, timeout: float = BALANCE_WAIT_TIMEOUT_SECONDS):
+        """
+        Waits until every journal entry up to version is reflected in the balances.
+        """
+        deadline = time.monotonic() + timeout
+        while not await run_db(db, BalanceJournalService.is_projected, version):
+            if time.monotonic() >= deadline:
+                raise BalanceVersionTimeout("Balance version not projected yet, retry shortly")
+            if self._wake is not None:
+                self._wake.set()
+            await asyncio.sleep(self.interval)
+
+    async def _run(self):
+        while True:
+            try:
+                projected = await run_in_threadpool(self.project_once)
+            except Exception:
+                logger.exception("Balance projection failed")
+                projected = 0
+            # A full batch means there is a backlog, keep going without sleeping
+            if projected < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    def project_once(self) -> int:
+        start = time.perf_counter()
+        db = self._session_factory()
+        try:
+            projected = ExpenseService.project_journal(db, self.batch_size)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if projected:
+            metrics.projector_entries.inc(projected)
+            metrics.projector_batch_size.observe(projected)
+            metrics.projector_batch_seconds.observe(time.perf_counter() - start)
+        return projected
+
+balance_projector = BalanceProjector()
@@ -1,10 +1,29 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, exists, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from app.models.expense import Expense
 from app.models.expense_split import ExpenseSplit
 from app.models.user import User
 from app.models.balance import Balance
+from app.models.debt import Debt
+from app.models.group import GroupBalance, GroupMember
+from app.models.user_version import UserVersion
+from app.models.spending_rollup import SpendingRollup
 from app.schemas.expense import ExpenseCreate, ExpenseUpdate
-from app.utils.split_strategies import SplitStrategyFactory
+from app.services.balance_history_service import BalanceHistoryService
+from app.services.balance_journal_service import BALANCE_PROJECTOR, BalanceJournalService
+from app.services.search_service import SearchService
+from app.services.spending_rollup_service import SpendingRollupService, rollup_deltas, rollup_period
+from app.models.balance_journal import BalanceJournalEntry
+from app.utils.split_strategies import SplitStrategyFactory, minor_unit_exponent, to_minor
+from app.utils.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+from app.utils.debts import EPSILON, mark_debts_changed, simplify_debts, simplified_debt_cache
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {"postgresql": postgresql, "sqlite": sqlite}
 
 class ExpenseService:
     """
@@ -13,23 +32,14 @@ class ExpenseService:
 
     @staticmethod
     def create_expense(db: Session, expense_data: ExpenseCreate, user_id: int):
-        # Get the appropriate strategy for splitting the expense
-        strategy = SplitStrategyFactory.get_strategy(expense_data.split_type)
-
         # Validate user IDs
         user_ids = [split.user_id for split in expense_data.splits]
-        users = db.query(User).filter(User.id.in_(user_ids)).all()
+        users = db.query(User.id).filter(User.id.in_(user_ids)).all()
         if len(users) != len(user_ids):
             raise ValueError("One or more users not found")
+        ExpenseService._validate_group(db, expense_data.group_id, [user_id, *user_ids])
 
-        # Prepare split information
-        splits_info = {split.user_id: split.amount_owed for split in expense_data.splits if split.amount_owed is not None}
-        splits = strategy.calculate_splits(expense_data.amount, user_ids, splits_info)
-
-        # Validate total split amount
-        total_split_amount = sum(splits.values())
-        if abs(total_split_amount - expense_data.amount) > 0.01:
-            raise ValueError("Splits do not sum up to total amount")
+        splits = ExpenseService._calculate_splits(expense_data)
 
         # Create expense
         expense = Expense(
@@ -37,32 +47,28 @@ class ExpenseService:
             currency=expense_data.currency,
             amount=expense_data.amount,
             expense_created_by=user_id,
-            split_type=expense_data.split_type.value
+            split_type=expense_data.split_type.value,
+            group_id=expense_data.group_id
         )
         db.add(expense)
         db.flush()
-        db.refresh(expense)
-
-        # Update balances and create splits
-        for user_id, amount_owed in splits.items():
-            expense_split = ExpenseSplit(
-                expense_id=expense.id,
-                user_id=user_id,
-                amount_owed=amount_owed,
-                is_settled=False
-            )
-            db.add(expense_split)
-
-            # Update balances
-            balance = db.query(Balance).filter(Balance.user_id == user_id, Balance.currency == expense_data.currency).first()
-            if not balance:
-                balance = Balance(user_id=user_id, currency=expense_data.currency, amount=0.0)
-                db.add(balance)
-            if user_id == expense.expense_created_by:
-                # The creator of the expense
-                balance.amount += expense_data.amount - amount_owed
-            else:
-                balance.amount -= amount_owed
+
+        # Create splits and update balances in one pass each
+        deltas = defaultdict(float)
+        debt_deltas = defaultdict(float)
+        group_deltas = defaultdict(float)
+        ExpenseService._add_split_deltas(deltas, user_id, expense.currency, expense.amount, splits)
+        ExpenseService._add_debt_deltas(debt_deltas, user_id, expense.currency, splits)
+        ExpenseService._add_group_deltas(group_deltas, expense.group_id, user_id, expense.currency, expense.amount, splits)
+        spending_deltas = rollup_deltas()
+        SpendingRollupService.add_expense_deltas(spending_deltas, user_id, expense.currency, rollup_period(expense.created_at), expense.amount, splits)
+        ExpenseService._insert_splits(db, expense, splits)
+        ExpenseService._apply_balance_deltas(db, deltas)
+        ExpenseService._apply_debt_deltas(db, debt_deltas)
+        ExpenseService._apply_group_deltas(db, group_deltas)
+        ExpenseService._apply_spending_deltas(db, spending_deltas)
+        ExpenseService._touch_users(db, [user_id, *splits])
+        SearchService.index_expenses(db, [(expense.id, expense.description, splits)])
 
         # No commit here; middleware will handle it
         return expense
@@ -74,89 +80,644 @@ class ExpenseService:
         if not expense:
             raise ValueError("Expense not found or not authorized")
 
-        # Reverse previous balances
-        old_splits = db.query(ExpenseSplit).filter(ExpenseSplit.expense_id == expense_id).all()
+        # Recalculate splits
+        ExpenseService._validate_group(db, expense_data.group_id, [user_id, *(split.user_id for split in expense_data.splits)])
+        splits = ExpenseService._calculate_splits(expense_data)
+
+        # Reverse previous balances, and the settlements of the old splits, before the expense changes
+        old_splits = db.query(ExpenseSplit.user_id, ExpenseSplit.amount_owed, ExpenseSplit.is_settled).filter(ExpenseSplit.expense_id == expense_id).all()
+        old_shares = {split.user_id: split.amount_owed for split in old_splits}
+        deltas = defaultdict(float)
+        debt_deltas = defaultdict(float)
+        group_deltas = defaultdict(float)
+        # The expense stays in the month it was created in, under its old currency until now
+        period = rollup_period(expense.created_at)
+        spending_deltas = rollup_deltas()
+        ExpenseService._add_split_deltas(deltas, user_id, expense.currency, expense.amount, old_shares, sign=-1)
+        ExpenseService._add_group_deltas(group_deltas, expense.group_id, user_id, expense.currency, expense.amount, old_shares, sign=-1)
+        ExpenseService._add_debt_deltas(debt_deltas, user_id, expense.currency, old_shares, sign=-1)
+        SpendingRollupService.add_expense_deltas(spending_deltas, user_id, expense.currency, period, expense.amount, old_shares, sign=-1)
         for split in old_splits:
-            balance = db.query(Balance).filter(Balance.user_id == split.user_id, Balance.currency == expense.currency).first()
-            if split.user_id == expense.expense_created_by:
-                balance.amount -= expense.amount - split.amount_owed
-            else:
-                balance.amount += split.amount_owed
+            if split.is_settled:
+                ExpenseService._add_settlement_deltas(deltas, debt_deltas, group_deltas, spending_deltas, expense, split.user_id, split.amount_owed, sign=-1)
 
         # Delete old splits
-        db.query(ExpenseSplit).filter(ExpenseSplit.expense_id == expense_id).delete()
-        db.flush()
+        db.query(ExpenseSplit).filter(ExpenseSplit.expense_id == expense_id).delete(synchronize_session=False)
 
         # Update expense
         expense.description = expense_data.description
         expense.currency = expense_data.currency
         expense.amount = expense_data.amount
         expense.split_type = expense_data.split_type.value
+        expense.group_id = expense_data.group_id
         expense.is_settled = False
 
-        # Recalculate splits
-        strategy = SplitStrategyFactory.get_strategy(expense_data.split_type)
-        user_ids = [split.user_id for split in expense_data.splits]
-        splits_info = {split.user_id: split.amount_owed for split in expense_data.splits if split.amount_owed is not None}
-        splits = strategy.calculate_splits(expense_data.amount, user_ids, splits_info)
+        # Create new splits and apply the net balance change
+        ExpenseService._add_split_deltas(deltas, user_id, expense.currency, expense.amount, splits)
+        ExpenseService._add_debt_deltas(debt_deltas, user_id, expense.currency, splits)
+        ExpenseService._add_group_deltas(group_deltas, expense.group_id, user_id, expense.currency, expense.amount, splits)
+        SpendingRollupService.add_expense_deltas(spending_deltas, user_id, expense.currency, period, expense.amount, splits)
+        ExpenseService._insert_splits(db, expense, splits)
+        ExpenseService._apply_balance_deltas(db, deltas)
+        ExpenseService._apply_debt_deltas(db, debt_deltas)
+        ExpenseService._apply_group_deltas(db, group_deltas)
+        ExpenseService._apply_spending_deltas(db, spending_deltas)
+        ExpenseService._touch_users(db, [user_id, *(split.user_id for split in old_splits), *splits])
+        SearchService.index_expenses(db, [(expense.id, expense.description, splits)])
 
-        # Validate total split amount
-        total_split_amount = sum(splits.values())
-        if abs(total_split_amount - expense_data.amount) > 0.01:
-            raise ValueError("Splits do not sum up to total amount")
+        return expense
+
+    @staticmethod
+    def import_expenses(db: Session, rows: List[Tuple[int, ExpenseCreate]], user_id: int) -> List[Dict]:
+        """
+        Imports a chunk of validated expenses with bulk inserts and one aggregated balance update.
+        Returns the rows that could not be imported as {"row": ..., "error": ...} entries.
+        """
+        errors = []
+
+        # Validate every referenced user of the chunk in one query
+        referenced_ids = {split.user_id for _, expense_data in rows for split in expense_data.splits}
+        known_ids = {row.id for row in db.query(User.id).filter(User.id.in_(referenced_ids))}
+        group_ids = {expense_data.group_id for _, expense_data in rows if expense_data.group_id is not None}
+        group_members = defaultdict(set)
+        if group_ids:
+            for member in db.query(GroupMember.group_id, GroupMember.user_id).filter(GroupMember.group_id.in_(group_ids)):
+                group_members[member.group_id].add(member.user_id)
 
-        # Create new splits and update balances
-        for user_id, amount_owed in splits.items():
-            expense_split = ExpenseSplit(
-                expense_id=expense.id,
-                user_id=user_id,
-                amount_owed=amount_owed,
-                is_settled=False
+        # Group rows by split type and currency precision so each group is split in one vectorized call
+        groups = defaultdict(list)
+        for row_number, expense_data in rows:
+            user_ids = [split.user_id for split in expense_data.splits]
+            if len(set(user_ids)) != len(user_ids) or not known_ids.issuperset(user_ids):
+                errors.append({"row": row_number, "error": "One or more users not found"})
+                continue
+            if expense_data.group_id is not None and not group_members[expense_data.group_id].issuperset([user_id, *user_ids]):
+                errors.append({"row": row_number, "error": "Group not found or not all users are members"})
+                continue
+            groups[(expense_data.split_type, minor_unit_exponent(expense_data.currency))].append((row_number, expense_data))
+
+        valid_rows = []
+        for (split_type, exponent), group in groups.items():
+            strategy = SplitStrategyFactory.get_strategy(split_type)
+            batch = strategy.calculate_many(
+                [expense_data.amount for _, expense_data in group],
+                [[split.user_id for split in expense_data.splits] for _, expense_data in group],
+                [ExpenseService._splits_info(expense_data) for _, expense_data in group],
+                exponent,
             )
-            db.add(expense_split)
-
-            # Update balances
-            balance = db.query(Balance).filter(Balance.user_id == user_id, Balance.currency == expense.currency).first()
-            if not balance:
-                balance = Balance(user_id=user_id, currency=expense.currency, amount=0.0)
-                db.add(balance)
-            if user_id == expense.expense_created_by:
-                balance.amount += expense.amount - amount_owed
-            else:
-                balance.amount -= amount_owed
+            for index, ((row_number, expense_data), splits) in enumerate(zip(group, batch.to_dicts())):
+                if splits is None:
+                    errors.append({"row": row_number, "error": batch.errors[index]})
+                else:
+                    valid_rows.append((expense_data, splits))
+        if not valid_rows:
+            return errors
 
-        return expense
+        # Ordered RETURNING so generated ids and creation times line up with the input rows
+        inserted = db.execute(
+            insert(Expense).returning(Expense.id, Expense.created_at, sort_by_parameter_order=True),
+            [
+                {
+                    "description": expense_data.description,
+                    "currency": expense_data.currency,
+                    "amount": expense_data.amount,
+                    "expense_created_by": user_id,
+                    "split_type": expense_data.split_type.value,
+                    "group_id": expense_data.group_id,
+                }
+                for expense_data, _ in valid_rows
+            ],
+        ).all()
+        expense_ids = [expense_id for expense_id, _ in inserted]
+
+        split_rows = []
+        deltas = defaultdict(float)
+        debt_deltas = defaultdict(float)
+        group_deltas = defaultdict(float)
+        spending_deltas = rollup_deltas()
+        for (expense_id, created_at), (expense_data, splits) in zip(inserted, valid_rows):
+            ExpenseService._add_split_deltas(deltas, user_id, expense_data.currency, expense_data.amount, splits)
+            ExpenseService._add_debt_deltas(debt_deltas, user_id, expense_data.currency, splits)
+            ExpenseService._add_group_deltas(group_deltas, expense_data.group_id, user_id, expense_data.currency, expense_data.amount, splits)
+            SpendingRollupService.add_expense_deltas(spending_deltas, user_id, expense_data.currency, rollup_period(created_at), expense_data.amount, splits)
+            split_rows.extend(
+                {"expense_id": expense_id, "user_id": split_user_id, "amount_owed": amount_owed, "is_settled": False}
+                for split_user_id, amount_owed in splits.items()
+            )
+        db.execute(insert(ExpenseSplit), split_rows)
+        ExpenseService._apply_balance_deltas(db, deltas)
+        ExpenseService._apply_debt_deltas(db, debt_deltas)
+        ExpenseService._apply_group_deltas(db, group_deltas)
+        ExpenseService._apply_spending_deltas(db, spending_deltas)
+        ExpenseService._touch_users(db, {user_id, *(row["user_id"] for row in split_rows)})
+        SearchService.index_expenses(db, [
+            (expense_id, expense_data.description, splits) for expense_id, (expense_data, splits) in zip(expense_ids, valid_rows)
+        ])
+
+        return errors
 
     @staticmethod
-    def get_user_balance(db: Session, user_id: int):
+    def get_user_balance(db: Session, user_id: int, as_of: Optional[datetime] = None):
+        # Past balances come from the ledger
+        if as_of is not None:
+            return BalanceHistoryService.get_balances_as_of(db, user_id, as_of)
+
         # Retrieve all balances for the user
         balances = db.query(Balance).filter(Balance.user_id == user_id).all()
         return balances
 
+    @staticmethod
+    def get_user_version(db: Session, user_id: int) -> int:
+        """
+        Returns the user's version counter, bumped by every write that changes their balances or expenses.
+        """
+        version = db.execute(select(UserVersion.version).where(UserVersion.user_id == user_id)).scalar()
+        return version or 0
+
     @staticmethod
     def settle_expense(db: Session, expense_id: int, user_id: int):
         # Fetch the expense split
         split = db.query(ExpenseSplit).filter(ExpenseSplit.expense_id == expense_id, ExpenseSplit.user_id == user_id).first()
         if not split:
             raise ValueError("Expense split not found")
-        if split.is_settled:
+        # Conditional UPDATE so two concurrent settles cannot both credit the balance
+        claimed = db.query(ExpenseSplit).filter(ExpenseSplit.id == split.id, ExpenseSplit.is_settled == False).update({ExpenseSplit.is_settled: True})
+        if not claimed:
             raise ValueError("Expense already settled for this user")
-        split.is_settled = True
 
-        # Update balance
+        # Update balances
         expense = db.query(Expense).filter(Expense.id == expense_id).first()
-        balance = db.query(Balance).filter(Balance.user_id == user_id, Balance.currency == expense.currency).first()
-        balance.amount += split.amount_owed
+        deltas = defaultdict(float)
+        debt_deltas = defaultdict(float)
+        group_deltas = defaultdict(float)
+        spending_deltas = rollup_deltas()
+        ExpenseService._add_settlement_deltas(deltas, debt_deltas, group_deltas, spending_deltas, expense, user_id, split.amount_owed)
+        ExpenseService._apply_balance_deltas(db, deltas)
+        ExpenseService._apply_group_deltas(db, group_deltas)
+        ExpenseService._apply_debt_deltas(db, debt_deltas)
+        ExpenseService._apply_spending_deltas(db, spending_deltas)
 
-        # Check if all splits are settled
-        unsettled_splits = db.query(ExpenseSplit).filter(ExpenseSplit.expense_id == expense_id, ExpenseSplit.is_settled == False).count()
-        if unsettled_splits == 0:
-            expense.is_settled = True
+        # Mark the expense settled once no split is left open
+        db.query(Expense).filter(
+            Expense.id == expense_id,
+            ~exists().where(ExpenseSplit.expense_id == expense_id, ExpenseSplit.is_settled == False),
+        ).update({Expense.is_settled: True}, synchronize_session="fetch")
+
+        # Every participant sees the split change in their expense list
+        participant_ids = db.execute(select(ExpenseSplit.user_id).where(ExpenseSplit.expense_id == expense_id)).scalars().all()
+        ExpenseService._touch_users(db, [expense.expense_created_by, *participant_ids])
 
         return split
 
     @staticmethod
-    def get_user_expenses(db: Session, user_id: int):
-        # Retrieve all expenses involving the user
-        expenses = db.query(Expense).join(ExpenseSplit).filter(ExpenseSplit.user_id == user_id).all()
-        return expenses
+    def settle_all_splits(db: Session, user_id: int) -> Dict[str, int]:
+        """
+        Settles every open split the user owes, on any expense.
+        """
+        return ExpenseService._settle_splits(db, ExpenseSplit.user_id == user_id)
+
+    @staticmethod
+    def settle_splits_with_user(db: Session, user_id: int, other_user_id: int) -> Dict[str, int]:
+        """
+        Settles every open split the user owes on expenses created by other_user_id.
+        """
+        return ExpenseService._settle_splits(
+            db,
+            ExpenseSplit.user_id == user_id,
+            ExpenseSplit.expense_id.in_(select(Expense.id).where(Expense.expense_created_by == other_user_id)),
+        )
+
+    @staticmethod
+    def settle_whole_expense(db: Session, expense_id: int, user_id: int) -> Dict[str, int]:
+        """
+        Settles every open split of an expense; only its creator, who is owed the money, may do this.
+        """
+        creator_id = db.execute(select(Expense.expense_created_by).where(Expense.id == expense_id)).scalar()
+        if creator_id is None or creator_id != user_id:
+            raise ValueError("Expense not found or not authorized")
+        return ExpenseService._settle_splits(db, ExpenseSplit.expense_id == expense_id)
+
+    @staticmethod
+    def get_simplified_debts(db: Session, user_id: int, currency: Optional[str] = None) -> List[Dict]:
+        """
+        Minimum-transfer settlement plan for every user connected to `user_id` through
+        outstanding debts, computed per currency from the pairwise debt table.
+        """
+        cache_key = (user_id, currency)
+        cached = simplified_debt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Walk the debt graph one level per query to find the connected user set
+        members = {user_id}
+        frontier = {user_id}
+        debts = {}
+        while frontier:
+            query = db.query(Debt.id, Debt.user_id, Debt.other_user_id, Debt.currency, Debt.amount).filter(
+                or_(Debt.user_id.in_(frontier), Debt.other_user_id.in_(frontier)),
+                or_(Debt.amount > EPSILON, Debt.amount < -EPSILON),
+            )
+            if currency:
+                query = query.filter(Debt.currency == currency)
+            frontier = set()
+            for debt in query:
+                debts[debt.id] = debt
+                for member_id in (debt.user_id, debt.other_user_id):
+                    if member_id not in members:
+                        members.add(member_id)
+                        frontier.add(member_id)
+
+        net_positions = defaultdict(lambda: defaultdict(float))
+        for debt in debts.values():
+            net_positions[debt.currency][debt.user_id] -= debt.amount
+            net_positions[debt.currency][debt.other_user_id] += debt.amount
+
+        result = [
+            {"from_user_id": from_user_id, "to_user_id": to_user_id, "currency": debt_currency, "amount": amount}
+            for debt_currency, positions in sorted(net_positions.items())
+            for from_user_id, to_user_id, amount in simplify_debts(positions)
+        ]
+        simplified_debt_cache.set(cache_key, result, tags=members)
+        return result
+
+    @staticmethod
+    def rebuild_debts(db: Session) -> int:
+        """
+        Regenerates the pairwise debt table from unsettled splits, e.g. for data written before it existed.
+        Returns the number of pairs written.
+        """
+        rows = db.query(
+            ExpenseSplit.user_id, Expense.expense_created_by, Expense.currency, func.sum(ExpenseSplit.amount_owed)
+        ).join(Expense, Expense.id == ExpenseSplit.expense_id).filter(
+            ExpenseSplit.is_settled == False, ExpenseSplit.user_id != Expense.expense_created_by
+        ).group_by(ExpenseSplit.user_id, Expense.expense_created_by, Expense.currency)
+
+        debt_deltas = defaultdict(float)
+        for debtor_id, creditor_id, currency, amount_owed in rows:
+            ExpenseService._add_debt_deltas(debt_deltas, creditor_id, currency, {debtor_id: amount_owed})
+
+        db.query(Debt).delete(synchronize_session=False)
+        if debt_deltas:
+            db.execute(insert(Debt), [
+                {"user_id": user_id, "other_user_id": other_user_id, "currency": currency, "amount": amount}
+                for (user_id, other_user_id, currency), amount in debt_deltas.items()
+            ])
+        simplified_debt_cache.clear()
+        return len(debt_deltas)
+
+    @staticmethod
+    def project_journal(db: Session, limit: int) -> int:
+        """
+        Folds up to limit unprojected journal entries into Balance and GroupBalance, merging all
+        deltas for the same row into one upsert. Returns the number of entries projected.
+        """
+        entries = db.execute(
+            select(BalanceJournalEntry.id, BalanceJournalEntry.user_id, BalanceJournalEntry.currency,
+                   BalanceJournalEntry.group_id, BalanceJournalEntry.amount)
+            .where(BalanceJournalEntry.projected == False)
+            .order_by(BalanceJournalEntry.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not entries:
+            return 0
+
+        deltas = defaultdict(float)
+        group_deltas = defaultdict(float)
+        for entry in entries:
+            if entry.group_id is None:
+                deltas[(entry.user_id, entry.currency)] += entry.amount
+            else:
+                group_deltas[(entry.group_id, entry.user_id, entry.currency)] += entry.amount
+        ExpenseService._write_balance_deltas(db, deltas)
+        ExpenseService._apply_deltas(db, GroupBalance, ("group_id", "user_id", "currency"), group_deltas)
+        ExpenseService._touch_users(db, {entry.user_id for entry in entries})
+        db.execute(
+            update(BalanceJournalEntry)
+            .where(BalanceJournalEntry.id.in_([entry.id for entry in entries]))
+            .values(projected=True)
+            .execution_options(synchronize_session=False)
+        )
+        return len(entries)
+
+    @staticmethod
+    def get_user_expense_ids(
+        db: Session,
+        user_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        currency: Optional[str] = None,
+        is_settled: Optional[bool] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ) -> Tuple[List[int], Optional[str]]:
+        """
+        Returns the ids of one page of expenses involving the user, newest first, and the
+        cursor of the next page, reading only the keyset columns. The rows themselves are
+        fetched in batches with get_expense_rows.
+        """
+        conditions = ExpenseService._user_expense_conditions(user_id, cursor, currency, is_settled, created_after, created_before)
+        keys = db.execute(
+            select(Expense.id, Expense.created_at).join(ExpenseSplit).where(*conditions)
+            .order_by(Expense.created_at.desc(), Expense.id.desc()).limit(limit + 1)
+        ).all()
+
+        next_cursor = None
+        if len(keys) > limit:
+            keys = keys[:limit]
+            next_cursor = encode_cursor(keys[-1].created_at, keys[-1].id)
+        return [key.id for key in keys], next_cursor
+
+    @staticmethod
+    def get_expense_rows(db: Session, expense_ids: List[int]) -> List[Dict]:
+        """
+        Expenses with their splits as plain dicts in the shape of the Expense schema, in the order
+        of expense_ids. Columns are selected as tuples, so no ORM objects or models are built.
+        """
+        if not expense_ids:
+            return []
+        splits = defaultdict(list)
+        for user_id, amount_owed, split_id, expense_id, is_settled in db.execute(
+            select(ExpenseSplit.user_id, ExpenseSplit.amount_owed, ExpenseSplit.id, ExpenseSplit.expense_id, ExpenseSplit.is_settled)
+            .where(ExpenseSplit.expense_id.in_(expense_ids))
+            .order_by(ExpenseSplit.id)
+        ):
+            splits[expense_id].append({
+                "user_id": user_id, "amount_owed": amount_owed, "id": split_id, "expense_id": expense_id, "is_settled": is_settled,
+            })
+        rows = {
+            expense_id: {
+                "description": description, "currency": currency, "amount": amount, "split_type": split_type,
+                "group_id": group_id, "id": expense_id, "expense_created_by": created_by, "created_at": created_at,
+                "is_settled": is_settled, "splits": splits[expense_id],
+            }
+            for description, currency, amount, split_type, group_id, expense_id, created_by, created_at, is_settled in db.execute(
+                select(Expense.description, Expense.currency, Expense.amount, Expense.split_type, Expense.group_id,
+                       Expense.id, Expense.expense_created_by, Expense.created_at, Expense.is_settled)
+                .where(Expense.id.in_(expense_ids))
+            )
+        }
+        return [rows[expense_id] for expense_id in expense_ids if expense_id in rows]
+
+    @staticmethod
+    def user_export_query(user_id: int):
+        """
+        Every expense involving the user joined with all of its splits, one row per split,
+        oldest first and grouped by expense. Meant to be streamed in batches with yield_per.
+        """
+        involved = select(ExpenseSplit.expense_id).where(ExpenseSplit.user_id == user_id)
+        return (
+            select(
+                Expense.description, Expense.currency, Expense.amount, Expense.split_type, Expense.group_id,
+                Expense.id, Expense.expense_created_by, Expense.created_at, Expense.is_settled,
+                ExpenseSplit.user_id, ExpenseSplit.amount_owed, ExpenseSplit.id.label("split_id"),
+                ExpenseSplit.expense_id, ExpenseSplit.is_settled.label("split_is_settled"),
+            )
+            .join(ExpenseSplit, ExpenseSplit.expense_id == Expense.id)
+            .where(Expense.id.in_(involved))
+            .order_by(Expense.created_at, Expense.id, ExpenseSplit.id)
+        )
+
+    @staticmethod
+    def _user_expense_conditions(
+        user_id: int,
+        cursor: Optional[str],
+        currency: Optional[str],
+        is_settled: Optional[bool],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime],
+    ) -> List:
+        # Filters for expenses involving the user, joined through ExpenseSplit
+        conditions = [ExpenseSplit.user_id == user_id]
+        if currency:
+            conditions.append(Expense.currency == currency)
+        if is_settled is not None:
+            conditions.append(Expense.is_settled == is_settled)
+        if created_after:
+            conditions.append(Expense.created_at >= created_after)
+        if created_before:
+            conditions.append(Expense.created_at < created_before)
+
+        # Keyset pagination on (created_at, id)
+        position = decode_cursor(cursor)
+        if position:
+            created_at, expense_id = position
+            conditions.append(or_(
+                Expense.created_at < created_at,
+                and_(Expense.created_at == created_at, Expense.id < expense_id),
+            ))
+        return conditions
+
+    @staticmethod
+    def _settle_splits(db: Session, *conditions) -> Dict[str, int]:
+        # Claims every matching open split in one conditional UPDATE, so a split settled
+        # concurrently is never credited twice, then applies the aggregated deltas and
+        # recomputes Expense.is_settled once for all affected expenses.
+        claimed = db.execute(
+            update(ExpenseSplit)
+            .where(*conditions, ExpenseSplit.is_settled == False)
+            .values(is_settled=True)
+            .returning(ExpenseSplit.expense_id, ExpenseSplit.user_id, ExpenseSplit.amount_owed)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            return {"settled_splits": 0, "settled_expenses": 0}
+
+        expense_ids = sorted({split.expense_id for split in claimed})
+        expenses = {
+            expense.id: expense
+            for expense in db.execute(
+                select(Expense.id, Expense.currency, Expense.expense_created_by, Expense.group_id, Expense.created_at).where(Expense.id.in_(expense_ids))
+            )
+        }
+        deltas = defaultdict(float)
+        debt_deltas = defaultdict(float)
+        group_deltas = defaultdict(float)
+        spending_deltas = rollup_deltas()
+        for split in claimed:
+            ExpenseService._add_settlement_deltas(deltas, debt_deltas, group_deltas, spending_deltas, expenses[split.expense_id], split.user_id, split.amount_owed)
+        ExpenseService._apply_balance_deltas(db, deltas)
+        ExpenseService._apply_group_deltas(db, group_deltas)
+        ExpenseService._apply_debt_deltas(db, debt_deltas)
+        ExpenseService._apply_spending_deltas(db, spending_deltas)
+
+        settled_expenses = db.execute(
+            update(Expense)
+            .where(
+                Expense.id.in_(expense_ids),
+                ~exists().where(ExpenseSplit.expense_id == Expense.id, ExpenseSplit.is_settled == False),
+            )
+            .values(is_settled=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        participant_ids = db.execute(select(ExpenseSplit.user_id).where(ExpenseSplit.expense_id.in_(expense_ids)).distinct()).scalars().all()
+        ExpenseService._touch_users(db, [*participant_ids, *(expense.expense_created_by for expense in expenses.values())])
+        return {"settled_splits": len(claimed), "settled_expenses": settled_expenses}
+
+    @staticmethod
+    def _calculate_splits(expense_data: ExpenseCreate) -> Dict[int, float]:
+        # Get the appropriate strategy for splitting the expense
+        strategy = SplitStrategyFactory.get_strategy(expense_data.split_type)
+
+        # Prepare split information
+        user_ids = [split.user_id for split in expense_data.splits]
+        exponent = minor_unit_exponent(expense_data.currency)
+        splits = strategy.calculate_splits(expense_data.amount, user_ids, ExpenseService._splits_info(expense_data), exponent)
+
+        # Validate total split amount, exactly in minor units
+        if sum(to_minor(amount_owed, exponent) for amount_owed in splits.values()) != to_minor(expense_data.amount, exponent):
+            raise ValueError("Splits do not sum up to total amount")
+        return splits
+
+    @staticmethod
+    def _splits_info(expense_data: ExpenseCreate) -> Dict[int, float]:
+        return {split.user_id: split.amount_owed for split in expense_data.splits if split.amount_owed is not None}
+
+    @staticmethod
+    def _add_split_deltas(deltas: Dict[Tuple[int, str], float], creator_id: int, currency: str, amount: float, splits: Dict[int, float], sign: int = 1):
+        # The creator is credited with everyone else's share, other participants owe theirs
+        for split_user_id, amount_owed in splits.items():
+            if split_user_id == creator_id:
+                deltas[(split_user_id, currency)] += sign * (amount - amount_owed)
+            else:
+                deltas[(split_user_id, currency)] -= sign * amount_owed
+
+    @staticmethod
+    def _add_settlement_deltas(deltas, debt_deltas, group_deltas, spending_deltas, expense, user_id: int, amount_owed: float, sign: int = 1):
+        # A participant paying the creator back moves their share from the creator's balance to
+        # theirs and clears that much of the pairwise debt. The creator's own share was never
+        # owed to anyone, so settling it only marks the split. sign=-1 reverses a settlement.
+        creator_id = expense.expense_created_by
+        if user_id == creator_id:
+            return
+        deltas[(user_id, expense.currency)] += sign * amount_owed
+        deltas[(creator_id, expense.currency)] -= sign * amount_owed
+        if expense.group_id is not None:
+            group_deltas[(expense.group_id, user_id, expense.currency)] += sign * amount_owed
+            group_deltas[(expense.group_id, creator_id, expense.currency)] -= sign * amount_owed
+        ExpenseService._add_debt_deltas(debt_deltas, creator_id, expense.currency, {user_id: amount_owed}, sign=-sign)
+        SpendingRollupService.add_settled_deltas(spending_deltas, expense.currency, rollup_period(expense.created_at), {user_id: amount_owed}, sign=sign)
+
+    @staticmethod
+    def _insert_splits(db: Session, expense: Expense, splits: Dict[int, float]):
+        # Single executemany INSERT, then reload the relationship so the response needs no lazy load
+        db.execute(insert(ExpenseSplit), [
+            {"expense_id": expense.id, "user_id": split_user_id, "amount_owed": amount_owed, "is_settled": False}
+            for split_user_id, amount_owed in splits.items()
+        ])
+        db.refresh(expense, ['splits'])
+
+    @staticmethod
+    def _add_debt_deltas(debt_deltas: Dict[Tuple[int, int, str], float], creator_id: int, currency: str, splits: Dict[int, float], sign: int = 1):
+        # Every other participant owes the creator their share; pairs are keyed as (lower id, higher id)
+        for split_user_id, amount_owed in splits.items():
+            if split_user_id == creator_id:
+                continue
+            if split_user_id < creator_id:
+                debt_deltas[(split_user_id, creator_id, currency)] += sign * amount_owed
+            else:
+                debt_deltas[(creator_id, split_user_id, currency)] -= sign * amount_owed
+
+    @staticmethod
+    def _apply_balance_deltas(db: Session, deltas: Dict[Tuple[int, str], float]):
+        # In projector mode the write only appends to the journal
+        if BALANCE_PROJECTOR:
+            BalanceJournalService.append(db, deltas=deltas)
+            return
+        ExpenseService._write_balance_deltas(db, deltas)
+
+    @staticmethod
+    def _write_balance_deltas(db: Session, deltas: Dict[Tuple[int, str], float]):
+        ExpenseService._apply_deltas(db, Balance, ("user_id", "currency"), deltas)
+        BalanceHistoryService.record(db, deltas)
+
+    @staticmethod
+    def _apply_debt_deltas(db: Session, debt_deltas: Dict[Tuple[int, int, str], float]):
+        ExpenseService._apply_deltas(db, Debt, ("user_id", "other_user_id", "currency"), debt_deltas)
+        mark_debts_changed(db, {user_id for key in debt_deltas for user_id in key[:2]})
+
+    @staticmethod
+    def _validate_group(db: Session, group_id: Optional[int], user_ids: List[int]):
+        # Creator and every participant must belong to the expense's group
+        if group_id is None:
+            return
+        user_ids = set(user_ids)
+        members = db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id, GroupMember.user_id.in_(user_ids)).count()
+        if members != len(user_ids):
+            raise ValueError("Group not found or not all users are members")
+
+    @staticmethod
+    def _add_group_deltas(group_deltas: Dict[Tuple[int, int, str], float], group_id: Optional[int], creator_id: int, currency: str, amount: float, splits: Dict[int, float], sign: int = 1):
+        # Same changes as the members' overall balances, keyed by group
+        if group_id is None:
+            return
+        member_deltas = defaultdict(float)
+        ExpenseService._add_split_deltas(member_deltas, creator_id, currency, amount, splits, sign)
+        for (member_id, member_currency), delta in member_deltas.items():
+            group_deltas[(group_id, member_id, member_currency)] += delta
+
+    @staticmethod
+    def _apply_group_deltas(db: Session, group_deltas: Dict[Tuple[int, int, str], float]):
+        if BALANCE_PROJECTOR:
+            BalanceJournalService.append(db, group_deltas=group_deltas)
+            return
+        ExpenseService._apply_deltas(db, GroupBalance, ("group_id", "user_id", "currency"), group_deltas)
+
+    @staticmethod
+    def _apply_spending_deltas(db: Session, spending_deltas: Dict[Tuple[int, str, date], Dict[str, float]]):
+        # Written directly in projector mode too: rollups are not derived from the balance journal
+        ExpenseService._apply_deltas(db, SpendingRollup, ("user_id", "currency", "period"), spending_deltas)
+
+    @staticmethod
+    def _apply_deltas(db: Session, model, key_columns: Tuple[str, ...], deltas: Dict[Tuple, float]):
+        # Increment on the database side in one executemany upsert, so concurrent writers never
+        # lose each other's changes and no row locks are held across a read. Keys are sorted
+        # so concurrent transactions always lock rows in the same order. A delta is the change
+        # of the amount column, or a {column: change} dict with the same columns for every key.
+        if not deltas:
+            return
+        rows = [
+            {**dict(zip(key_columns, key)), **(delta if isinstance(delta, dict) else {"amount": delta})}
+            for key, delta in sorted(deltas.items())
+        ]
+        value_columns = [column for column in rows[0] if column not in key_columns]
+        dialect = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+        if dialect is not None:
+            statement = dialect.insert(model)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(key_columns),
+                set_={column: getattr(model, column) + getattr(statement.excluded, column) for column in value_columns},
+            )
+            db.execute(statement, rows)
+            return
+
+        # Other databases: atomic increment, inserting the rows that do not exist yet
+        for row in rows:
+            key_filter = [getattr(model, column) == row[column] for column in key_columns]
+            increments = {column: getattr(model, column) + row[column] for column in value_columns}
+            result = db.execute(update(model).where(*key_filter).values(**increments).execution_options(synchronize_session=False))
+            if result.rowcount == 0:
+                db.execute(insert(model), [row])
+
+    @staticmethod
+    def _touch_users(db: Session, user_ids: Iterable[int]):
+        # Bump each user's version so cached responses and ETags for them go stale.
+        # Same sorted upsert as _apply_deltas, to keep the lock order consistent.
+        rows = [{"user_id": user_id, "version": 1} for user_id in sorted(set(user_ids))]
+        if not rows:
+            return
+        dialect = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+        if dialect is not None:
+            statement = dialect.insert(UserVersion)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"version": UserVersion.version + 1},
+            )
+            db.execute(statement, rows)
+            return
+
+        for row in rows:
+            result = db.execute(update(UserVersion).where(UserVersion.user_id == row["user_id"]).values(version=UserVersion.version + 1).execution_options(synchronize_session=False))
+            if result.rowcount == 0:
+                db.execute(insert(UserVersion), [row])
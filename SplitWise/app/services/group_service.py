@@ -0,0 +1,66 @@
+from typing import Dict, List
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.group import Group, GroupBalance, GroupMember
+from app.models.user import User
+from app.schemas.group import GroupCreate
+
+class GroupService:
+    """
+    Service for handling groups, their membership and group-level balance summaries.
+    """
+
+    @staticmethod
+    def create_group(db: Session, group_data: GroupCreate, user_id: int) -> Dict:
+        member_ids = list(dict.fromkeys([user_id, *group_data.member_ids]))
+        GroupService._validate_users(db, member_ids)
+
+        group = Group(name=group_data.name, created_by=user_id)
+        db.add(group)
+        db.flush()
+        db.execute(insert(GroupMember), [{"group_id": group.id, "user_id": member_id} for member_id in member_ids])
+        return GroupService._to_dict(group, member_ids)
+
+    @staticmethod
+    def add_members(db: Session, group_id: int, member_ids: List[int], user_id: int) -> Dict:
+        group, current_ids = GroupService._get_group_for_member(db, group_id, user_id)
+        new_ids = [member_id for member_id in dict.fromkeys(member_ids) if member_id not in current_ids]
+        if new_ids:
+            GroupService._validate_users(db, new_ids)
+            db.execute(insert(GroupMember), [{"group_id": group_id, "user_id": member_id} for member_id in new_ids])
+        return GroupService._to_dict(group, current_ids + new_ids)
+
+    @staticmethod
+    def get_group_summary(db: Session, group_id: int, user_id: int) -> Dict:
+        """
+        Returns every member's net balance per currency from the group rollup;
+        three queries regardless of group size.
+        """
+        group, member_ids = GroupService._get_group_for_member(db, group_id, user_id)
+        balances = db.query(GroupBalance).filter(GroupBalance.group_id == group_id).order_by(
+            GroupBalance.user_id, GroupBalance.currency
+        ).all()
+        return {"group_id": group.id, "name": group.name, "member_ids": member_ids, "balances": balances}
+
+    @staticmethod
+    def _get_group_for_member(db: Session, group_id: int, user_id: int):
+        group = db.query(Group).filter(Group.id == group_id).first()
+        member_ids = [row.user_id for row in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id).order_by(GroupMember.id)]
+        if not group or user_id not in member_ids:
+            raise ValueError("Group not found or not a member")
+        return group, member_ids
+
+    @staticmethod
+    def _validate_users(db: Session, user_ids: List[int]):
+        if db.query(User.id).filter(User.id.in_(user_ids)).count() != len(user_ids):
+            raise ValueError("One or more users not found")
+
+    @staticmethod
+    def _to_dict(group: Group, member_ids: List[int]) -> Dict:
+        return {
+            "id": group.id,
+            "name": group.name,
+            "created_by": group.created_by,
+            "created_at": group.created_at,
+            "member_ids": member_ids,
+        }
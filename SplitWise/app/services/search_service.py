@@ -0,0 +1,138 @@
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from app.models.expense import Expense
+from app.models.expense_split import ExpenseSplit
+from app.utils.pagination import DEFAULT_PAGE_SIZE, decode_rank_cursor, encode_rank_cursor
+
+SEARCH_MAX_TERMS = int(os.getenv('SEARCH_MAX_TERMS', '8'))
+# Distinct words of a description that are indexed
+SEARCH_MAX_INDEXED_WORDS = int(os.getenv('SEARCH_MAX_INDEXED_WORDS', '32'))
+
+# Words are runs of word characters, so they can be quoted into FTS5 and tsquery syntax as-is
+WORD = re.compile(r'\w+')
+
+def search_words(value: str) -> List[str]:
+    """
+    Lowercased words of value without diacritics ("Café" -> "cafe"), in order, repeats kept.
+    """
+    decomposed = unicodedata.normalize('NFKD', value.lower())
+    return WORD.findall(''.join(char for char in decomposed if not unicodedata.combining(char)))
+
+class SearchService:
+    """
+    Service for full-text search over expense descriptions, backed by the expense_search
+    index (FTS5 on SQLite, tsvector/GIN on PostgreSQL) of user-prefixed words. Every query
+    word must match; the last one also matches as a prefix, so results follow the user as
+    they type. Results are ranked by relevance (bm25 on SQLite, ts_rank on PostgreSQL) and
+    paginated with a (score, id) keyset cursor. Scores are not stable between requests: bm25
+    and ts_rank weigh matches against statistics of the whole index, so any write, by any
+    user, can reorder the results. A page then continues from the previous page's last
+    score under the new scores, and rows near the boundary can repeat or be skipped. Only
+    the fallback for other databases, which orders by id, pages without gaps.
+    """
+
+    @staticmethod
+    def search_terms(query: str) -> List[str]:
+        terms = list(dict.fromkeys(search_words(query)))[:SEARCH_MAX_TERMS]
+        if not terms:
+            raise ValueError("Search query must contain at least one word")
+        return terms
+
+    @staticmethod
+    def index_expenses(db: Session, entries: Iterable[Tuple[int, str, Iterable[int]]]):
+        """
+        Adds or replaces the index entries of (expense_id, description, split user ids).
+        Call from every write that creates an expense or changes its description or splits.
+        """
+        rows = []
+        for expense_id, description, user_ids in entries:
+            words = list(dict.fromkeys(search_words(description or '')))[:SEARCH_MAX_INDEXED_WORDS]
+            rows.append({"expense_id": expense_id, "terms": [f"{user_id}_{word}" for user_id in sorted(set(user_ids)) for word in words]})
+        if not rows:
+            return
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            db.execute(text("INSERT OR REPLACE INTO expense_search (rowid, terms) VALUES (:expense_id, :terms)"), [
+                {"expense_id": row["expense_id"], "terms": " ".join(row["terms"])} for row in rows
+            ])
+        elif dialect == "postgresql":
+            # array_to_tsvector takes the prefixed words as lexemes, without re-parsing them
+            db.execute(text(
+                "INSERT INTO expense_search (expense_id, terms) VALUES (:expense_id, array_to_tsvector(CAST(:terms AS TEXT[]))) "
+                "ON CONFLICT (expense_id) DO UPDATE SET terms = excluded.terms"
+            ), rows)
+
+    @staticmethod
+    def search_expense_ids(
+        db: Session,
+        user_id: int,
+        query: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[int], Optional[str]]:
+        """
+        Returns one page of the ids of expenses involving the user that match the query,
+        best match first, and the cursor of the next page. Rows are fetched with
+        ExpenseService.get_expense_rows.
+        """
+        terms = SearchService.search_terms(query)
+        position = decode_rank_cursor(cursor)
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            keys = SearchService._search_sqlite(db, user_id, terms, limit + 1, position)
+        elif dialect == "postgresql":
+            keys = SearchService._search_postgresql(db, user_id, terms, limit + 1, position)
+        else:
+            keys = SearchService._search_like(db, user_id, terms, limit + 1, position)
+
+        next_cursor = None
+        if len(keys) > limit:
+            keys = keys[:limit]
+            next_cursor = encode_rank_cursor(keys[-1][1], keys[-1][0])
+        return [expense_id for expense_id, _ in keys], next_cursor
+
+    @staticmethod
+    def _search_sqlite(db: Session, user_id: int, terms: List[str], limit: int, position: Optional[Tuple[float, int]]) -> List[Tuple[int, float]]:
+        phrases = [f'"{user_id}_{term}"' for term in terms[:-1]] + [f'"{user_id}_{terms[-1]}"*']
+        params: Dict = {"match": " AND ".join(phrases), "limit": limit}
+        # bm25 is lower for better matches; negated so both dialects sort by score descending
+        score = "-bm25(expense_search)"
+        keyset = ""
+        if position:
+            params["score"], params["expense_id"] = position
+            keyset = f"AND ({score} < :score OR ({score} = :score AND rowid < :expense_id))"
+        return [tuple(row) for row in db.execute(text(
+            f"SELECT rowid, {score} AS score FROM expense_search WHERE expense_search MATCH :match {keyset} "
+            "ORDER BY score DESC, rowid DESC LIMIT :limit"
+        ), params)]
+
+    @staticmethod
+    def _search_postgresql(db: Session, user_id: int, terms: List[str], limit: int, position: Optional[Tuple[float, int]]) -> List[Tuple[int, float]]:
+        # Quoted lexemes in tsquery input syntax are taken verbatim, like array_to_tsvector's
+        params: Dict = {
+            "tsquery": " & ".join([f"'{user_id}_{term}'" for term in terms[:-1]] + [f"'{user_id}_{terms[-1]}':*"]),
+            "limit": limit,
+        }
+        score = "ts_rank(terms, query)"
+        keyset = ""
+        if position:
+            params["score"], params["expense_id"] = position
+            keyset = f"AND ({score} < :score OR ({score} = :score AND expense_id < :expense_id))"
+        return [tuple(row) for row in db.execute(text(
+            f"SELECT expense_id, {score} AS score FROM expense_search, (SELECT CAST(:tsquery AS TSQUERY) AS query) AS search "
+            f"WHERE terms @@ query {keyset} ORDER BY score DESC, expense_id DESC LIMIT :limit"
+        ), params)]
+
+    @staticmethod
+    def _search_like(db: Session, user_id: int, terms: List[str], limit: int, position: Optional[Tuple[float, int]]) -> List[Tuple[int, float]]:
+        # Other databases: unindexed substring match, newest first, every score 0
+        conditions = [ExpenseSplit.user_id == user_id, *(Expense.description.ilike(f"%{term}%") for term in terms)]
+        if position:
+            conditions.append(Expense.id < position[1])
+        return [(expense_id, 0.0) for expense_id in db.scalars(
+            select(Expense.id).join(ExpenseSplit).where(*conditions).order_by(Expense.id.desc()).limit(limit)
+        )]
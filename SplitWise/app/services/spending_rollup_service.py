@@ -0,0 +1,131 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import Date, and_, case, cast, delete, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+from app.models.expense import Expense
+from app.models.expense_split import ExpenseSplit
+from app.models.spending_rollup import SpendingRollup
+from app.utils.split_strategies import minor_unit_exponent
+
+ROLLUP_COLUMNS = ("spent", "paid", "settled", "expense_count")
+SUMMARY_GRANULARITIES = ("month", "year")
+
+def rollup_period(value: Union[date, datetime]) -> date:
+    """
+    First day of the month of value, the period its expense is rolled up into.
+    """
+    return date(value.year, value.month, 1)
+
+def rollup_deltas() -> Dict[Tuple[int, str, date], Dict[str, float]]:
+    """
+    Empty (user_id, currency, period) -> column deltas mapping for ExpenseService._apply_deltas.
+    """
+    return defaultdict(lambda: {"spent": 0.0, "paid": 0.0, "settled": 0.0, "expense_count": 0})
+
+class SpendingRollupService:
+    """
+    Service for the spending rollups: per (user, currency, month) totals of the user's shares,
+    the expenses they paid for and the settled part of their shares. ExpenseService keeps them
+    current on every write, so a summary reads one row per period instead of every split of
+    the user's history; rebuild() regenerates them from the expenses and splits.
+    """
+
+    @staticmethod
+    def add_expense_deltas(deltas, creator_id: int, currency: str, period: date, amount: float, splits: Dict[int, float], sign: int = 1):
+        # Each participant spent their share of the expense, the creator paid all of it
+        for split_user_id, amount_owed in splits.items():
+            deltas[(split_user_id, currency, period)]["spent"] += sign * amount_owed
+            deltas[(split_user_id, currency, period)]["expense_count"] += sign
+        deltas[(creator_id, currency, period)]["paid"] += sign * amount
+
+    @staticmethod
+    def add_settled_deltas(deltas, currency: str, period: date, settled: Dict[int, float], sign: int = 1):
+        for split_user_id, amount_owed in settled.items():
+            deltas[(split_user_id, currency, period)]["settled"] += sign * amount_owed
+
+    @staticmethod
+    def get_summary(
+        db: Session,
+        user_id: int,
+        granularity: str = "month",
+        currency: Optional[str] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[Dict]:
+        """
+        Returns the user's spending per period and currency, oldest first. Years are summed
+        from their months. start and end select the months they fall in, both included.
+        """
+        if granularity not in SUMMARY_GRANULARITIES:
+            raise ValueError(f"Granularity must be one of: {', '.join(SUMMARY_GRANULARITIES)}")
+        conditions = [SpendingRollup.user_id == user_id]
+        if currency is not None:
+            conditions.append(SpendingRollup.currency == currency)
+        if start is not None:
+            conditions.append(SpendingRollup.period >= rollup_period(start))
+        if end is not None:
+            conditions.append(SpendingRollup.period <= rollup_period(end))
+        rows = db.execute(
+            select(SpendingRollup.period, SpendingRollup.currency, *(getattr(SpendingRollup, column) for column in ROLLUP_COLUMNS))
+            .where(*conditions)
+            .order_by(SpendingRollup.period, SpendingRollup.currency)
+        )
+
+        totals = {}
+        for row in rows:
+            period = row.period if granularity == "month" else date(row.period.year, 1, 1)
+            total = totals.setdefault((period, row.currency), {"period": period, "currency": row.currency, **dict.fromkeys(ROLLUP_COLUMNS, 0)})
+            for column in ROLLUP_COLUMNS:
+                total[column] += getattr(row, column)
+
+        summary = []
+        for total in totals.values():
+            # Rounded to the currency's minor unit, dropping the float drift of incremental updates
+            exponent = minor_unit_exponent(total["currency"])
+            for column in ("spent", "paid", "settled"):
+                total[column] = round(total[column], exponent) + 0.0
+            # Periods whose expenses were all moved or reverted leave rows of zeros behind
+            if total["expense_count"] or total["paid"]:
+                summary.append(total)
+        return sorted(summary, key=lambda total: (total["period"], total["currency"]))
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """
+        Regenerates every rollup from the expenses and splits in one INSERT ... SELECT.
+        Returns the number of rollup rows written. Run with writes stopped, or changes
+        committed while it runs may be missing from the result.
+        """
+        db.execute(delete(SpendingRollup))
+        period = SpendingRollupService._period_expression(db, Expense.created_at)
+        shares = select(
+            ExpenseSplit.user_id.label("user_id"),
+            Expense.currency.label("currency"),
+            period.label("period"),
+            ExpenseSplit.amount_owed.label("spent"),
+            literal(0.0).label("paid"),
+            # The creator's own share is never owed, so settling it is not counted
+            case(
+                (and_(ExpenseSplit.is_settled == True, ExpenseSplit.user_id != Expense.expense_created_by), ExpenseSplit.amount_owed),
+                else_=0.0,
+            ).label("settled"),
+            literal(1).label("expense_count"),
+        ).join(Expense, Expense.id == ExpenseSplit.expense_id)
+        payments = select(
+            Expense.expense_created_by, Expense.currency, period, literal(0.0), Expense.amount, literal(0.0), literal(0),
+        )
+        rows = union_all(shares, payments).subquery()
+        totals = select(
+            rows.c.user_id, rows.c.currency, rows.c.period, *(func.sum(rows.c[column]) for column in ROLLUP_COLUMNS),
+        ).group_by(rows.c.user_id, rows.c.currency, rows.c.period)
+        return db.execute(
+            insert(SpendingRollup).from_select(["user_id", "currency", "period", *ROLLUP_COLUMNS], totals)
+        ).rowcount
+
+    @staticmethod
+    def _period_expression(db: Session, column):
+        # SQLite stores dates as YYYY-MM-DD text, which date() produces
+        if db.get_bind().dialect.name == "sqlite":
+            return func.date(column, "start of month")
+        return cast(func.date_trunc("month", column), Date)
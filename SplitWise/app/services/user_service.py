@@ -1,21 +1,25 @@
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate
-from passlib.context import CryptContext
+from app.utils.auth import invalidate_user
 
 class UserService:
     """
     Service for handling user-related operations.
+    Passwords arrive already hashed; bcrypt runs in the hashing pool (see AsyncUserService).
     """
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
     @staticmethod
     def get_user_by_email(db: Session, email: str):
         return db.query(User).filter(User.email == email).first()
 
     @staticmethod
-    def create_user(db: Session, user: UserCreate):
-        hashed_password = UserService.pwd_context.hash(user.password)
+    def get_user_by_id(db: Session, user_id: int):
+        return db.query(User).filter(User.id == user_id).first()
+
+    @staticmethod
+    def create_user(db: Session, user: UserCreate, hashed_password: str):
         db_user = User(name=user.name, email=user.email, password=hashed_password)
         db.add(db_user)
         db.flush()             
@@ -23,8 +27,13 @@ class UserService:
         return db_user
 
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str):
-        user = UserService.get_user_by_email(db, email)
-        if not user or not UserService.pwd_context.verify(password, user.password):
-            return False
+    def update_password_hash(db: Session, user: User, hashed_password: str):
+        user.password = hashed_password
+        db.flush()
         return user
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_principal(mapper, connection, target):
+    # Any change to a user drops the principals cached for their tokens
+    invalidate_user(target.id)
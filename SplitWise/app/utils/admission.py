@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+from app.database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+from app.utils import metrics
+
+# Requests allowed past admission at once; defaults to what the connection pool can serve. 0 disables the limit
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+ADMISSION_QUEUE_LIMIT = int(os.getenv('ADMISSION_QUEUE_LIMIT', '100'))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', '1000'))
+# Admitted plus queued requests per user; 0 disables the cap
+ADMISSION_PER_USER_LIMIT = int(os.getenv('ADMISSION_PER_USER_LIMIT', '4'))
+# Admitted plus queued requests per client address for requests without a valid token; 0 (the
+# default) disables the cap, since behind a proxy or NAT many users share one address
+ADMISSION_ANONYMOUS_LIMIT = int(os.getenv('ADMISSION_ANONYMOUS_LIMIT', '0'))
+# Path prefixes that are never queued (health checks, metrics, API docs)
+ADMISSION_EXEMPT_PATHS = tuple(path.strip() for path in os.getenv('ADMISSION_EXEMPT_PATHS', '/core/,/docs,/redoc,/openapi.json').split(',') if path.strip())
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is turned away; status is 429 for the per-user and per-client caps
+    and 503 otherwise.
+    """
+    def __init__(self, status: int, reason: str, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.reason = reason
+
+class AdmissionController:
+    """
+    Bounds the requests a worker serves at once so they wait here, briefly and in order,
+    instead of on the threadpool and the connection pool. Up to max_in_flight requests run;
+    the next queue_limit wait up to queue_timeout seconds for a slot, handed over first come,
+    first served; the rest are rejected at once. Each user may hold at most per_user_limit
+    running or queued requests, and each client address at most anonymous_limit of those
+    made without a user. Limits are per process and must be used from one event loop.
+    """
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, queue_limit: int = ADMISSION_QUEUE_LIMIT,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_MS / 1000, per_user_limit: int = ADMISSION_PER_USER_LIMIT,
+                 anonymous_limit: int = ADMISSION_ANONYMOUS_LIMIT):
+        self.max_in_flight = max_in_flight
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.per_user_limit = per_user_limit
+        self.anonymous_limit = anonymous_limit
+        self.in_flight = 0
+        self._waiters = deque()
+        self._per_user: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0 or self.per_user_limit > 0 or self.anonymous_limit > 0
+
+    async def acquire(self, user: Optional[str] = None, client: Optional[str] = None):
+        """
+        Waits for a slot, counting the request against user, or against client when there is
+        no user. The caller must call release with the same arguments once the request is finished.
+        """
+        key, limit = self._bucket(user, client)
+        if key is not None:
+            if self._per_user.get(key, 0) >= limit:
+                if user is not None:
+                    self._reject(429, 'user_limit', "Too many concurrent requests for this user, retry shortly")
+                self._reject(429, 'client_limit', "Too many concurrent requests from this address, retry shortly")
+            self._per_user[key] = self._per_user.get(key, 0) + 1
+        try:
+            await self._acquire_slot()
+        except BaseException:
+            self._release_user(key)
+            raise
+
+    def release(self, user: Optional[str] = None, client: Optional[str] = None):
+        self._release_user(self._bucket(user, client)[0])
+        if self.max_in_flight <= 0:
+            return
+        # Hand the slot straight to the longest waiter, so in_flight never dips below the limit under load
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._report()
+                return
+        self.in_flight -= 1
+        self._report()
+
+    async def _acquire_slot(self):
+        if self.max_in_flight <= 0:
+            return
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._report()
+            return
+        if len(self._waiters) >= self.queue_limit:
+            self._reject(503, 'queue_full', "Server is busy, retry shortly")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._report()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.cancel():
+                self._waiters.remove(waiter)
+                self._report()
+                if isinstance(e, asyncio.TimeoutError):
+                    self._reject(503, 'queue_timeout', "Server is busy, retry shortly")
+                raise
+            # The slot was handed over as the deadline passed; keep it unless the request is gone
+            if isinstance(e, asyncio.CancelledError):
+                self.release()
+                raise
+        metrics.admission_queue_wait.observe(time.perf_counter() - start)
+
+    def _bucket(self, user: Optional[str], client: Optional[str]) -> Tuple[Optional[str], int]:
+        # The counter a request is held in and its cap; None when no cap applies
+        if user is not None:
+            return (f"user:{user}", self.per_user_limit) if self.per_user_limit > 0 else (None, 0)
+        if client is not None and self.anonymous_limit > 0:
+            return f"client:{client}", self.anonymous_limit
+        return None, 0
+
+    def _release_user(self, key: Optional[str]):
+        if key is None:
+            return
+        count = self._per_user.get(key, 0) - 1
+        if count > 0:
+            self._per_user[key] = count
+        else:
+            self._per_user.pop(key, None)
+
+    def _reject(self, status: int, reason: str, detail: str):
+        metrics.admission_rejections.inc(reason=reason)
+        raise AdmissionRejected(status, reason, detail)
+
+    def _report(self):
+        metrics.admission_in_flight.set(self.in_flight)
+        metrics.admission_queue_depth.set(len(self._waiters))
+
+admission_controller = AdmissionController()
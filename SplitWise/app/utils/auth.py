@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
+from typing import Optional
 from app.schemas.user import TokenData
+from app.utils.cache import TTLCache
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException
 import os
@@ -8,16 +9,34 @@ import os
 SECRET_KEY = os.getenv('SECRET_KEY', 'your_default_secret_key')
 ALGORITHM = os.getenv('ALGORITHM', 'HS256')
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES', '30'))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv('AUTH_CACHE_TTL_SECONDS', '60'))
+AUTH_CACHE_MAX_SIZE = int(os.getenv('AUTH_CACHE_MAX_SIZE', '10000'))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
+# Resolved principals keyed by token and tagged with the user id, so a cache hit
+# skips both the JWT decode and the user lookup
+principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: int):
+    """
+    Drops every cached principal of a user; call whenever the user changes.
+    """
+    principal_cache.invalidate_tags([user_id])
+
+# python-jose pulls in its rsa/ecdsa/pyasn1 backends on import, so it is imported on the
+# first token operation rather than at worker boot
 def create_access_token(data: dict):
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_token(token: str = Depends(oauth2_scheme)):
+    from jose import JWTError, jwt
+
     credentials_exception = HTTPException(
         status_code=401,
         detail="Invalid authentication credentials",
@@ -28,7 +47,26 @@ def verify_token(token: str = Depends(oauth2_scheme)):
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, user_id=payload.get("uid"), expires_at=payload.get("exp"))
     except JWTError:
         raise credentials_exception
     return token_data
+
+def token_subject(authorization: str) -> Optional[str]:
+    """
+    Returns the subject of a bearer token once its signature and expiry check out, from the
+    principal cache when the token was recently resolved. Invalid or missing tokens give None,
+    so a forged subject can never be charged to, or routed as, another user.
+    """
+    from jose import JWTError, jwt
+
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal.email
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get('sub')
+    except JWTError:
+        return None
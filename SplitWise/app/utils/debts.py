@@ -0,0 +1,55 @@
+import heapq
+import os
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.utils.cache import TTLCache
+
+DEBT_CACHE_TTL_SECONDS = float(os.getenv('DEBT_CACHE_TTL_SECONDS', '30'))
+DEBT_CACHE_MAX_SIZE = int(os.getenv('DEBT_CACHE_MAX_SIZE', '10000'))
+
+# Amounts smaller than this are treated as settled
+EPSILON = 0.005
+
+def simplify_debts(net_positions: Dict[int, float]) -> List[Tuple[int, int, float]]:
+    """
+    Greedy minimum cash flow: repeatedly matches the largest creditor with the largest debtor.
+    Produces at most n - 1 transfers as (from_user_id, to_user_id, amount).
+    """
+    creditors = [(-amount, user_id) for user_id, amount in net_positions.items() if amount > EPSILON]
+    debtors = [(amount, user_id) for user_id, amount in net_positions.items() if amount < -EPSILON]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor_id = heapq.heappop(creditors)
+        debit, debtor_id = heapq.heappop(debtors)
+        amount = min(-credit, -debit)
+        transfers.append((debtor_id, creditor_id, round(amount, 2)))
+        if -credit - amount > EPSILON:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+        if -debit - amount > EPSILON:
+            heapq.heappush(debtors, (debit + amount, debtor_id))
+    return transfers
+
+# Simplified plans keyed by (user_id, currency) and tagged with every member of the user set
+# they were computed from, so a write touching any member drops them. The TTL bounds
+# staleness from writes committed by other workers.
+simplified_debt_cache = TTLCache(maxsize=DEBT_CACHE_MAX_SIZE, ttl=DEBT_CACHE_TTL_SECONDS)
+
+def mark_debts_changed(db: Session, user_ids: Iterable[int]):
+    """
+    Records users whose debts changed; their cached plans are dropped once the session commits.
+    """
+    db.info.setdefault('debt_touched_users', set()).update(user_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session):
+    touched = session.info.pop('debt_touched_users', None)
+    if touched:
+        simplified_debt_cache.invalidate_tags(touched)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session: Session):
+    session.info.pop('debt_touched_users', None)
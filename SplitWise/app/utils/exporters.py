@@ -0,0 +1,68 @@
+import csv
+import io
+import os
+import zlib
+from typing import AsyncIterator, Dict, Optional, Sequence
+import orjson
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+# Row layout of ExpenseService.user_export_query, one row per split
+EXPENSE_COLUMNS = ['description', 'currency', 'amount', 'split_type', 'group_id', 'id', 'expense_created_by', 'created_at', 'is_settled']
+CSV_EXPORT_COLUMNS = [
+    'expense_id', 'created_at', 'description', 'currency', 'amount', 'split_type', 'group_id',
+    'expense_created_by', 'is_settled', 'split_id', 'user_id', 'amount_owed', 'split_is_settled',
+]
+
+async def iter_csv(batches: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    """
+    Encodes export rows as CSV, one line per split, one chunk per batch.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [row.id, row.created_at.isoformat(), row.description, row.currency, row.amount, row.split_type, row.group_id,
+             row.expense_created_by, row.is_settled, row.split_id, row.user_id, row.amount_owed, row.split_is_settled]
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+
+async def iter_ndjson(batches: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    """
+    Encodes export rows as NDJSON, one expense per line with its splits nested as in the
+    Expense schema. Rows must arrive ordered by expense; only the current expense is held
+    back, since its splits may continue in the next batch.
+    """
+    current: Optional[Dict] = None
+    async for rows in batches:
+        lines = []
+        for row in rows:
+            if current is None or current['id'] != row.id:
+                if current is not None:
+                    lines.append(orjson.dumps(current))
+                current = {column: getattr(row, column) for column in EXPENSE_COLUMNS}
+                current['splits'] = []
+            current['splits'].append({
+                'user_id': row.user_id, 'amount_owed': row.amount_owed, 'id': row.split_id,
+                'expense_id': row.expense_id, 'is_settled': row.split_is_settled,
+            })
+        if lines:
+            yield b'\n'.join(lines) + b'\n'
+    if current is not None:
+        yield orjson.dumps(current) + b'\n'
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """
+    Compresses a byte stream into a gzip member on the fly.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
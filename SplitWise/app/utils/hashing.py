@@ -0,0 +1,84 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+HASH_POOL_SIZE = int(os.getenv('HASH_POOL_SIZE', str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', str(HASH_POOL_SIZE * 8)))
+
+class HashingPoolSaturated(Exception):
+    """
+    Raised when the hashing pool already has HASH_QUEUE_LIMIT jobs in flight.
+    """
+
+@lru_cache(maxsize=None)
+def _crypt_context(rounds: int) -> 'CryptContext':
+    # Imported on first use: passlib only runs in the hashing pool's worker processes
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return _crypt_context(rounds).hash(password)
+
+def verify_password(password: str, hashed_password: str, rounds: int = BCRYPT_ROUNDS) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password and returns a fresh hash when the stored one uses a different work factor.
+    """
+    return _crypt_context(rounds).verify_and_update(password, hashed_password)
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated, size-bounded process pool so hashing never holds a
+    request thread or the event loop. Jobs beyond the queue limit are rejected immediately.
+    """
+    def __init__(self, pool_size: int = HASH_POOL_SIZE, queue_limit: int = HASH_QUEUE_LIMIT, rounds: int = BCRYPT_ROUNDS):
+        self.pool_size = pool_size
+        self.queue_limit = queue_limit
+        self.rounds = rounds
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._submit(verify_password, password, hashed_password, self.rounds)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.queue_limit:
+                self.rejected += 1
+                raise HashingPoolSaturated("Password hashing is saturated, retry shortly")
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+            try:
+                future = self._executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A crashed worker breaks the pool for good; start a new one next time
+                self._executor = None
+                raise
+            self.in_flight += 1
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+password_hasher = PasswordHasher()
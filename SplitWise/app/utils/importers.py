@@ -0,0 +1,100 @@
+import csv
+import json
+import os
+from typing import AsyncIterator, Dict, List
+
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))
+# Longest line accepted; a longer one stops the import before more of it is buffered
+IMPORT_MAX_LINE_BYTES = int(os.getenv('IMPORT_MAX_LINE_BYTES', str(64 * 1024)))
+
+CSV_COLUMNS = ['description', 'currency', 'amount', 'split_type', 'splits']
+# Optional columns, left empty when not used
+CSV_OPTIONAL_COLUMNS = ['group_id']
+
+class ImportFormatError(ValueError):
+    """
+    Raised when the body cannot be read as lines: a line is not valid UTF-8 or is longer
+    than IMPORT_MAX_LINE_BYTES. The import stops with a 400.
+    """
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Yields decoded, non-empty lines from a byte stream without buffering the whole body:
+    at most one line of IMPORT_MAX_LINE_BYTES is held. Raises ImportFormatError, with the
+    1-based line number, on a line that is too long or not UTF-8.
+    """
+    # Each byte is copied into pending once, so long lines cost linear time
+    pending = bytearray()
+    line_number = 1
+    async for chunk in stream:
+        start = 0
+        while (end := chunk.find(b'\n', start)) >= 0:
+            pending += chunk[start:end]
+            start = end + 1
+            line = finish_line(pending, line_number)
+            if line:
+                yield line
+            pending.clear()
+            line_number += 1
+        pending += chunk[start:]
+        check_line_length(pending, line_number)
+    line = finish_line(pending, line_number)
+    if line:
+        yield line
+
+def check_line_length(line: bytearray, line_number: int):
+    if len(line) > IMPORT_MAX_LINE_BYTES:
+        raise ImportFormatError(f"Line {line_number} is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+
+def finish_line(line: bytearray, line_number: int) -> str:
+    check_line_length(line, line_number)
+    try:
+        return line.strip().decode('utf-8')
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"Line {line_number} is not valid UTF-8")
+
+def parse_ndjson_row(line: str) -> Dict:
+    """
+    Parses one NDJSON line into an ExpenseCreate payload.
+    """
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("Row must be a JSON object")
+    return row
+
+def parse_csv_splits(value: str) -> List[Dict]:
+    """
+    Parses the CSV splits column: '1;2;3' for equal splits, '1:30;2:70' otherwise.
+    """
+    splits = []
+    for item in value.split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        user_id, _, amount_owed = item.partition(':')
+        splits.append({"user_id": user_id, "amount_owed": amount_owed or None})
+    return splits
+
+def parse_csv_row(line: str, header: List[str]) -> Dict:
+    """
+    Parses one CSV line into an ExpenseCreate payload using the header columns.
+    """
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+    row = dict(zip(header, values))
+    row['splits'] = parse_csv_splits(row.get('splits', ''))
+    for column in CSV_OPTIONAL_COLUMNS:
+        if not row.get(column):
+            row.pop(column, None)
+    return row
+
+def parse_csv_header(line: str) -> List[str]:
+    """
+    Parses and validates the CSV header line.
+    """
+    header = [column.strip() for column in next(csv.reader([line]))]
+    missing = [column for column in CSV_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+    return header
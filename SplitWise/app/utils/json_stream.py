@@ -0,0 +1,26 @@
+from typing import AsyncIterator, Dict, List
+import orjson
+from fastapi import Request
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+async def iter_json(batches: AsyncIterator[List[Dict]], ndjson: bool = False) -> AsyncIterator[bytes]:
+    """
+    Encodes batches of rows with orjson as they arrive, one chunk per batch: a JSON array
+    by default, or one object per line for NDJSON.
+    """
+    if ndjson:
+        async for rows in batches:
+            if rows:
+                yield b'\n'.join(map(orjson.dumps, rows)) + b'\n'
+        return
+
+    separator = b'['
+    async for rows in batches:
+        if rows:
+            yield separator + b','.join(map(orjson.dumps, rows))
+            separator = b','
+    yield b'[]' if separator == b'[' else b']'
@@ -0,0 +1,241 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+QUERY_COUNT_WARN = int(os.getenv('QUERY_COUNT_WARN', '20'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge:
+    """
+    Value that can go up and down, with optional labels.
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets and optional labels.
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then the +Inf count and the sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    bucket_labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+                bucket_labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+class Registry:
+    """
+    Collection of metrics rendered together in the Prometheus text exposition format.
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    'splitwise_http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route')))
+http_responses = registry.register(Counter(
+    'splitwise_http_responses_total', 'HTTP responses by route and status.', ('method', 'route', 'status')))
+http_errors = registry.register(Counter(
+    'splitwise_http_errors_total', 'HTTP responses with status >= 400 by status.', ('status',)))
+db_queries_per_request = registry.register(Histogram(
+    'splitwise_db_queries_per_request', 'SQL statements issued per request.', ('route',), QUERY_COUNT_BUCKETS))
+db_query_time_per_request = registry.register(Histogram(
+    'splitwise_db_query_seconds_per_request', 'Total SQL time per request.', ('route',)))
+db_queries = registry.register(Counter(
+    'splitwise_db_queries_total', 'SQL statements executed.'))
+db_query_seconds = registry.register(Counter(
+    'splitwise_db_query_seconds_total', 'Total time spent executing SQL statements.'))
+db_slow_queries = registry.register(Counter(
+    'splitwise_db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS.'))
+db_pool_checkout_wait = registry.register(Histogram(
+    'splitwise_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.'))
+db_routed_sessions = registry.register(Counter(
+    'splitwise_db_routed_sessions_total', 'Read-only requests routed to a replica, or to the primary because none was healthy.', ('target',)))
+admission_in_flight = registry.register(Gauge(
+    'splitwise_admission_in_flight', 'Requests admitted and not yet finished.'))
+admission_queue_depth = registry.register(Gauge(
+    'splitwise_admission_queue_depth', 'Requests waiting for admission.'))
+admission_queue_wait = registry.register(Histogram(
+    'splitwise_admission_queue_wait_seconds', 'Time admitted requests spent waiting in the admission queue.'))
+admission_rejections = registry.register(Counter(
+    'splitwise_admission_rejections_total', 'Requests turned away by admission control: queue_full, queue_timeout, user_limit or client_limit.', ('reason',)))
+projector_entries = registry.register(Counter(
+    'splitwise_projector_entries_total', 'Balance journal entries folded into balances.'))
+projector_batch_size = registry.register(Histogram(
+    'splitwise_projector_batch_entries', 'Journal entries per projector batch.', (), (1, 10, 100, 1000, 5000, 10000)))
+projector_batch_seconds = registry.register(Histogram(
+    'splitwise_projector_batch_seconds', 'Time to project one journal batch.'))
+response_cache_requests = registry.register(Counter(
+    'splitwise_response_cache_requests_total', 'Conditional GETs by outcome: not_modified, hit or miss.', ('result',)))
+
+class RequestStats:
+    """
+    SQL statement count and time accumulated for the current request.
+    """
+    __slots__ = ('queries', 'query_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar('current_request_stats', default=None)
+
+# When the current session started asking for a connection; the pool checkout event reads it
+_checkout_started: ContextVar[Optional[float]] = ContextVar('checkout_started', default=None)
+
+def _session_needs_connection(*args):
+    # Sessions acquire their connection on the first execute or flush of a transaction
+    _checkout_started.set(time.perf_counter())
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    start = _checkout_started.get()
+    if start is not None:
+        _checkout_started.set(None)
+        db_pool_checkout_wait.observe(time.perf_counter() - start)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The session already held its connection; forget the start so a later checkout is not timed from it
+    if _checkout_started.get() is not None:
+        _checkout_started.set(None)
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    db_queries.inc()
+    db_query_seconds.inc(elapsed)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+    if elapsed * 1000 > SLOW_QUERY_MS:
+        db_slow_queries.inc()
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+def instrument_engine(engine):
+    """
+    Hooks statement counting, SQL timing and pool checkout wait into a sync engine.
+    For async engines pass async_engine.sync_engine. Checkout wait is the time from a
+    session's execute or flush to the pool handing over a connection, so connections
+    taken outside a session are not timed. Pool listeners carry over when the pool is
+    recreated, e.g. by engine.dispose().
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'checkout', _on_checkout)
+    # Session events are class-wide, so they are registered once for every engine
+    if not event.contains(Session, 'do_orm_execute', _session_needs_connection):
+        event.listen(Session, 'do_orm_execute', _session_needs_connection)
+        event.listen(Session, 'before_flush', _session_needs_connection)
+
+def record_request(method: str, route: str, status: int, duration: float, stats: RequestStats):
+    """
+    Records one finished request and warns when it issued more than QUERY_COUNT_WARN statements.
+    """
+    http_request_duration.observe(duration, method=method, route=route)
+    http_responses.inc(method=method, route=route, status=status)
+    if status >= 400:
+        http_errors.inc(status=status)
+    if stats.queries:
+        db_queries_per_request.observe(stats.queries, route=route)
+        db_query_time_per_request.observe(stats.query_seconds, route=route)
+    if stats.queries > QUERY_COUNT_WARN:
+        logger.warning("%s %s issued %d SQL statements (limit %d)", method, route, stats.queries, QUERY_COUNT_WARN)
@@ -0,0 +1,50 @@
+import base64
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
+# Rows fetched and encoded per chunk when a page is streamed
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '100'))
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Encodes a (created_at, id) keyset position as an opaque URL-safe cursor.
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Decodes a cursor produced by encode_cursor, raising ValueError if it is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def encode_rank_cursor(score: float, row_id: int) -> str:
+    """
+    Encodes a (score, id) keyset position of a ranked result list, like encode_cursor.
+    The position is only exact while the scores stay the same between requests.
+    """
+    raw = f"{score!r}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_rank_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    """
+    Decodes a cursor produced by encode_rank_cursor, raising ValueError if it is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        score, row_id = raw.split('|')
+        return float(score), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.utils import metrics
+from app.utils.cache import TTLCache
+
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv('RESPONSE_CACHE_MAX_SIZE', '10000'))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '300'))
+# Streamed bodies larger than this are sent but not cached
+RESPONSE_CACHE_MAX_BODY_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BODY_BYTES', str(1024 * 1024)))
+# Optional shared cache, e.g. redis://localhost:6379/0; empty keeps the cache in-process
+RESPONSE_CACHE_URL = os.getenv('RESPONSE_CACHE_URL', '')
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend(ABC):
+    """
+    Shared byte store behind the in-process response cache. Implementations must be thread-safe.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        pass
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process backend. One instance shared by several ResponseCache objects behaves like a
+    shared cache between workers, which makes it the backend to use in tests.
+    """
+    def __init__(self, maxsize: int = RESPONSE_CACHE_MAX_SIZE):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._cache.set(key, value, ttl=ttl)
+
+class RedisBackend(CacheBackend):
+    """
+    Backend over any client with Redis' get/set(ex=) interface, such as redis.Redis or fakeredis.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisBackend':
+        # redis is an optional dependency, only needed when RESPONSE_CACHE_URL is set
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL is set but the redis package is not installed. Run pip install redis or unset RESPONSE_CACHE_URL")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+class ResponseCache:
+    """
+    LRU of rendered response bodies in front of an optional shared backend.
+    Keys embed the user's version counter, so a write makes old entries unreachable instead
+    of invalidating them; they age out through the LRU and the TTL.
+    """
+    def __init__(self, maxsize: int = RESPONSE_CACHE_MAX_SIZE, ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+                 backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self.backend = backend
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        entry = self._local.get(key)
+        if entry is not None or self.backend is None:
+            return entry
+        try:
+            raw = await run_in_threadpool(self.backend.get, key)
+        except Exception:
+            logger.warning("Shared response cache read failed", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        payload = json.loads(raw)
+        entry = (payload["body"].encode(), payload["headers"])
+        self._local.set(key, entry)
+        return entry
+
+    async def set(self, key: str, body: bytes, headers: Dict[str, str]):
+        self._local.set(key, (body, headers))
+        if self.backend is None:
+            return
+        try:
+            raw = json.dumps({"body": body.decode(), "headers": headers}).encode()
+            await run_in_threadpool(self.backend.set, key, raw, self.ttl)
+        except Exception:
+            logger.warning("Shared response cache write failed", exc_info=True)
+
+    def clear(self):
+        self._local.clear()
+
+response_cache = ResponseCache(backend=RedisBackend.from_url(RESPONSE_CACHE_URL) if RESPONSE_CACHE_URL else None)
+
+def make_etag(key: str) -> str:
+    return '"%s"' % hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return '*' in candidates or etag in (candidate.removeprefix('W/') for candidate in candidates)
+
+async def conditional_response(
+    request: Request,
+    endpoint: str,
+    user_id: int,
+    version: int,
+    params: Dict,
+    render: Callable,
+    media_type: str = 'application/json',
+) -> Response:
+    """
+    Answers a GET for data that only changes when the user's version does: 304 when the
+    client's If-None-Match still matches, otherwise the cached or freshly rendered body.
+    render is awaited on a miss and returns (body, extra_headers), where body is bytes or
+    an async iterator of chunks to stream.
+    """
+    query = '&'.join(f'{name}={value}' for name, value in sorted(params.items()) if value is not None)
+    key = f'{endpoint}:{user_id}:{version}:{query}'
+    etag = make_etag(key)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        metrics.response_cache_requests.inc(result='not_modified')
+        return Response(status_code=304, headers=headers)
+
+    entry = await response_cache.get(key)
+    if entry is not None:
+        metrics.response_cache_requests.inc(result='hit')
+        body, extra_headers = entry
+    else:
+        metrics.response_cache_requests.inc(result='miss')
+        body, extra_headers = await render()
+        if not isinstance(body, bytes):
+            return StreamingResponse(cache_stream(key, body, extra_headers), media_type=media_type, headers={**extra_headers, **headers})
+        await response_cache.set(key, body, extra_headers)
+    return Response(content=body, media_type=media_type, headers={**extra_headers, **headers})
+
+async def cache_stream(key: str, chunks: AsyncIterator[bytes], headers: Dict[str, str]) -> AsyncIterator[bytes]:
+    # Passes chunks through and caches the body once complete, unless it outgrew the limit
+    parts = []
+    size = 0
+    async for chunk in chunks:
+        yield chunk
+        if parts is not None:
+            size += len(chunk)
+            if size > RESPONSE_CACHE_MAX_BODY_BYTES:
+                parts = None
+            else:
+                parts.append(chunk)
+    if parts is not None:
+        await response_cache.set(key, b''.join(parts), headers)
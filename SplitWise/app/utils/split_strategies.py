@@ -1,54 +1,176 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Optional
 from app.schemas.enums import SplitTypeEnum
 
+# ISO 4217 currencies whose minor unit is not cents; everything else uses 2 decimals
+CURRENCY_EXPONENTS = {
+    'JPY': 0, 'KRW': 0, 'VND': 0, 'CLP': 0, 'ISK': 0, 'UGX': 0, 'XAF': 0, 'XOF': 0,
+    'BHD': 3, 'KWD': 3, 'OMR': 3, 'JOD': 3, 'TND': 3, 'LYD': 3, 'IQD': 3,
+}
+
+# Percentages are handled as integers with 4 decimals, so 33.3333% is exact
+PERCENT_SCALE = 10 ** 4
+FULL_PERCENT = 100 * PERCENT_SCALE
+
+def minor_unit_exponent(currency: Optional[str]) -> int:
+    return CURRENCY_EXPONENTS.get((currency or '').upper(), 2)
+
+def to_minor(amount: float, exponent: int = 2) -> int:
+    return int(round(amount * 10 ** exponent))
+
+def from_minor(units: int, exponent: int = 2) -> float:
+    return units / 10 ** exponent
+
+class SplitBatch:
+    """
+    Result of calculate_many, kept as flat arrays: the shares of expense i are
+    user_ids[offsets[i]:offsets[i + 1]] and shares[...] (integer minor units).
+    Invalid expenses have valid[i] == False and an entry in errors.
+    """
+    def __init__(self, offsets, user_ids, shares, valid, errors: Dict[int, str], exponent: int):
+        self.offsets = offsets
+        self.user_ids = user_ids
+        self.shares = shares
+        self.valid = valid
+        self.errors = errors
+        self.exponent = exponent
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def to_dicts(self) -> List[Optional[Dict[int, float]]]:
+        """
+        Converts the batch to one {user_id: amount_owed} dict per expense (None where invalid).
+        """
+        values = (self.shares / 10 ** self.exponent).tolist()
+        user_ids = self.user_ids.tolist()
+        offsets = self.offsets.tolist()
+        valid = self.valid.tolist()
+        return [
+            dict(zip(user_ids[offsets[i]:offsets[i + 1]], values[offsets[i]:offsets[i + 1]])) if valid[i] else None
+            for i in range(len(self))
+        ]
+
 class SplitStrategy(ABC):
     """
     Abstract base class for split strategies.
+    Strategies are stateless and work in integer minor units, so the returned
+    shares always add up to the expense amount exactly.
     """
     @abstractmethod
-    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float] = None) -> Dict[int, float]:
+    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float] = None, exponent: int = 2) -> Dict[int, float]:
+        pass
+
+    @abstractmethod
+    def calculate_many(self, amounts: List[float], users: List[list], splits_info: List[Dict[int, float]] = None, exponent: int = 2) -> SplitBatch:
+        """
+        Splits many expenses at once with NumPy; results match calculate_splits exactly.
+        """
         pass
 
+    @staticmethod
+    def _flatten(np, amounts: List[float], groups: List[list], exponent: int):
+        # Flat per-share arrays plus, for every share, the index of its expense and its position in it
+        totals = np.rint(np.asarray(amounts, dtype=np.float64) * 10 ** exponent).astype(np.int64)
+        counts = np.fromiter((len(group) for group in groups), dtype=np.int64, count=len(groups))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        expense_index = np.repeat(np.arange(len(groups)), counts)
+        position = np.arange(offsets[-1]) - offsets[expense_index]
+        user_ids = np.fromiter((user_id for group in groups for user_id in group), dtype=np.int64, count=offsets[-1])
+        return totals, counts, offsets, expense_index, position, user_ids
+
 class EqualSplitStrategy(SplitStrategy):
     """
-    Strategy for equal splits.
+    Strategy for equal splits. Leftover minor units go to the first participants.
     """
-    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float] = None) -> Dict[int, float]:
-        per_person = amount / len(users)
-        return {user_id: per_person for user_id in users}
+    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float] = None, exponent: int = 2) -> Dict[int, float]:
+        base, leftover = divmod(to_minor(amount, exponent), len(users))
+        return {user_id: from_minor(base + (index < leftover), exponent) for index, user_id in enumerate(users)}
+
+    def calculate_many(self, amounts: List[float], users: List[list], splits_info: List[Dict[int, float]] = None, exponent: int = 2) -> SplitBatch:
+        import numpy as np
+
+        totals, counts, offsets, expense_index, position, user_ids = self._flatten(np, amounts, users, exponent)
+        valid = counts > 0
+        base, leftover = np.divmod(totals, np.maximum(counts, 1))
+        shares = base[expense_index] + (position < leftover[expense_index])
+        errors = {int(i): "Splits must be provided" for i in np.flatnonzero(~valid)}
+        return SplitBatch(offsets, user_ids, shares, valid, errors, exponent)
 
 class PercentageSplitStrategy(SplitStrategy):
     """
-    Strategy for percentage splits.
+    Strategy for percentage splits. Shares are rounded with the largest-remainder rule,
+    ties going to the earlier participant.
     """
-    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float]) -> Dict[int, float]:
-        total_percentage = sum(splits_info.values())
-        if total_percentage != 100:
+    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float], exponent: int = 2) -> Dict[int, float]:
+        percentages = [int(round(percentage * PERCENT_SCALE)) for percentage in splits_info.values()]
+        if sum(percentages) != FULL_PERCENT:
             raise ValueError("Total percentage must sum up to 100")
-        return {user_id: amount * (percentage / 100) for user_id, percentage in splits_info.items()}
+        total = to_minor(amount, exponent)
+        floors, remainders = zip(*(divmod(total * percentage, FULL_PERCENT) for percentage in percentages))
+        shares = list(floors)
+        order = sorted(range(len(shares)), key=lambda index: (-remainders[index], index))
+        for index in order[:total - sum(shares)]:
+            shares[index] += 1
+        return {user_id: from_minor(share, exponent) for user_id, share in zip(splits_info, shares)}
+
+    def calculate_many(self, amounts: List[float], users: List[list], splits_info: List[Dict[int, float]], exponent: int = 2) -> SplitBatch:
+        import numpy as np
+
+        participants = [list(info) for info in splits_info]
+        totals, counts, offsets, expense_index, position, user_ids = self._flatten(np, amounts, participants, exponent)
+        percentages = np.rint(np.fromiter(
+            (value for info in splits_info for value in info.values()), dtype=np.float64, count=offsets[-1]
+        ) * PERCENT_SCALE).astype(np.int64)
+        valid = np.bincount(expense_index, weights=percentages, minlength=len(amounts)) == FULL_PERCENT
+
+        floors, remainders = np.divmod(totals[expense_index] * percentages, FULL_PERCENT)
+        leftover = totals - np.bincount(expense_index, weights=floors, minlength=len(amounts)).astype(np.int64)
+
+        # Rank each share within its expense by descending remainder, ties by position
+        order = np.lexsort((position, -remainders, expense_index))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order)) - offsets[expense_index[order]]
+        shares = floors + (rank < leftover[expense_index])
+
+        errors = {int(i): "Total percentage must sum up to 100" for i in np.flatnonzero(~valid)}
+        return SplitBatch(offsets, user_ids, shares, valid, errors, exponent)
 
 class UnequalSplitStrategy(SplitStrategy):
     """
-    Strategy for unequal splits.
+    Strategy for unequal splits. Given amounts must add up to the total in minor units.
     """
-    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float]) -> Dict[int, float]:
-        total_amount = sum(splits_info.values())
-        if abs(total_amount - amount) > 0.01:
+    def calculate_splits(self, amount: float, users: list, splits_info: Dict[int, float], exponent: int = 2) -> Dict[int, float]:
+        shares = {user_id: to_minor(value, exponent) for user_id, value in splits_info.items()}
+        if sum(shares.values()) != to_minor(amount, exponent):
             raise ValueError("Total split amounts do not sum up to total amount")
-        return splits_info
+        return {user_id: from_minor(share, exponent) for user_id, share in shares.items()}
+
+    def calculate_many(self, amounts: List[float], users: List[list], splits_info: List[Dict[int, float]], exponent: int = 2) -> SplitBatch:
+        import numpy as np
+
+        participants = [list(info) for info in splits_info]
+        totals, counts, offsets, expense_index, position, user_ids = self._flatten(np, amounts, participants, exponent)
+        shares = np.rint(np.fromiter(
+            (value for info in splits_info for value in info.values()), dtype=np.float64, count=offsets[-1]
+        ) * 10 ** exponent).astype(np.int64)
+        valid = np.bincount(expense_index, weights=shares, minlength=len(amounts)).astype(np.int64) == totals
+        errors = {int(i): "Total split amounts do not sum up to total amount" for i in np.flatnonzero(~valid)}
+        return SplitBatch(offsets, user_ids, shares, valid, errors, exponent)
 
 class SplitStrategyFactory:
     """
-    Factory for creating split strategy instances.
+    Factory for split strategy instances. Strategies are stateless, so one shared instance per type is reused.
     """
+    _strategies = {
+        SplitTypeEnum.EQUAL: EqualSplitStrategy(),
+        SplitTypeEnum.PERCENTAGE: PercentageSplitStrategy(),
+        SplitTypeEnum.UNEQUAL: UnequalSplitStrategy(),
+    }
+
     @staticmethod
     def get_strategy(split_type: SplitTypeEnum) -> SplitStrategy:
-        if split_type == SplitTypeEnum.EQUAL:
-            return EqualSplitStrategy()
-        elif split_type == SplitTypeEnum.PERCENTAGE:
-            return PercentageSplitStrategy()
-        elif split_type == SplitTypeEnum.UNEQUAL:
-            return UnequalSplitStrategy()
-        else:
+        strategy = SplitStrategyFactory._strategies.get(split_type)
+        if strategy is None:
             raise ValueError("Invalid split type")
+        return strategy
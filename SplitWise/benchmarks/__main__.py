@@ -0,0 +1,39 @@
+"""
+Runs the micro-benchmarks and the HTTP load test against one local SQLite file and
+writes a single JSON report that benchmarks.compare can diff between runs.
+
+    python -m benchmarks --output before.json
+    python -m benchmarks --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import platform
+import time
+from benchmarks.common import use_sqlite_file, write_report
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--quick", action="store_true", help="smaller data set for a fast smoke run")
+    parser.add_argument("--db", help="SQLite file to use (recreated)")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file(args.db)
+    from benchmarks import load, micro
+
+    scale = 10 if args.quick else 1
+    started = time.time()
+    report = {
+        "meta": {"seed": args.seed, "python": platform.python_version(), "quick": args.quick},
+        "micro": micro.run(iterations=2000 // scale, operations=200 // scale, seed=args.seed),
+        "load": load.run(requests=args.requests // scale, concurrency=args.concurrency,
+                         users=1000, groups=200, expenses=10000 // scale, seed=args.seed),
+    }
+    report["meta"]["duration_s"] = round(time.time() - started, 1)
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Overload test for admission control. Drives a burst well beyond what the connection pool
+can serve, with one scripted client flooding add_expense alongside many ordinary users,
+once with admission control disabled and once enabled. Each run is a fresh process against
+its own SQLite file.
+
+Reports, per run, latency percentiles of the requests that were served, how many were
+turned away with 503/429, how many failed otherwise (e.g. 500 on connection pool
+timeouts) and the share of served requests that belonged to the flooding client. With
+admission enabled the p99 of served requests should stay bounded near
+ADMISSION_QUEUE_TIMEOUT_MS plus service time instead of growing with the backlog.
+
+    python -m benchmarks.admission --requests 400 --concurrency 100
+
+The disabled run can take minutes: requests queue on the pool until DB_POOL_TIMEOUT.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import summarize
+
+RUNS = {
+    "disabled": {"ADMISSION_MAX_IN_FLIGHT": "0", "ADMISSION_PER_USER_LIMIT": "0"},
+    "enabled": {},
+}
+
+async def drive(app, users, requests: int, concurrency: int, flood_share: float, seed: int):
+    import httpx
+    from app.utils.auth import create_access_token
+
+    rng = random.Random(seed)
+    headers = {user_id: {"Authorization": f"Bearer {create_access_token({'sub': email, 'uid': user_id})}"}
+               for user_id, email in users}
+    user_ids = [user_id for user_id, _ in users]
+    flooder = user_ids[0]
+
+    served = []
+    served_flood = 0
+    rejected = {}
+    errors = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            nonlocal served_flood
+            flood = rng.random() < flood_share
+            user_id = flooder if flood else rng.choice(user_ids[1:])
+            async with semaphore:
+                start = time.perf_counter()
+                if flood or i % 4 == 0:
+                    others = rng.sample([other for other in user_ids if other != user_id], 2)
+                    payload = {"description": "burst", "currency": "USD", "amount": 30, "split_type": "equal",
+                               "splits": [{"user_id": user_id}] + [{"user_id": other} for other in others]}
+                    response = await client.post("/expenses/add_expense", json=payload, headers=headers[user_id])
+                else:
+                    response = await client.get("/expenses/get_balance", headers=headers[user_id])
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code in (429, 503):
+                rejected[response.status_code] = rejected.get(response.status_code, 0) + 1
+            elif response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+            else:
+                served.append(elapsed)
+                served_flood += flood
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "served": summarize(served),
+        "rejected": {str(code): count for code, count in sorted(rejected.items())},
+        "errors": {str(code): count for code, count in sorted(errors.items())},
+        "flooding_client_share_of_served": round(served_flood / max(1, len(served)), 3),
+    }
+
+def run(requests: int, concurrency: int, flood_share: float, seed: int):
+    from app.database import engine
+    from app.main import app
+    from app.middlewares import SessionLocal
+    from app.migrations import migrate
+    from app.models import User
+
+    migrate(engine)
+    db = SessionLocal()
+    db.add_all([User(name=f"burst{i}", email=f"burst{i}@example.com", password="-") for i in range(50)])
+    db.commit()
+    users = db.query(User.id, User.email).all()
+    db.close()
+    return asyncio.run(drive(app, users, requests, concurrency, flood_share, seed))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--flood-share", type=float, default=0.5, help="share of requests sent by the flooding client")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--run", choices=list(RUNS), help=argparse.SUPPRESS)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.requests, args.concurrency, args.flood_share, args.seed)))
+        return
+
+    from benchmarks.common import write_report
+
+    report = {}
+    for name, settings in RUNS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", **settings)
+            env.pop("ASYNC_DATABASE_URL", None)
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.admission", "--run", name, "--requests", str(args.requests),
+                 "--concurrency", str(args.concurrency), "--flood-share", str(args.flood_share), "--seed", str(args.seed)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            report[name] = json.loads(output.strip().splitlines()[-1])
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
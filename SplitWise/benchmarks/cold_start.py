@@ -0,0 +1,125 @@
+"""
+Measures worker cold start: the time to import app.main, to run the startup lifespan
+(schema setup per SCHEMA_SETUP) and to answer the first unauthenticated and the first
+authenticated request. Each run is a fresh interpreter against its own SQLite file.
+
+Scenarios:
+    fresh     empty database, SCHEMA_SETUP=migrate (the first worker of a new deploy)
+    migrated  up-to-date database, SCHEMA_SETUP=migrate (every later worker)
+    verify    up-to-date database, SCHEMA_SETUP=verify
+
+crypto_import_ms is the cost of the JWT and bcrypt stacks, which are imported on the first
+request that needs them rather than at boot.
+
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = {
+    "fresh": {"SCHEMA_SETUP": "migrate"},
+    "migrated": {"SCHEMA_SETUP": "migrate"},
+    "verify": {"SCHEMA_SETUP": "verify"},
+}
+
+def measure():
+    """
+    Runs in the child process; DATABASE_URL and SCHEMA_SETUP come from the environment.
+    """
+    start = time.perf_counter()
+    from app.main import app
+    import_ms = (time.perf_counter() - start) * 1000
+
+    import httpx
+    from sqlalchemy import select
+    from app.middlewares import SessionLocal
+    from app.models import User
+
+    async def run():
+        timings = {"import_ms": import_ms}
+        start = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            timings["startup_ms"] = (time.perf_counter() - start) * 1000
+            with SessionLocal() as db:
+                if db.scalar(select(User.id).where(User.email == "cold@example.com")) is None:
+                    db.add(User(name="cold", email="cold@example.com", password="-"))
+                    db.commit()
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                start = time.perf_counter()
+                response = await client.get("/core/health")
+                timings["first_request_ms"] = (time.perf_counter() - start) * 1000
+                assert response.status_code == 200, response.text
+
+                start = time.perf_counter()
+                from app.utils.auth import create_access_token
+                headers = {"Authorization": f"Bearer {create_access_token({'sub': 'cold@example.com'})}"}
+                response = await client.get("/expenses/get_balance", headers=headers)
+                timings["first_auth_request_ms"] = (time.perf_counter() - start) * 1000
+                assert response.status_code == 200, response.text
+        return timings
+
+    return {name: round(value, 2) for name, value in asyncio.run(run()).items()}
+
+def measure_crypto():
+    """
+    Runs in the child process: the import cost deferred from boot to first use.
+    """
+    import app.main  # noqa: F401
+
+    start = time.perf_counter()
+    import jose.jwt  # noqa: F401
+    import passlib.context  # noqa: F401
+    return {"crypto_import_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+def run_child(env, child="measure"):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", child],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def median(samples):
+    return {name: round(statistics.median(sample[name] for sample in samples), 2) for name in samples[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--child", choices=["measure", "crypto"], help=argparse.SUPPRESS)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure() if args.child == "measure" else measure_crypto()))
+        return
+
+    from benchmarks.common import write_report
+
+    report = {"runs": args.runs, "scenarios": {}}
+    for scenario in args.scenarios:
+        samples = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", DB_ASYNC="false", **SCENARIOS[scenario])
+                env.pop("ASYNC_DATABASE_URL", None)
+                env.pop("REPLICA_DATABASE_URLS", None)
+                if scenario != "fresh":
+                    run_child(dict(env, SCHEMA_SETUP="migrate"))
+                samples.append(run_child(env))
+        report["scenarios"][scenario] = median(samples)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", SCHEMA_SETUP="skip")
+        report.update(median([run_child(env, "crypto") for _ in range(args.runs)]))
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
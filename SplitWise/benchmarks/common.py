@@ -0,0 +1,56 @@
+import json
+import os
+import statistics
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+def use_sqlite_file(path: str = None) -> str:
+    """
+    Points DATABASE_URL at a fresh SQLite file; must run before anything imports app.
+    """
+    path = path or os.path.join(tempfile.mkdtemp(prefix="splitwise-bench-"), "bench.db")
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+@contextmanager
+def temporary_postgres_schema(url: str):
+    """
+    Creates a scratch schema on the PostgreSQL server at url and yields a URL whose
+    connections use only that schema, so a benchmark never touches the tables of the
+    database it points at. The schema and everything in it is dropped afterwards.
+    """
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.engine import make_url
+
+    schema = f"splitwise_bench_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(url)
+    with admin.begin() as connection:
+        connection.execute(text(f'CREATE SCHEMA "{schema}"'))
+    try:
+        yield make_url(url).update_query_dict({"options": f"-csearch_path={schema}"}).render_as_string(hide_password=False)
+    finally:
+        with admin.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        admin.dispose()
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+def summarize(latencies_ms):
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3),
+        "p50_ms": round(percentile(latencies_ms, 0.50), 3),
+        "p99_ms": round(percentile(latencies_ms, 0.99), 3),
+    }
+
+def write_report(report, output: str = None):
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,57 @@
+"""
+Compares two benchmark reports and prints every numeric metric with its relative change.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Exits with status 1 when a latency (`*_ms`) grows or a throughput (`*_per_sec`, `*_rps`)
+drops by more than the threshold percentage.
+"""
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ("_per_sec", "_rps")
+LOWER_IS_BETTER = ("_ms", "queries_per_op", "queries_per_request")
+
+def flatten(report, prefix=""):
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+def compare(baseline, candidate, threshold: float):
+    base = dict(flatten(baseline))
+    rows, regressions = [], []
+    for path, value in flatten(candidate):
+        if path not in base:
+            continue
+        before = base[path]
+        change = (value - before) / before * 100 if before else 0.0
+        rows.append((path, before, value, change))
+        if path.endswith(HIGHER_IS_BETTER) and change < -threshold:
+            regressions.append(path)
+        elif path.endswith(LOWER_IS_BETTER) and change > threshold:
+            regressions.append(path)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for path, before, after, change in rows:
+        marker = "  <-- regression" if path in regressions else ""
+        print(f"{path:70} {before:>14.3f} {after:>14.3f} {change:>+8.1f}%{marker}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Concurrency stress check for balance and debt updates.
+
+Parallel writer threads, each with its own session, create and settle expenses among a
+small set of users so every transaction touches the same balance rows. Afterwards the
+stored balances and debts are compared against values recomputed from the splits; the
+command exits non-zero if any update was lost or a duplicate row was created.
+
+It always runs on a scratch database: a temporary SQLite file, or with --postgres-url a
+temporary schema on that server, dropped afterwards. SQLite's database lock serializes
+the writers, so only the PostgreSQL run can expose lost updates between them; the same
+check runs in tests/test_concurrency.py.
+
+    python -m benchmarks.concurrency --writers 16 --expenses 50
+    python -m benchmarks.concurrency --postgres-url postgresql://localhost/splitwise
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from benchmarks.common import temporary_postgres_schema, use_sqlite_file, write_report
+
+# SQLite allows one writer at a time; writers that time out on its lock retry
+MAX_ATTEMPTS = 20
+
+def writer(session_factory, user_ids, expenses, seed, errors):
+    from sqlalchemy.exc import OperationalError
+    from app.schemas.expense import ExpenseCreate
+    from app.services.expense_service import ExpenseService
+
+    rng = random.Random(seed)
+    db = session_factory()
+    try:
+        for _ in range(expenses):
+            members = rng.sample(user_ids, rng.randint(2, len(user_ids)))
+            payload = ExpenseCreate(
+                description="stress",
+                currency=rng.choice(["USD", "EUR"]),
+                amount=round(rng.uniform(1, 500), 2),
+                split_type="equal",
+                splits=[{"user_id": user_id} for user_id in members],
+            )
+            for attempt in range(MAX_ATTEMPTS):
+                try:
+                    expense = ExpenseService.create_expense(db, payload, members[0])
+                    if rng.random() < 0.3:
+                        ExpenseService.settle_expense(db, expense.id, members[1])
+                    db.commit()
+                    break
+                except OperationalError:
+                    db.rollback()
+                    time.sleep(0.01 * (attempt + 1))
+            else:
+                errors.append("gave up after %d attempts" % MAX_ATTEMPTS)
+    except Exception as e:
+        errors.append(repr(e))
+        db.rollback()
+    finally:
+        db.close()
+
+def expected_state(db):
+    """
+    Recomputes balances and pairwise debts from the stored expenses and splits.
+    """
+    from app.models import Expense, ExpenseSplit
+    from app.services.expense_service import ExpenseService
+
+    balances = defaultdict(float)
+    debts = defaultdict(float)
+    for expense in db.query(Expense):
+        splits = {split.user_id: split.amount_owed for split in expense.splits}
+        ExpenseService._add_split_deltas(balances, expense.expense_created_by, expense.currency, expense.amount, splits)
+        unsettled = {split.user_id: split.amount_owed for split in expense.splits if not split.is_settled}
+        ExpenseService._add_debt_deltas(debts, expense.expense_created_by, expense.currency, unsettled)
+    # A settled split moves the participant's share back from the creator's balance
+    for split, expense in db.query(ExpenseSplit, Expense).join(Expense).filter(
+        ExpenseSplit.is_settled == True, ExpenseSplit.user_id != Expense.expense_created_by
+    ):
+        balances[(split.user_id, expense.currency)] += split.amount_owed
+        balances[(expense.expense_created_by, expense.currency)] -= split.amount_owed
+    return balances, debts
+
+def compare(expected, rows, key_columns):
+    actual = defaultdict(float)
+    duplicates = 0
+    for row in rows:
+        key = tuple(getattr(row, column) for column in key_columns)
+        duplicates += key in actual
+        actual[key] += row.amount
+    mismatched = [
+        {"key": list(key), "expected": round(expected.get(key, 0.0), 6), "actual": round(actual.get(key, 0.0), 6)}
+        for key in set(expected) | set(actual)
+        if abs(expected.get(key, 0.0) - actual.get(key, 0.0)) > 1e-6
+    ]
+    return {"rows": len(rows), "duplicates": duplicates, "mismatched": mismatched}
+
+def stress(engine, writers: int, expenses: int, users: int, seed: int):
+    """
+    Runs the writers against a migrated, empty database on engine and returns the report.
+    """
+    from sqlalchemy import insert
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Balance, Debt, User
+
+    session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+    with session_factory() as db:
+        db.execute(insert(User), [
+            {"name": f"user{i}", "email": f"user{i}@stress.example.com", "password": "x"} for i in range(users)
+        ])
+        db.commit()
+        user_ids = [user.id for user in db.query(User.id)]
+
+    errors = []
+    threads = [
+        threading.Thread(target=writer, args=(session_factory, user_ids, expenses, seed + i, errors))
+        for i in range(writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with session_factory() as db:
+        expected_balances, expected_debts = expected_state(db)
+        return {
+            "writers": writers,
+            "expenses": writers * expenses,
+            "seconds": round(elapsed, 3),
+            "errors": errors,
+            "balances": compare(expected_balances, db.query(Balance).all(), ("user_id", "currency")),
+            "debts": compare(expected_debts, db.query(Debt).all(), ("user_id", "other_user_id", "currency")),
+        }
+
+def failed(report) -> bool:
+    return bool(report["errors"]) or any(report[name]["duplicates"] or report[name]["mismatched"] for name in ("balances", "debts"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--expenses", type=int, default=50, help="expenses per writer")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--postgres-url", help="run in a temporary schema on this PostgreSQL server instead of a temporary SQLite file")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    with ExitStack() as stack:
+        if args.postgres_url:
+            os.environ["DATABASE_URL"] = stack.enter_context(temporary_postgres_schema(args.postgres_url))
+        else:
+            use_sqlite_file()
+
+        from app.database import engine
+        from app.migrations import migrate
+
+        migrate(engine)
+        report = stress(engine, args.writers, args.expenses, args.users, args.seed)
+        engine.dispose()
+    write_report(report, args.output)
+    sys.exit(1 if failed(report) else 0)
+
+if __name__ == "__main__":
+    main()
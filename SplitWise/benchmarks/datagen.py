@@ -0,0 +1,76 @@
+"""
+Seeded synthetic data for benchmarks: users, groups with power-law sizes and expenses.
+
+The same seed always produces the same data, so runs on different commits are comparable.
+"""
+import random
+from typing import Dict, List
+
+SPLIT_TYPES = ("equal", "percentage", "unequal")
+CURRENCIES = ("USD", "EUR", "INR")
+
+def group_sizes(rng: random.Random, groups: int, max_size: int, alpha: float = 1.6) -> List[int]:
+    """
+    Pareto-distributed group sizes: mostly pairs and small flats, a long tail of large trips.
+    """
+    return [min(max_size, max(2, int(rng.paretovariate(alpha) * 2))) for _ in range(groups)]
+
+def make_groups(rng: random.Random, user_ids: List[int], groups: int, max_size: int = 200) -> List[List[int]]:
+    return [rng.sample(user_ids, min(size, len(user_ids))) for size in group_sizes(rng, groups, max_size)]
+
+def make_expense(rng: random.Random, members: List[int], split_type: str = None) -> Dict:
+    """
+    Builds an ExpenseCreate payload among a random subset of a group.
+    """
+    split_type = split_type or rng.choice(SPLIT_TYPES)
+    participants = rng.sample(members, rng.randint(2, len(members))) if len(members) > 2 else list(members)
+    amount = round(rng.uniform(5, 500), 2)
+    if split_type == "equal":
+        splits = [{"user_id": user_id} for user_id in participants]
+    elif split_type == "percentage":
+        weights = [rng.randint(1, 10) for _ in participants]
+        shares = [weight * 100 // sum(weights) for weight in weights]
+        shares[0] += 100 - sum(shares)
+        splits = [{"user_id": user_id, "amount_owed": share} for user_id, share in zip(participants, shares)]
+    else:
+        cents = int(round(amount * 100))
+        cuts = sorted(rng.sample(range(1, cents), len(participants) - 1)) if cents > len(participants) else []
+        parts = [b - a for a, b in zip([0] + cuts, cuts + [cents])]
+        if len(parts) != len(participants):
+            parts = [cents // len(participants)] * len(participants)
+            parts[0] += cents - sum(parts)
+        splits = [{"user_id": user_id, "amount_owed": part / 100} for user_id, part in zip(participants, parts)]
+    return {
+        "description": rng.choice(("rent", "groceries", "uber", "dinner", "flight", "hotel")),
+        "currency": rng.choice(CURRENCIES),
+        "amount": amount,
+        "split_type": split_type,
+        "splits": splits,
+    }
+
+def seed_database(db, users: int, groups: int, expenses: int, seed: int = 42):
+    """
+    Inserts users and expenses through the service layer and returns (user_ids, groups).
+    Each expense is created by the first member of a randomly picked group.
+    """
+    from sqlalchemy import insert
+    from app.models import User
+    from app.schemas.expense import ExpenseCreate
+    from app.services.expense_service import ExpenseService
+
+    rng = random.Random(seed)
+    db.execute(insert(User), [
+        {"name": f"user{i}", "email": f"user{i}@bench.example", "password": "-"} for i in range(users)
+    ])
+    user_ids = [row[0] for row in db.query(User.id).order_by(User.id)]
+    group_members = make_groups(rng, user_ids, groups)
+
+    by_creator = {}
+    for _ in range(expenses):
+        members = rng.choice(group_members)
+        by_creator.setdefault(members[0], []).append(make_expense(rng, members))
+    for creator_id, payloads in by_creator.items():
+        rows = [(index, ExpenseCreate(**payload)) for index, payload in enumerate(payloads)]
+        ExpenseService.import_expenses(db, rows, creator_id)
+    db.commit()
+    return user_ids, group_members
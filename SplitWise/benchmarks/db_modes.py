@@ -0,0 +1,99 @@
+"""
+Compares the sync (threadpool) and async (DB_ASYNC) database modes under concurrent load.
+
+Each mode runs in a fresh subprocess against its own SQLite file and drives the app
+in-process through httpx's ASGI transport. Results are printed as JSON.
+
+    python -m benchmarks.db_modes --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import percentile
+
+async def drive(app, headers, requests, concurrency):
+    import httpx
+
+    payload = {"description": "bench", "currency": "USD", "amount": 30, "split_type": "equal",
+               "splits": [{"user_id": 1}, {"user_id": 2}, {"user_id": 3}]}
+    latencies = []
+    errors = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                if i % 5 == 0:
+                    response = await client.post("/expenses/add_expense", json=payload, headers=headers)
+                else:
+                    response = await client.get("/expenses/get_balance", headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, len(errors)
+
+def run_mode(requests, concurrency):
+    from app.database import engine
+    from app.main import app
+    from app.middlewares import SessionLocal
+    from app.migrations import migrate
+    from app.models import User
+    from app.utils.auth import create_access_token
+
+    migrate(engine)
+    db = SessionLocal()
+    db.add_all([User(name=f"bench{i}", email=f"bench{i}@example.com", password="-") for i in range(3)])
+    db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench0@example.com'})}"}
+
+    elapsed, latencies, errors = asyncio.run(drive(app, headers, requests, concurrency))
+    return {
+        "mode": "async" if os.environ.get("DB_ASYNC") == "true" else "sync",
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.requests, args.concurrency)))
+        return
+
+    results = []
+    for mode in ("sync", "async"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                       DB_ASYNC="true" if mode == "async" else "false")
+            env.pop("ASYNC_DATABASE_URL", None)
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.db_modes", "--mode", mode,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
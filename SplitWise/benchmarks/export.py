@@ -0,0 +1,93 @@
+"""
+Checks that GET /expenses/export runs in bounded memory: seeds one user with a growing
+number of splits and records peak traced memory while consuming the export stream (the
+same generators the endpoint returns). The peak should stay flat as the history grows.
+
+    python -m benchmarks.export --splits 10000 100000
+    python -m benchmarks.export --splits 1000000 --formats csv --gzip
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from benchmarks.common import use_sqlite_file, write_report
+
+SPLITS_PER_EXPENSE = 4
+
+def seed(db, splits: int):
+    """
+    Bulk-inserts expenses among four users, each involving user 1, until the user's
+    expenses hold the requested number of splits.
+    """
+    from datetime import datetime, timedelta
+    from sqlalchemy import delete, func, insert, select
+    from app.models import Expense, ExpenseSplit, User
+
+    db.execute(delete(ExpenseSplit))
+    db.execute(delete(Expense))
+    if not db.scalar(select(func.count()).select_from(User)):
+        db.execute(insert(User), [{"name": f"user{i}", "email": f"user{i}@export.example", "password": "-"} for i in range(SPLITS_PER_EXPENSE)])
+    start = datetime(2020, 1, 1)
+    expenses = splits // SPLITS_PER_EXPENSE
+    for offset in range(0, expenses, 10000):
+        count = min(10000, expenses - offset)
+        db.execute(insert(Expense), [
+            {"id": offset + i + 1, "description": "export", "currency": "USD", "amount": 40.0, "split_type": "equal",
+             "expense_created_by": 1, "created_at": start + timedelta(minutes=offset + i), "is_settled": False}
+            for i in range(count)
+        ])
+        db.execute(insert(ExpenseSplit), [
+            {"expense_id": offset + i + 1, "user_id": user_id, "amount_owed": 10.0, "is_settled": False}
+            for i in range(count) for user_id in range(1, SPLITS_PER_EXPENSE + 1)
+        ])
+    db.commit()
+
+def consume(db, export_format: str, gzip: bool, batch_size: int):
+    from app.services.async_service import stream_db
+    from app.services.expense_service import ExpenseService
+    from app.utils import exporters
+
+    async def run():
+        batches = stream_db(db, ExpenseService.user_export_query(1), batch_size)
+        body = exporters.iter_csv(batches) if export_format == "csv" else exporters.iter_ndjson(batches)
+        if gzip:
+            body = exporters.gzip_chunks(body)
+        size = 0
+        async for chunk in body:
+            size += len(chunk)
+        return size
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"bytes": size, "seconds": round(elapsed, 2), "peak_kib": round(peak / 1024, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--splits", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--formats", nargs="+", choices=["ndjson", "csv"], default=["ndjson", "csv"])
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file()
+    from app.database import Base, engine
+    from app.middlewares import SessionLocal
+    import app.models  # noqa: F401 - registers the tables
+
+    Base.metadata.create_all(bind=engine)
+    report = {"batch_size": args.batch_size, "gzip": args.gzip, "runs": []}
+    for splits in args.splits:
+        with SessionLocal() as db:
+            seed(db, splits)
+            for export_format in args.formats:
+                report["runs"].append({"splits": splits, "format": export_format,
+                                       **consume(db, export_format, args.gzip, args.batch_size)})
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrent HTTP load against app.main:app, driven in-process through httpx's ASGI transport.
+
+Each virtual client authenticates as a seeded user and issues a mix of balance reads,
+expense listings and new expenses inside its groups. Reports throughput, p50/p99 latency
+and SQL statements per request per endpoint.
+
+    python -m benchmarks.load --requests 5000 --concurrency 100 --output load.json
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+from benchmarks.common import summarize, use_sqlite_file, write_report
+
+MIX = (("get_balance", 0.5), ("list_expenses", 0.3), ("add_expense", 0.2))
+
+def server_timing_queries(header: str) -> int:
+    """
+    Reads the statement count from the db entry MetricsMiddleware adds to Server-Timing.
+    """
+    match = re.search(r'db;[^,]*desc="(\d+) queries"', header)
+    return int(match.group(1)) if match else 0
+
+async def drive(app, users, groups, requests: int, concurrency: int, seed: int):
+    import httpx
+    from app.utils.auth import create_access_token
+    from benchmarks.datagen import make_expense
+
+    rng = random.Random(seed)
+    groups = [members for members in groups if len(members) <= 50]
+    headers = {user_id: {"Authorization": f"Bearer {create_access_token({'sub': email, 'uid': user_id})}"}
+               for user_id, email in users}
+    plan = []
+    for _ in range(requests):
+        kind = rng.choices([name for name, _ in MIX], [weight for _, weight in MIX])[0]
+        members = rng.choice(groups)
+        payload = make_expense(rng, members) if kind == "add_expense" else None
+        plan.append((kind, members[0], payload))
+
+    latencies = {name: [] for name, _ in MIX}
+    queries = {name: 0 for name, _ in MIX}
+    errors = {name: 0 for name, _ in MIX}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(kind, user_id, payload):
+            async with semaphore:
+                start = time.perf_counter()
+                if kind == "add_expense":
+                    response = await client.post("/expenses/add_expense", json=payload, headers=headers[user_id])
+                else:
+                    response = await client.get(f"/expenses/{kind}", headers=headers[user_id])
+                latencies[kind].append((time.perf_counter() - start) * 1000)
+                queries[kind] += server_timing_queries(response.headers.get("server-timing", ""))
+                if response.status_code >= 400:
+                    errors[kind] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(*step) for step in plan))
+        elapsed = time.perf_counter() - start
+
+    all_latencies = [value for samples in latencies.values() for value in samples]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 1),
+        "overall": summarize(all_latencies),
+        "endpoints": {
+            kind: {**summarize(samples), "errors": errors[kind],
+                   "queries_per_request": round(queries[kind] / max(1, len(samples)), 2)}
+            for kind, samples in latencies.items() if samples
+        },
+    }
+
+def run(requests: int = 5000, concurrency: int = 100, users: int = 1000, groups: int = 200, expenses: int = 10000, seed: int = 42):
+    from app.main import app
+    from app.database import Base, engine
+    from app.middlewares import SessionLocal
+    from app.models import User
+    from benchmarks.datagen import seed_database
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    _, group_members = seed_database(db, users, groups, expenses, seed)
+    user_rows = db.query(User.id, User.email).all()
+    db.close()
+    return asyncio.run(drive(app, user_rows, group_members, requests, concurrency, seed))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--expenses", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="SQLite file to use (recreated)")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file(args.db)
+    write_report(run(args.requests, args.concurrency, args.users, args.groups, args.expenses, args.seed), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Micro-benchmarks for the split strategies and the ExpenseService write paths.
+
+    python -m benchmarks.micro --output micro.json
+"""
+import argparse
+import random
+import time
+from benchmarks.common import summarize, use_sqlite_file, write_report
+
+def bench_strategies(iterations: int):
+    import numpy  # noqa: F401 - keep the one-off import out of the first batch timing
+    from app.schemas.enums import SplitTypeEnum
+    from app.utils.split_strategies import SplitStrategyFactory
+
+    results = {}
+    for size in (2, 10, 100, 1000):
+        users = list(range(1, size + 1))
+        cases = {
+            SplitTypeEnum.EQUAL: {},
+            SplitTypeEnum.PERCENTAGE: {user_id: 100 / size for user_id in users},
+            SplitTypeEnum.UNEQUAL: {user_id: 1.0 for user_id in users},
+        }
+        for split_type, splits_info in cases.items():
+            if split_type == SplitTypeEnum.PERCENTAGE and size not in (2, 10, 100):
+                continue
+            amount = float(size)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                SplitStrategyFactory.get_strategy(split_type).calculate_splits(amount, users, splits_info)
+            elapsed = time.perf_counter() - start
+            results[f"{split_type.value}/{size}"] = {
+                "ops_per_sec": round(iterations / elapsed, 1),
+                "us_per_op": round(elapsed / iterations * 1e6, 3),
+            }
+
+            # The same expenses split in one vectorized batch
+            start = time.perf_counter()
+            SplitStrategyFactory.get_strategy(split_type).calculate_many(
+                [amount] * iterations, [users] * iterations, [splits_info] * iterations
+            )
+            elapsed = time.perf_counter() - start
+            results[f"{split_type.value}/{size}/batch"] = {
+                "ops_per_sec": round(iterations / elapsed, 1),
+                "us_per_op": round(elapsed / iterations * 1e6, 3),
+            }
+    return results
+
+def bench_service(operations: int, group_size: int, seed: int):
+    from app.database import Base, engine
+    from app.middlewares import SessionLocal
+    from app.schemas.expense import ExpenseCreate, ExpenseUpdate
+    from app.services.expense_service import ExpenseService
+    from app.utils import metrics
+    from benchmarks.datagen import make_expense, seed_database
+
+    # Every group size starts from the same freshly seeded database
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user_ids, _ = seed_database(db, users=max(group_size * 2, 100), groups=10, expenses=200, seed=seed)
+    rng = random.Random(seed)
+    members = user_ids[:group_size]
+    creator_id = members[0]
+
+    def timed(fn):
+        stats = metrics.RequestStats()
+        token = metrics.current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            result = fn()
+            db.commit()
+        finally:
+            metrics.current_request_stats.reset(token)
+        return result, (time.perf_counter() - start) * 1000, stats.queries
+
+    latencies = {"create_expense": [], "update_expense": [], "settle_expense": []}
+    queries = {name: [] for name in latencies}
+    created = []
+    for _ in range(operations):
+        payload = make_expense(rng, members, "equal")
+        payload["splits"] = [{"user_id": user_id} for user_id in members]
+        expense, elapsed, count = timed(lambda: ExpenseService.create_expense(db, ExpenseCreate(**payload), creator_id))
+        latencies["create_expense"].append(elapsed)
+        queries["create_expense"].append(count)
+        created.append((expense.id, payload))
+    for expense_id, payload in created:
+        payload = {**payload, "amount": round(payload["amount"] + 1, 2)}
+        _, elapsed, count = timed(lambda: ExpenseService.update_expense(db, expense_id, ExpenseUpdate(**payload), creator_id))
+        latencies["update_expense"].append(elapsed)
+        queries["update_expense"].append(count)
+    for expense_id, _ in created:
+        _, elapsed, count = timed(lambda: ExpenseService.settle_expense(db, expense_id, members[1]))
+        latencies["settle_expense"].append(elapsed)
+        queries["settle_expense"].append(count)
+    db.close()
+
+    return {
+        name: {**summarize(samples), "queries_per_op": round(sum(queries[name]) / len(queries[name]), 2)}
+        for name, samples in latencies.items()
+    }
+
+def run(iterations: int = 2000, operations: int = 200, group_sizes=(2, 10, 50), seed: int = 42):
+    report = {"strategies": bench_strategies(iterations), "service": {}}
+    for group_size in group_sizes:
+        report["service"][f"group_size_{group_size}"] = bench_service(operations, group_size, seed)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="SQLite file to use (recreated)")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file(args.db)
+    write_report(run(args.iterations, args.operations, seed=args.seed), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures the per-request cost of DBSessionMiddleware.
+
+Drives /core/health (no database work) and a route that resolves get_db through a bare
+FastAPI app and through the same app wrapped in DBSessionMiddleware, and prints the mean
+microseconds per request and the overhead as JSON.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.middleware_overhead --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+async def measure(app, path, requests):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(requests, 100)):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path)
+        return (time.perf_counter() - start) / requests * 1e6
+
+def build_app(with_middleware: bool):
+    from fastapi import Depends, FastAPI
+    from app.dependencies import get_db
+    from app.middlewares import DBSessionMiddleware, LazySession, SessionLocal
+    from app.routers import core_router
+
+    app = FastAPI()
+    app.include_router(core_router)
+
+    @app.get("/bench/db")
+    async def uses_db(db=Depends(get_db)):
+        return {"ok": True}
+
+    if with_middleware:
+        app.add_middleware(DBSessionMiddleware)
+        return app
+
+    # Without the middleware the route still needs a session handle to resolve get_db
+    async def attach_session(scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["db"] = LazySession(SessionLocal)
+        await app(scope, receive, send)
+    return attach_session
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    results = {}
+    for path in ("/core/health", "/bench/db"):
+        baseline = asyncio.run(measure(build_app(False), path, args.requests))
+        wrapped = asyncio.run(measure(build_app(True), path, args.requests))
+        results[path] = {
+            "baseline_us": round(baseline, 1),
+            "middleware_us": round(wrapped, 1),
+            "overhead_us": round(wrapped - baseline, 1),
+        }
+    print(json.dumps({"requests": args.requests, "routes": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
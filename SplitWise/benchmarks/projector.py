@@ -0,0 +1,124 @@
+"""
+Compares write latency with balances updated in the request (direct) and with the
+balance journal and background projector (BALANCE_PROJECTOR), as the number of
+participants sharing the organizer's hot balance row grows.
+
+Each mode and group size runs in a fresh subprocess against its own SQLite file, or with
+--postgres-url in its own temporary schema on that server, dropped afterwards. SQLite has
+a single write lock, so with many concurrent writers lock waits dominate both modes;
+hot-row contention is a PostgreSQL effect. Results are printed as JSON.
+
+    python -m benchmarks.projector --requests 1000 --concurrency 8 --participants 2 10 50
+    python -m benchmarks.projector --postgres-url postgresql://localhost/splitwise --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from benchmarks.common import percentile, temporary_postgres_schema
+
+async def drive(app, headers, participants, requests, concurrency):
+    import httpx
+    from app.services.balance_journal_service import BALANCE_PROJECTOR
+    from app.services.balance_projector import balance_projector
+
+    payload = {"description": "bench", "currency": "USD", "amount": 100, "split_type": "equal",
+               "splits": [{"user_id": user_id} for user_id in range(1, participants + 1)]}
+    latencies = []
+    errors = []
+    versions = []
+    semaphore = asyncio.Semaphore(concurrency)
+    if BALANCE_PROJECTOR:
+        balance_projector.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/expenses/add_expense", json=payload, headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+                elif "x-balance-version" in response.headers:
+                    versions.append(int(response.headers["x-balance-version"]))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+        # Time until the last write is visible through get_balance
+        catch_up = 0.0
+        if versions:
+            start = time.perf_counter()
+            response = await client.get("/expenses/get_balance", params={"min_version": max(versions)}, headers=headers)
+            catch_up = time.perf_counter() - start
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+    await balance_projector.stop()
+    return elapsed, latencies, errors, catch_up
+
+def run_mode(participants, requests, concurrency):
+    from app.main import app
+    from app.database import engine
+    from app.middlewares import SessionLocal
+    from app.migrations import migrate
+    from app.models import User
+    from app.utils.auth import create_access_token
+
+    migrate(engine)
+    db = SessionLocal()
+    db.add_all([User(name=f"bench{i}", email=f"bench{i}@example.com", password="-") for i in range(participants)])
+    db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench0@example.com'})}"}
+
+    elapsed, latencies, errors, catch_up = asyncio.run(drive(app, headers, participants, requests, concurrency))
+    return {
+        "mode": "projector" if os.environ.get("BALANCE_PROJECTOR") == "true" else "direct",
+        "participants": participants,
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "catch_up_ms": round(catch_up * 1000, 2),
+        "errors": len(errors),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--participants", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--postgres-url", help="run in temporary schemas on this PostgreSQL server instead of temporary SQLite files")
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_mode(args.run, args.requests, args.concurrency)))
+        return
+
+    results = []
+    for participants in args.participants:
+        for mode in ("direct", "projector"):
+            with ExitStack() as stack:
+                if args.postgres_url:
+                    database_url = stack.enter_context(temporary_postgres_schema(args.postgres_url))
+                else:
+                    database_url = f"sqlite:///{stack.enter_context(tempfile.TemporaryDirectory())}/bench.db"
+                env = dict(os.environ, BALANCE_PROJECTOR="true" if mode == "projector" else "false", DATABASE_URL=database_url)
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.projector", "--run", str(participants),
+                     "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                    env=env, check=True, capture_output=True, text=True,
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
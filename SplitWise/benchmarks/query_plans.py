@@ -0,0 +1,152 @@
+"""
+Query-plan regression check for ExpenseService.
+
+Seeds a SQLite file, runs the migrations, exercises every ExpenseService operation while
+capturing the SQL it issues, and runs EXPLAIN QUERY PLAN on each statement. Any full scan
+of a table (SQLite's "SCAN <table>", with or without an index) fails the check unless the
+operation is listed in FULL_SCAN_ALLOWED. Statements with more than LARGE_IN_LIST bound
+values (e.g. the later levels of the debt graph walk, which can cover most users) may
+rightly scan and are only reported. Exits non-zero on failure.
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --verbose
+
+tests/test_query_plans.py runs the same check, and asserts the indexes the hot paths rely on.
+"""
+import argparse
+import re
+import sys
+from datetime import datetime, timedelta
+from benchmarks.common import use_sqlite_file, write_report
+
+# Operations that read whole tables by design
+FULL_SCAN_ALLOWED = {"rebuild_debts", "rebuild_spending_rollups"}
+LARGE_IN_LIST = 100
+
+# "SCAN expenses", "SCAN expense_splits USING INDEX ..."; not subqueries, CTEs, constant rows
+# or full-text lookups ("SCAN expense_search VIRTUAL TABLE INDEX ...", answered by the FTS index)
+FULL_SCAN = re.compile(r"^SCAN (?!\(|CONSTANT ROW|\d+ CONSTANT ROWS)(\w+)\b(?! VIRTUAL TABLE)")
+
+def operations(db, user_ids):
+    """
+    Yields (name, callable) for every ExpenseService operation and the search and rollup reads, with realistic arguments.
+    """
+    from app.schemas.expense import ExpenseCreate, ExpenseUpdate
+    from app.services.expense_service import ExpenseService
+    from app.services.search_service import SearchService
+    from app.services.spending_rollup_service import SpendingRollupService
+
+    creator, other, third = user_ids[:3]
+    payload = {"description": "plan", "currency": "USD", "amount": 30, "split_type": "equal",
+               "splits": [{"user_id": creator}, {"user_id": other}, {"user_id": third}]}
+    state = {}
+
+    def create():
+        state["expense"] = ExpenseService.create_expense(db, ExpenseCreate(**payload), creator)
+
+    def export():
+        db.execute(ExpenseService.user_export_query(other)).all()
+
+    def page_rows(**filters):
+        expense_ids, _ = ExpenseService.get_user_expense_ids(db, other, 50, **filters)
+        ExpenseService.get_expense_rows(db, expense_ids)
+
+    yield "create_expense", create
+    yield "update_expense", lambda: ExpenseService.update_expense(db, state["expense"].id, ExpenseUpdate(**payload), creator)
+    yield "import_expenses", lambda: ExpenseService.import_expenses(db, [(1, ExpenseCreate(**payload))], creator)
+    yield "get_user_balance", lambda: ExpenseService.get_user_balance(db, other)
+    yield "get_user_balance_as_of", lambda: ExpenseService.get_user_balance(db, other, datetime.utcnow() - timedelta(hours=1))
+    yield "get_user_version", lambda: ExpenseService.get_user_version(db, other)
+    yield "settle_expense", lambda: ExpenseService.settle_expense(db, state["expense"].id, other)
+    yield "settle_splits_with_user", lambda: ExpenseService.settle_splits_with_user(db, third, creator)
+    yield "settle_whole_expense", lambda: ExpenseService.settle_whole_expense(db, state["expense"].id, creator)
+    yield "settle_all_splits", lambda: ExpenseService.settle_all_splits(db, third)
+    yield "get_simplified_debts", lambda: ExpenseService.get_simplified_debts(db, other)
+    yield "get_user_expense_ids/get_expense_rows", page_rows
+    yield "get_user_expense_ids/get_expense_rows filtered", lambda: page_rows(currency="USD", is_settled=False)
+    yield "user_export_query", export
+    yield "search_expense_ids", lambda: SearchService.search_expense_ids(db, other, "plan", 50)
+    yield "get_spending_summary", lambda: SpendingRollupService.get_summary(db, other, "year", "USD", datetime.utcnow() - timedelta(days=365))
+    yield "project_journal", lambda: ExpenseService.project_journal(db, 100)
+    yield "rebuild_debts", lambda: ExpenseService.rebuild_debts(db)
+    yield "rebuild_spending_rollups", lambda: SpendingRollupService.rebuild(db)
+
+def capture(engine):
+    """
+    Records every statement and its parameters executed on the engine.
+    """
+    from sqlalchemy import event
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((statement, parameters[0] if executemany else parameters))
+    return statements
+
+def full_scans(conn, statement, parameters):
+    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    details = [row[-1] for row in plan]
+    return details, [match.group(1) for match in map(FULL_SCAN.match, details) if match]
+
+def explain_operations(db, engine, user_ids):
+    """
+    Runs every operation on a seeded, analyzed database and yields (operation, statement,
+    parameters, plan details, fully scanned tables) for each statement it issued.
+    """
+    statements = capture(engine)
+    for name, operation in operations(db, user_ids):
+        del statements[:]
+        operation()
+        db.flush()
+        conn = db.connection()
+        for statement, parameters in list(statements):
+            details, scanned = full_scans(conn, statement, parameters)
+            yield name, statement, parameters, details, scanned
+
+def unexpected_scan(name, scanned, parameters) -> bool:
+    """
+    Whether a statement's full scans fail the check; large IN lists are only reported.
+    """
+    return bool(scanned) and name not in FULL_SCAN_ALLOWED and len(parameters) <= LARGE_IN_LIST
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file()
+    from app.database import engine
+    from app.middlewares import SessionLocal
+    from app.migrations import migrate
+    from benchmarks.datagen import seed_database
+
+    migrate(engine)
+    with SessionLocal() as db:
+        user_ids, _ = seed_database(db, users=1000, groups=200, expenses=args.expenses, seed=args.seed)
+        # Fresh statistics, as a production database would have
+        db.connection().exec_driver_sql("ANALYZE")
+        db.commit()
+
+        failures = []
+        large = []
+        checked = 0
+        for name, statement, parameters, details, scanned in explain_operations(db, engine, user_ids):
+            checked += 1
+            if args.verbose:
+                print(f"-- {name}\n{statement}\n  " + "\n  ".join(details), file=sys.stderr)
+            if unexpected_scan(name, scanned, parameters):
+                failures.append({"operation": name, "tables": scanned, "statement": " ".join(statement.split()), "plan": details})
+            elif scanned and name not in FULL_SCAN_ALLOWED:
+                large.append({"operation": name, "tables": scanned, "parameters": len(parameters)})
+        db.rollback()
+
+    write_report({"statements": checked, "full_scans": failures, "large_in_list_scans": large}, args.output)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
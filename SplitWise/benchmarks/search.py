@@ -0,0 +1,105 @@
+"""
+Measures GET /expenses/search query latency as the expenses table grows: seeds expenses
+with Zipf-distributed description words among many users, then times the indexed search
+(SearchService on the FTS5 index) against the unindexed LIKE fallback for common, rare
+and prefix queries of random users. Both only read the user's expenses, so with a fixed
+number of users their latency grows with each user's history; the indexed search reads
+only the matching entries of it, the LIKE scan every expense of the user.
+
+    python -m benchmarks.search --expenses 100000 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from benchmarks.common import percentile, use_sqlite_file, write_report
+
+VOCABULARY = ["rent", "uber", "dinner", "groceries", "taxi", "march", "april", "airport", "coffee", "hotel",
+              "flight", "lunch", "movie", "deposit", "electricity", "internet", "gym", "pizza", "train", "museum"]
+# Distinct rare words so some queries match only a handful of expenses
+RARE_WORDS = 5000
+SPLITS_PER_EXPENSE = 3
+
+def description(rng: random.Random) -> str:
+    words = rng.choices(VOCABULARY, weights=[1 / (rank + 1) for rank in range(len(VOCABULARY))], k=rng.randint(1, 3))
+    if rng.random() < 0.2:
+        words.append(f"ref{rng.randrange(RARE_WORDS)}")
+    return " ".join(words).capitalize()
+
+def seed(db, expenses: int, users: int, start: int, rng: random.Random):
+    """
+    Bulk-inserts expenses start+1..expenses with three splits each and indexes them.
+    """
+    from sqlalchemy import insert
+    from app.models import Expense, ExpenseSplit
+    from app.services.search_service import SearchService
+
+    for offset in range(start, expenses, 10000):
+        batch = []
+        for expense_id in range(offset + 1, min(offset + 10000, expenses) + 1):
+            participants = rng.sample(range(1, users + 1), SPLITS_PER_EXPENSE)
+            batch.append((expense_id, description(rng), participants))
+        db.execute(insert(Expense), [
+            {"id": expense_id, "description": text, "currency": "USD", "amount": 30.0, "split_type": "equal",
+             "expense_created_by": participants[0], "is_settled": False}
+            for expense_id, text, participants in batch
+        ])
+        db.execute(insert(ExpenseSplit), [
+            {"expense_id": expense_id, "user_id": user_id, "amount_owed": 10.0, "is_settled": False}
+            for expense_id, _, participants in batch for user_id in participants
+        ])
+        SearchService.index_expenses(db, batch)
+        db.commit()
+
+def measure(db, users: int, queries: int, rng: random.Random):
+    from app.services.search_service import SearchService
+
+    cases = {"common": lambda: "rent", "rare": lambda: f"ref{rng.randrange(RARE_WORDS)}",
+             "two_words": lambda: "uber march", "prefix": lambda: "gro"}
+    report = {}
+    for name, make_query in cases.items():
+        timings = {"indexed": [], "like": []}
+        for _ in range(queries):
+            user_id, query = rng.randint(1, users), make_query()
+            terms = SearchService.search_terms(query)
+            for method, run in (("indexed", lambda: SearchService.search_expense_ids(db, user_id, query, 50)),
+                                ("like", lambda: SearchService._search_like(db, user_id, terms, 51, None))):
+                start = time.perf_counter()
+                run()
+                timings[method].append((time.perf_counter() - start) * 1000)
+        report[name] = {method: {"p50_ms": round(statistics.median(samples), 3), "p99_ms": round(percentile(samples, 0.99), 3)}
+                        for method, samples in timings.items()}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file()
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.middlewares import SessionLocal
+    from app.migrations import migrate
+    from app.models import User
+
+    migrate(engine)
+    rng = random.Random(args.seed)
+    report = {"users": args.users, "runs": []}
+    with SessionLocal() as db:
+        db.execute(insert(User), [{"name": f"user{i}", "email": f"user{i}@search.example", "password": "-"} for i in range(args.users)])
+        db.commit()
+        seeded = 0
+        for expenses in sorted(args.expenses):
+            seed(db, expenses, args.users, seeded, rng)
+            seeded = expenses
+            db.connection().exec_driver_sql("ANALYZE")
+            report["runs"].append({"expenses": expenses, "queries": measure(db, args.users, args.queries, rng)})
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
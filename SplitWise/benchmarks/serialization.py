@@ -0,0 +1,99 @@
+"""
+Compares the two ways of serializing a list_expenses page for a user with thousands of
+expenses: ORM objects validated through the Expense schema and encoded with the standard
+json module, against tuple rows encoded with orjson in streamed batches.
+
+Reports CPU time and peak traced memory per request for each page size, and checks that
+both paths produce the same document.
+
+    python -m benchmarks.serialization --expenses 5000 --page-sizes 50 500
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from benchmarks.common import use_sqlite_file, write_report
+
+def legacy_page(db, user_id, limit):
+    from typing import List
+    from pydantic import TypeAdapter
+    from sqlalchemy.orm import selectinload
+    from app.models import Expense as ExpenseModel
+    from app.schemas.expense import Expense
+    from app.services.expense_service import ExpenseService
+
+    adapter = TypeAdapter(List[Expense])
+    # The same page as ORM objects with their splits, as list_expenses loaded it before
+    expense_ids, _ = ExpenseService.get_user_expense_ids(db, user_id, limit)
+    expenses = db.query(ExpenseModel).filter(ExpenseModel.id.in_(expense_ids)).options(selectinload(ExpenseModel.splits)).all()
+    expenses.sort(key=lambda expense: expense_ids.index(expense.id))
+    body = json.dumps(adapter.dump_python(adapter.validate_python(expenses, from_attributes=True), mode="json")).encode()
+    return [body]
+
+def fast_page(db, user_id, limit, batch_size, keep=False):
+    from app.services.expense_service import ExpenseService
+    from app.utils.json_stream import iter_json
+
+    expense_ids, _ = ExpenseService.get_user_expense_ids(db, user_id, limit)
+
+    async def batches():
+        for start in range(0, len(expense_ids), batch_size):
+            yield ExpenseService.get_expense_rows(db, expense_ids[start:start + batch_size])
+
+    async def collect():
+        # Stand-in for the response: chunks are dropped once sent unless keep is set
+        chunks = []
+        async for chunk in iter_json(batches()):
+            chunks.append(chunk if keep else len(chunk))
+        return chunks
+    return asyncio.run(collect())
+
+def measure(render, iterations):
+    cpu_ms = []
+    for _ in range(iterations):
+        start = time.process_time()
+        render()
+        cpu_ms.append((time.process_time() - start) * 1000)
+
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cpu_ms": round(min(cpu_ms), 3), "peak_kib": round(peak / 1024, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=5000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file()
+    from sqlalchemy import func
+    from app.database import Base, engine
+    from app.middlewares import SessionLocal
+    from app.models import ExpenseSplit
+    from benchmarks.datagen import seed_database
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        seed_database(db, users=20, groups=4, expenses=args.expenses, seed=args.seed)
+        user_id, involved = db.query(ExpenseSplit.user_id, func.count()).group_by(ExpenseSplit.user_id).order_by(func.count().desc()).first()
+
+        report = {"user_expenses": involved, "pages": {}}
+        for limit in args.page_sizes:
+            legacy = json.loads(b"".join(legacy_page(db, user_id, limit)))
+            fast = json.loads(b"".join(fast_page(db, user_id, limit, args.batch_size, keep=True)))
+            report["pages"][str(limit)] = {
+                "identical": legacy == fast,
+                "legacy": measure(lambda: legacy_page(db, user_id, limit), args.iterations),
+                "fast": measure(lambda: fast_page(db, user_id, limit, args.batch_size), args.iterations),
+            }
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Measures the monthly spending summary of a user as their history grows: seeds expenses
+spread over the last 24 months among a fixed number of users, builds the rollups with
+SpendingRollupService.rebuild (timed too), then times GET /expenses/summary's read of the
+rollups against aggregating the user's splits on request. The rollup read covers one row
+per month and currency, the aggregation every split of the user.
+
+    python -m benchmarks.spending_summary --expenses 100000 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import percentile, use_sqlite_file, write_report
+
+SPLITS_PER_EXPENSE = 3
+MONTHS = 24
+
+def seed(db, expenses: int, users: int, start: int, rng: random.Random):
+    """
+    Bulk-inserts expenses start+1..expenses with three splits each, created at random times.
+    """
+    from sqlalchemy import insert
+    from app.models import Expense, ExpenseSplit
+
+    now = datetime.utcnow()
+    for offset in range(start, expenses, 10000):
+        batch = [(expense_id, rng.sample(range(1, users + 1), SPLITS_PER_EXPENSE))
+                 for expense_id in range(offset + 1, min(offset + 10000, expenses) + 1)]
+        db.execute(insert(Expense), [
+            {"id": expense_id, "description": "bench", "currency": rng.choice(["USD", "EUR"]), "amount": 30.0,
+             "split_type": "equal", "expense_created_by": participants[0], "is_settled": False,
+             "created_at": now - timedelta(days=rng.uniform(0, MONTHS * 30))}
+            for expense_id, participants in batch
+        ])
+        db.execute(insert(ExpenseSplit), [
+            {"expense_id": expense_id, "user_id": user_id, "amount_owed": 10.0, "is_settled": rng.random() < 0.5}
+            for expense_id, participants in batch for user_id in participants
+        ])
+        db.commit()
+
+def aggregate(db, user_id: int):
+    # What the summary would cost without rollups: every split of the user, grouped by month
+    from sqlalchemy import func, select
+    from app.models import Expense, ExpenseSplit
+
+    month = func.date(Expense.created_at, "start of month")
+    return db.execute(
+        select(month, Expense.currency, func.sum(ExpenseSplit.amount_owed), func.count())
+        .join(Expense, Expense.id == ExpenseSplit.expense_id)
+        .where(ExpenseSplit.user_id == user_id)
+        .group_by(month, Expense.currency)
+    ).all()
+
+def measure(db, users: int, queries: int, rng: random.Random):
+    from app.services.spending_rollup_service import SpendingRollupService
+
+    timings = {"rollups": [], "aggregate": []}
+    for _ in range(queries):
+        user_id = rng.randint(1, users)
+        for method, run in (("rollups", lambda: SpendingRollupService.get_summary(db, user_id)),
+                            ("aggregate", lambda: aggregate(db, user_id))):
+            start = time.perf_counter()
+            run()
+            timings[method].append((time.perf_counter() - start) * 1000)
+    return {method: {"p50_ms": round(statistics.median(samples), 3), "p99_ms": round(percentile(samples, 0.99), 3)}
+            for method, samples in timings.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    use_sqlite_file()
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.middlewares import SessionLocal
+    from app.migrations import migrate
+    from app.models import User
+    from app.services.spending_rollup_service import SpendingRollupService
+
+    migrate(engine)
+    rng = random.Random(args.seed)
+    report = {"users": args.users, "runs": []}
+    with SessionLocal() as db:
+        db.execute(insert(User), [{"name": f"user{i}", "email": f"user{i}@summary.example", "password": "-"} for i in range(args.users)])
+        db.commit()
+        seeded = 0
+        for expenses in sorted(args.expenses):
+            seed(db, expenses, args.users, seeded, rng)
+            seeded = expenses
+            start = time.perf_counter()
+            rollups = SpendingRollupService.rebuild(db)
+            db.commit()
+            rebuild_seconds = time.perf_counter() - start
+            db.connection().exec_driver_sql("ANALYZE")
+            report["runs"].append({"expenses": expenses, "rollups": rollups, "rebuild_seconds": round(rebuild_seconds, 2),
+                                   "summary": measure(db, args.users, args.queries, rng)})
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
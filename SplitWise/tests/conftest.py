@@ -0,0 +1,100 @@
+"""
+Shared fixtures: every test gets a fresh, migrated in-memory SQLite database, and the
+app's sessions are bound to it for the duration of the test.
+"""
+import os
+
+# app.database builds its engine on import; the tests swap in their own per test
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+def create_test_engine():
+    """
+    A migrated in-memory SQLite database. One shared connection, so the threadpool and the
+    test see the same database.
+    """
+    from app.migrations import migrate
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    migrate(engine)
+    return engine
+
+@pytest.fixture
+def engine():
+    engine = create_test_engine()
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    with Session(bind=engine, expire_on_commit=False) as session:
+        yield session
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    from app.utils.auth import principal_cache
+    from app.utils.debts import simplified_debt_cache
+    from app.utils.response_cache import response_cache
+
+    # Each test starts with a new database, so user ids and versions repeat across tests
+    for cache in (principal_cache, simplified_debt_cache, response_cache):
+        cache.clear()
+    yield
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    import app.main
+    from app.database import engine as app_engine
+    from app.middlewares import SessionLocal
+
+    # The lifespan migrates, and request sessions open, on the test engine
+    monkeypatch.setattr(app.main, "engine", engine)
+    SessionLocal.configure(bind=engine)
+    try:
+        with TestClient(app.main.app) as client:
+            yield client
+    finally:
+        SessionLocal.configure(bind=app_engine)
+
+@pytest.fixture
+def users(db):
+    """
+    Returns a function creating n users and their (ids, auth headers), without password hashing.
+    """
+    from app.models import User
+    from app.utils.auth import create_access_token
+
+    def make(n: int):
+        start = db.query(User).count()
+        emails = [f"user{start + i}@test.example" for i in range(n)]
+        db.execute(insert(User), [{"name": email.split("@")[0], "email": email, "password": "-"} for email in emails])
+        db.commit()
+        ids = [user_id for user_id, in db.query(User.id).filter(User.email.in_(emails)).order_by(User.id)]
+        headers = [{"Authorization": f"Bearer {create_access_token({'sub': email, 'uid': user_id})}"} for user_id, email in zip(ids, emails)]
+        return ids, headers
+    return make
+
+@pytest.fixture
+def count_statements(engine):
+    """
+    Returns a context manager collecting the SQL statements executed on the test engine.
+    """
+    from contextlib import contextmanager
+
+    @contextmanager
+    def count():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(engine, "after_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "after_cursor_execute", record)
+    return count
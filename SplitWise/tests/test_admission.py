@@ -0,0 +1,65 @@
+"""
+The per-user admission cap only trusts tokens whose signature verifies, and requests without
+one are only capped per client address when ADMISSION_ANONYMOUS_LIMIT asks for it.
+"""
+import asyncio
+from jose import jwt
+from app.middlewares import AdmissionMiddleware, request_subject
+from app.utils.admission import AdmissionController
+from app.utils.auth import ALGORITHM, create_access_token
+
+def scope_for(token=None, client="203.0.113.7"):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return {"type": "http", "path": "/expenses/get_balance", "method": "GET", "headers": headers, "client": (client, 5000)}
+
+def forged_token(subject):
+    return jwt.encode({"sub": subject}, "not the secret key", algorithm=ALGORITHM)
+
+async def statuses(controller, scopes):
+    """
+    Sends the requests at once to an app that holds them until all have arrived, and returns
+    their response statuses in order.
+    """
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = AdmissionMiddleware(app, controller)
+
+    async def request(scope):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+        await middleware(scope, None, send)
+        return sent[0]["status"]
+
+    tasks = [asyncio.ensure_future(request(scope)) for scope in scopes]
+    await asyncio.sleep(0)
+    release.set()
+    return await asyncio.gather(*tasks)
+
+def test_request_subject_is_only_read_from_verified_tokens():
+    victim = create_access_token({"sub": "victim@example.com", "uid": 1})
+
+    assert request_subject(scope_for(victim)) == "victim@example.com"
+    assert request_subject(scope_for(forged_token("victim@example.com"))) is None
+    assert request_subject(scope_for("garbage")) is None
+    assert request_subject(scope_for()) is None
+
+def test_forged_tokens_cannot_take_a_users_slots():
+    controller = AdmissionController(max_in_flight=0, per_user_limit=2, anonymous_limit=0)
+    victim = create_access_token({"sub": "victim@example.com", "uid": 1})
+    forged = [scope_for(forged_token(subject)) for subject in ("victim@example.com", "victim@example.com", "random-1", "random-2")]
+
+    # Forged requests are anonymous, uncapped by default; the victim keeps both of their slots
+    assert asyncio.run(statuses(controller, [*forged, scope_for(victim), scope_for(victim), scope_for(victim)])) == [200] * 6 + [429]
+
+def test_anonymous_requests_are_capped_per_client_address_when_configured():
+    controller = AdmissionController(max_in_flight=0, per_user_limit=2, anonymous_limit=2)
+    scopes = [scope_for(), scope_for(forged_token("random")), scope_for(), scope_for(client="198.51.100.1")]
+    assert asyncio.run(statuses(controller, scopes)) == [200, 200, 429, 200]
+    assert controller._per_user == {}
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert, select
+from app.models import Balance, BalanceCheckpoint
+from app.services.balance_history_service import BalanceHistoryService
+
+def add_expense(client, headers, user_ids, amount):
+    payload = {"description": "dinner", "currency": "USD", "amount": amount, "split_type": "equal",
+               "splits": [{"user_id": user_id} for user_id in user_ids]}
+    response = client.post("/expenses/add_expense", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+
+def test_history_starts_from_balances_that_predate_the_ledger(client, db, users):
+    (a, b), headers = users(2)
+    # Balances written before the ledger existed have no entries behind them
+    db.execute(insert(Balance), [{"user_id": a, "currency": "USD", "amount": 50.0}, {"user_id": b, "currency": "USD", "amount": -50.0}])
+    db.commit()
+
+    add_expense(client, headers[0], [a, b], 30)
+    add_expense(client, headers[1], [a, b], 10)
+
+    db.expire_all()
+    later = datetime.utcnow() + timedelta(seconds=1)
+    as_of = {row["user_id"]: row["amount"] for user_id in (a, b) for row in BalanceHistoryService.get_balances_as_of(db, user_id, later)}
+    assert as_of == pytest.approx({a: 50 + 15 - 5, b: -50 - 15 + 5})
+    assert as_of == pytest.approx(dict(db.execute(select(Balance.user_id, Balance.amount)).all()))
+
+    # Only the first entry of each (user, currency) is anchored
+    anchors = db.execute(select(BalanceCheckpoint.user_id, BalanceCheckpoint.balance).order_by(BalanceCheckpoint.user_id)).all()
+    assert anchors == [(a, 50.0), (b, -50.0)]
@@ -0,0 +1,34 @@
+"""
+Concurrent writers creating and settling expenses among the same few users must not lose
+balance or debt updates nor create duplicate rows. SQLite serializes writers on its
+database lock, so the SQLite run checks the bookkeeping; set TEST_POSTGRES_URL to also
+run the writers truly in parallel in a temporary schema on that PostgreSQL server.
+"""
+import os
+import pytest
+from sqlalchemy import create_engine
+from benchmarks.common import temporary_postgres_schema
+from benchmarks.concurrency import failed, stress
+
+TEST_POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+
+def run_stress(url):
+    from app.migrations import migrate
+
+    engine = create_engine(url)
+    try:
+        migrate(engine)
+        return stress(engine, writers=8, expenses=10, users=4, seed=7)
+    finally:
+        engine.dispose()
+
+def test_concurrent_writers_sqlite(tmp_path):
+    report = run_stress(f"sqlite:///{tmp_path}/stress.db")
+    assert not failed(report), report
+    assert report["balances"]["rows"] > 0
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+def test_concurrent_writers_postgresql():
+    with temporary_postgres_schema(TEST_POSTGRES_URL) as url:
+        report = run_stress(url)
+    assert not failed(report), report
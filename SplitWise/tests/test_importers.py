@@ -0,0 +1,53 @@
+import asyncio
+import json
+import pytest
+from app.utils import importers
+
+def collect(chunks):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [line async for line in importers.iter_lines(stream())]
+    return asyncio.run(run())
+
+def test_iter_lines_is_independent_of_chunk_boundaries():
+    body = "first\r\n\n  second  \nthird café\nlast".encode()
+    for size in (1, 2, 3, 7, len(body)):
+        assert collect([body[i:i + size] for i in range(0, len(body), size)]) == ["first", "second", "third café", "last"]
+
+def test_iter_lines_stops_at_an_over_long_line_before_buffering_the_rest(monkeypatch):
+    monkeypatch.setattr(importers, "IMPORT_MAX_LINE_BYTES", 10)
+    consumed = []
+
+    def chunks():
+        yield b"short\n"
+        while True:
+            consumed.append(1)
+            yield b"x" * 4
+
+    with pytest.raises(importers.ImportFormatError, match="Line 2 is longer than 10 bytes"):
+        collect(chunks())
+    assert len(consumed) == 3
+
+def test_import_rejects_a_body_that_is_not_utf8(client, users):
+    (a, b), headers = users(2)
+    row = {"description": "dinner", "currency": "USD", "amount": 20, "split_type": "equal", "splits": [{"user_id": a}, {"user_id": b}]}
+    body = json.dumps(row).encode() + b"\n\n" + json.dumps({**row, "description": "café"}, ensure_ascii=False).encode("latin-1")
+
+    response = client.post("/expenses/import_expenses", content=body, headers={**headers[0], "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Line 3 is not valid UTF-8"
+
+    response = client.post("/expenses/import_expenses", content=body.decode("latin-1").encode(), headers={**headers[0], "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    assert response.json()["imported"] == 2
+
+def test_import_rejects_an_over_long_line(client, users, monkeypatch):
+    monkeypatch.setattr(importers, "IMPORT_MAX_LINE_BYTES", 1000)
+    _, headers = users(1)
+    response = client.post("/expenses/import_expenses", content=b'{"description": "' + b"x" * 2000 + b'"}',
+                           headers={**headers[0], "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Line 1 is longer than 1000 bytes"
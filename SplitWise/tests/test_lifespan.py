@@ -0,0 +1,20 @@
+import app.main
+from fastapi.testclient import TestClient
+from app.database import engine as app_engine
+from app.middlewares import SessionLocal
+from app.utils.hashing import password_hasher
+
+def test_shutdown_stops_the_password_hashing_pool(engine, monkeypatch):
+    monkeypatch.setattr(app.main, "engine", engine)
+    SessionLocal.configure(bind=engine)
+    try:
+        with TestClient(app.main.app) as client:
+            # Signing up and logging in start the hashing processes
+            response = client.post("/users/sign_up", json={"name": "Ann", "email": "ann@example.com", "password": "secret"})
+            assert response.status_code == 200, response.text
+            response = client.post("/users/login", data={"username": "ann@example.com", "password": "secret"})
+            assert response.status_code == 200, response.text
+            assert password_hasher._executor is not None
+    finally:
+        SessionLocal.configure(bind=app_engine)
+    assert password_hasher._executor is None
@@ -0,0 +1,34 @@
+import threading
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from app.utils import metrics
+
+def checkout_wait():
+    # (observations, total seconds) of the pool checkout wait histogram
+    series = metrics.db_pool_checkout_wait._series.get((), [0] * (len(metrics.db_pool_checkout_wait.buckets) + 1) + [0.0])
+    return series[-2], series[-1]
+
+def test_checkout_wait_is_measured_and_survives_pool_recreation(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0)
+    metrics.instrument_engine(engine)
+
+    def wait_for_busy_pool():
+        # Another thread holds the only connection while a session asks for it
+        connection = engine.connect()
+        holder = threading.Thread(target=lambda: (time.sleep(0.2), connection.close()))
+        count, total = checkout_wait()
+        holder.start()
+        with Session(engine) as db:
+            db.execute(text("SELECT 1"))
+            # Further statements reuse the session's connection and add no observation
+            db.execute(text("SELECT 1"))
+        holder.join()
+        new_count, new_total = checkout_wait()
+        assert new_count == count + 1
+        assert new_total - total >= 0.15
+
+    wait_for_busy_pool()
+    engine.dispose()
+    wait_for_busy_pool()
+    engine.dispose()
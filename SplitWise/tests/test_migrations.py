@@ -0,0 +1,98 @@
+"""
+Databases created by earlier releases, before migrations existed, must upgrade in place.
+"""
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from app.migrations import MIGRATIONS, migrate
+
+# The schema create_all produced before groups, debts and the upsert keys existed
+BASELINE_SCHEMA = [
+    "CREATE TABLE users (id INTEGER NOT NULL, name VARCHAR, email VARCHAR, password VARCHAR, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE TABLE expenses (id INTEGER NOT NULL, description VARCHAR, currency VARCHAR, amount FLOAT, "
+    "expense_created_by INTEGER, split_type VARCHAR, created_at DATETIME, is_settled BOOLEAN, PRIMARY KEY (id), "
+    "FOREIGN KEY(expense_created_by) REFERENCES users (id))",
+    "CREATE TABLE balances (id INTEGER NOT NULL, user_id INTEGER, currency VARCHAR, amount FLOAT, PRIMARY KEY (id), "
+    "FOREIGN KEY(user_id) REFERENCES users (id))",
+    "CREATE TABLE expense_splits (id INTEGER NOT NULL, expense_id INTEGER, user_id INTEGER, amount_owed FLOAT, "
+    "is_settled BOOLEAN, PRIMARY KEY (id), FOREIGN KEY(expense_id) REFERENCES expenses (id), "
+    "FOREIGN KEY(user_id) REFERENCES users (id))",
+    # A debts table from before its unique key was declared
+    "CREATE TABLE debts (id INTEGER NOT NULL, user_id INTEGER, other_user_id INTEGER, currency VARCHAR, amount FLOAT, "
+    "PRIMARY KEY (id))",
+]
+
+def baseline_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO users (id, name, email, password) VALUES (1, 'a', 'a@test.example', '-'), (2, 'b', 'b@test.example', '-')"))
+        # Duplicates left behind by the old read-modify-write balance updates
+        connection.execute(text("INSERT INTO balances (user_id, currency, amount) VALUES (1, 'USD', 5), (1, 'USD', 7), (2, 'USD', -12), (1, 'EUR', 3)"))
+        connection.execute(text("INSERT INTO debts (user_id, other_user_id, currency, amount) VALUES (1, 2, 'USD', -4), (1, 2, 'USD', -8)"))
+        # The expense behind them: 1 paid 24 and 2 still owes their half
+        connection.execute(text("INSERT INTO expenses (id, description, currency, amount, expense_created_by, split_type, created_at, is_settled) "
+                                "VALUES (1, 'dinner', 'USD', 24, 1, 'equal', '2024-01-15 12:00:00', 0)"))
+        connection.execute(text("INSERT INTO expense_splits (expense_id, user_id, amount_owed, is_settled) VALUES (1, 1, 12, 0), (1, 2, 12, 0)"))
+    return engine
+
+def unique_keys(engine, table):
+    inspector = inspect(engine)
+    keys = [set(key["column_names"]) for key in inspector.get_unique_constraints(table)]
+    return keys + [set(index["column_names"]) for index in inspector.get_indexes(table) if index["unique"]]
+
+def test_baseline_database_upgrades_in_place():
+    from app.schemas.expense import ExpenseCreate
+    from app.services.expense_service import ExpenseService
+
+    engine = baseline_engine()
+    assert [version for version, _ in migrate(engine)] == [version for version, _, _ in MIGRATIONS]
+
+    assert "group_id" in {column["name"] for column in inspect(engine).get_columns("expenses")}
+    assert "ix_expenses_group_id" in {index["name"] for index in inspect(engine).get_indexes("expenses")}
+    assert {"user_id", "currency"} in unique_keys(engine, "balances")
+    assert {"user_id", "other_user_id", "currency"} in unique_keys(engine, "debts")
+    with engine.connect() as connection:
+        assert sorted(connection.execute(text("SELECT user_id, currency, amount FROM balances")).all()) == [
+            (1, "EUR", 3.0), (1, "USD", 12.0), (2, "USD", -12.0),
+        ]
+        assert connection.execute(text("SELECT user_id, other_user_id, currency, amount FROM debts")).all() == [(1, 2, "USD", -12.0)]
+
+    # The upserts now find their keys
+    with Session(bind=engine) as db:
+        payload = ExpenseCreate(description="dinner", currency="USD", amount=10, split_type="equal",
+                                splits=[{"user_id": 1}, {"user_id": 2}])
+        ExpenseService.create_expense(db, payload, 1)
+        db.commit()
+    with engine.connect() as connection:
+        assert sorted(connection.execute(text("SELECT user_id, currency, amount FROM balances")).all()) == [
+            (1, "EUR", 3.0), (1, "USD", 17.0), (2, "USD", -17.0),
+        ]
+    assert migrate(engine) == []
+
+def test_fresh_database_migrations_are_idempotent(engine):
+    assert migrate(engine) == []
+    assert {"user_id", "currency"} in unique_keys(engine, "balances")
+
+def test_baseline_open_splits_are_backfilled_into_debts():
+    from app.services.expense_service import ExpenseService
+
+    # A database from before the debts table existed
+    engine = baseline_engine()
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE debts"))
+    migrate(engine)
+
+    with Session(bind=engine) as db:
+        assert ExpenseService.get_simplified_debts(db, 2) == [{"from_user_id": 2, "to_user_id": 1, "currency": "USD", "amount": 12.0}]
+        # Settling the pre-existing split clears the debt instead of reversing it
+        ExpenseService.settle_expense(db, 1, 2)
+        db.commit()
+        assert ExpenseService.get_simplified_debts(db, 2) == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT user_id, other_user_id, currency, amount FROM debts")).all() == [(1, 2, "USD", 0.0)]
+        assert sorted(connection.execute(text("SELECT user_id, currency, amount FROM balances")).all()) == [
+            (1, "EUR", 3.0), (1, "USD", 0.0), (2, "USD", 0.0),
+        ]
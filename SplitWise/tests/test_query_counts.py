@@ -0,0 +1,54 @@
+"""
+Guards against N+1 regressions: the statements a request issues must not grow with the
+number of expenses or participants involved.
+"""
+
+def add_expense(client, headers, user_ids, amount=30.0):
+    payload = {"description": "dinner", "currency": "USD", "amount": amount, "split_type": "equal",
+               "splits": [{"user_id": user_id} for user_id in user_ids]}
+    response = client.post("/expenses/add_expense", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def statements_for(client, count_statements, method, url, headers, **kwargs):
+    from app.utils.auth import principal_cache
+
+    # Every measurement resolves the user from the database, not from an earlier request
+    principal_cache.clear()
+    with count_statements() as statements:
+        response = client.request(method, url, headers=headers, **kwargs)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+def test_balance_and_list_statements_do_not_grow_with_history(client, users, count_statements):
+    user_ids, headers = users(4)
+    add_expense(client, headers[0], user_ids)
+    few = {url: statements_for(client, count_statements, "GET", url, headers[1])
+           for url in ("/expenses/get_balance", "/expenses/list_expenses")}
+
+    for _ in range(20):
+        add_expense(client, headers[0], user_ids)
+    many = {url: statements_for(client, count_statements, "GET", url, headers[1])
+            for url in ("/expenses/get_balance", "/expenses/list_expenses")}
+
+    assert many == few
+    assert few["/expenses/get_balance"] <= 4
+    assert few["/expenses/list_expenses"] <= 5
+
+def test_create_and_update_statements_do_not_grow_with_participants(client, users, count_statements):
+    user_ids, headers = users(20)
+    # Resolve the creator once, so both runs hit the principal cache
+    client.get("/expenses/get_balance", headers=headers[0])
+    counts = {}
+    for participants in (2, 20):
+        payload = {"description": "trip", "currency": "USD", "amount": 100.0, "split_type": "equal",
+                   "splits": [{"user_id": user_id} for user_id in user_ids[:participants]]}
+        with count_statements() as created:
+            response = client.post("/expenses/add_expense", json=payload, headers=headers[0])
+        assert response.status_code == 200, response.text
+        with count_statements() as updated:
+            response = client.put(f"/expenses/update_expense/{response.json()['id']}", json={**payload, "amount": 90.0}, headers=headers[0])
+        assert response.status_code == 200, response.text
+        counts[participants] = (len(created), len(updated))
+
+    assert counts[2] == counts[20]
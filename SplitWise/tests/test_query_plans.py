@@ -0,0 +1,63 @@
+"""
+EXPLAIN QUERY PLAN checks for every ExpenseService operation on a seeded database: no
+statement may scan a whole table, and the hot paths must use the indexes built for them.
+"""
+from collections import defaultdict
+import pytest
+from sqlalchemy.orm import Session
+from benchmarks.datagen import seed_database
+from benchmarks.query_plans import explain_operations, unexpected_scan
+from tests.conftest import create_test_engine
+
+# Plan lines each operation must contain at least once
+EXPECTED_PLANS = {
+    "get_user_balance": ["SEARCH balances USING INDEX"],
+    "get_user_balance_as_of": [
+        "USING INDEX ix_balance_checkpoints_user_currency_entry",
+        "USING INDEX ix_balance_entries_user_currency_id",
+    ],
+    "get_user_expense_ids/get_expense_rows": [
+        "SEARCH expense_splits USING COVERING INDEX ix_expense_splits_user_expense",
+        "SEARCH expense_splits USING INDEX ix_expense_splits_expense_settled",
+    ],
+    "user_export_query": ["SEARCH expense_splits USING COVERING INDEX ix_expense_splits_user_expense"],
+    "settle_expense": ["USING INDEX ix_expense_splits_user_expense (user_id=? AND expense_id=?)"],
+    "settle_whole_expense": ["USING COVERING INDEX ix_expense_splits_expense_settled (expense_id=? AND is_settled=?)"],
+    "settle_splits_with_user": ["SEARCH expenses USING COVERING INDEX ix_expenses_created_by"],
+    "settle_all_splits": ["SEARCH expense_splits USING INDEX ix_expense_splits_user_expense"],
+    "get_simplified_debts": ["SEARCH debts USING INDEX ix_debts_other_user"],
+    "get_spending_summary": ["SEARCH spending_rollups USING INDEX"],
+    "project_journal": ["SEARCH balance_journal USING INDEX ix_balance_journal_projected_id"],
+}
+
+@pytest.fixture(scope="module")
+def plans():
+    engine = create_test_engine()
+    try:
+        with Session(bind=engine, expire_on_commit=False) as db:
+            # The data set of benchmarks.query_plans: large enough that the planner prefers indexes
+            user_ids, _ = seed_database(db, users=1000, groups=200, expenses=2000, seed=42)
+            db.connection().exec_driver_sql("ANALYZE")
+            db.commit()
+            explained = list(explain_operations(db, engine, user_ids))
+            db.rollback()
+    finally:
+        engine.dispose()
+    return explained
+
+def test_no_unexpected_full_scans(plans):
+    failures = [
+        (name, scanned, " ".join(statement.split()))
+        for name, statement, parameters, _, scanned in plans
+        if unexpected_scan(name, scanned, parameters)
+    ]
+    assert failures == []
+
+@pytest.mark.parametrize("operation", sorted(EXPECTED_PLANS))
+def test_hot_paths_use_their_indexes(plans, operation):
+    details = defaultdict(list)
+    for name, _, _, plan, _ in plans:
+        details[name].extend(plan)
+    assert details[operation], f"{operation} issued no statements"
+    for expected in EXPECTED_PLANS[operation]:
+        assert any(expected in line for line in details[operation]), (expected, details[operation])
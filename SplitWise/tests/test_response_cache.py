@@ -0,0 +1,79 @@
+import asyncio
+import re
+import sys
+import pytest
+from app.utils.response_cache import CacheBackend, MemoryBackend, RedisBackend, ResponseCache
+
+# Statements that read or write the data behind the cached responses
+DATA_TABLES = re.compile(r'\b(FROM|JOIN|INTO|UPDATE)\s+"?(expenses|expense_splits|balances)\b', re.IGNORECASE)
+
+ENDPOINTS = ["/expenses/get_balance", "/expenses/list_expenses"]
+
+def add_expense(client, headers, user_ids, amount=30.0):
+    payload = {"description": "dinner", "currency": "USD", "amount": amount, "split_type": "equal",
+               "splits": [{"user_id": user_id} for user_id in user_ids]}
+    response = client.post("/expenses/add_expense", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def etags(client, headers):
+    tags = []
+    for url in ENDPOINTS:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.headers["ETag"]
+        tags.append(response.headers["ETag"])
+    return tags
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+def test_matching_etag_gets_a_304_without_reading_the_data(client, users, count_statements, url):
+    (a, b), headers = users(2)
+    add_expense(client, headers[0], [a, b])
+    etag = client.get(url, headers=headers[0]).headers["ETag"]
+
+    with count_statements() as statements:
+        response = client.get(url, headers={**headers[0], "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not [statement for statement in statements if DATA_TABLES.search(statement)]
+
+def test_a_write_by_any_participant_changes_the_etag(client, users):
+    (a, b, c), headers = users(3)
+    expense_id = add_expense(client, headers[0], [a, b])
+    before = etags(client, headers[0])
+    assert etags(client, headers[0]) == before
+
+    # b settling their split of a's expense changes what a sees
+    assert client.post(f"/expenses/settle_expense/{expense_id}", headers=headers[1]).status_code == 200
+    after_settle = etags(client, headers[0])
+    assert all(old != new for old, new in zip(before, after_settle))
+
+    # So does c adding an expense a has a share in
+    add_expense(client, headers[2], [a, c])
+    assert all(old != new for old, new in zip(after_settle, etags(client, headers[0])))
+
+def test_response_caches_share_entries_through_one_backend():
+    backend = MemoryBackend()
+    # Two workers, each with its own local LRU
+    first, second = ResponseCache(backend=backend), ResponseCache(backend=backend)
+
+    async def run():
+        await first.set("get_balance:1:3:", b'[{"amount": 5}]', {"X-Balance-Version": "3"})
+        assert await second.get("get_balance:1:3:") == (b'[{"amount": 5}]', {"X-Balance-Version": "3"})
+        assert await second.get("get_balance:1:4:") is None
+
+    asyncio.run(run())
+
+def test_cache_backends_must_implement_get_and_set():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+def test_redis_url_without_redis_installed_is_a_config_error(monkeypatch):
+    # A None entry in sys.modules makes the import fail as if the package were missing
+    monkeypatch.setitem(sys.modules, "redis", None)
+    with pytest.raises(RuntimeError, match="RESPONSE_CACHE_URL"):
+        RedisBackend.from_url("redis://localhost:6379/0")
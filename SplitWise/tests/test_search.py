@@ -0,0 +1,22 @@
+def test_search_pages_cover_every_match_once_without_writes(client, users):
+    (a, b), headers = users(2)
+    descriptions = ["Uber March", "uber to airport uber", "Uber eats", "Lunch", "Uber", "uber march trip", "Dinner uber"]
+    ids = []
+    for description in descriptions:
+        payload = {"description": description, "currency": "USD", "amount": 10, "split_type": "equal",
+                   "splits": [{"user_id": a}, {"user_id": b}]}
+        response = client.post("/expenses/add_expense", json=payload, headers=headers[0])
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"q": "ube", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/expenses/search", params=params, headers=headers[1])
+        assert response.status_code == 200, response.text
+        seen.extend(expense["id"] for expense in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(expense_id for expense_id, description in zip(ids, descriptions) if "uber" in description.lower())
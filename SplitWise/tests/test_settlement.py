@@ -0,0 +1,85 @@
+"""
+Settling moves a participant's share from the creator's balance to theirs, so balances
+always sum to zero per currency; the creator's own share was never owed and moves nothing.
+"""
+import pytest
+from sqlalchemy import func, select
+from app.models import Balance, BalanceEntry, Debt, SpendingRollup
+from app.services.spending_rollup_service import SpendingRollupService
+
+def add_expense(client, headers, user_ids, amount):
+    payload = {"description": "dinner", "currency": "USD", "amount": amount, "split_type": "equal",
+               "splits": [{"user_id": user_id} for user_id in user_ids]}
+    response = client.post("/expenses/add_expense", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def balances(db):
+    db.expire_all()
+    return dict(db.execute(select(Balance.user_id, Balance.amount).where(Balance.currency == "USD")).all())
+
+def rollups(db):
+    db.expire_all()
+    return sorted(tuple(row) for row in db.execute(select(SpendingRollup.user_id, SpendingRollup.spent, SpendingRollup.paid, SpendingRollup.settled)))
+
+@pytest.mark.parametrize("settle", ["whole_expense", "all", "single"])
+def test_balances_sum_to_zero_after_settling(client, db, users, settle):
+    (a, b, c), headers = users(3)
+    expense_id = add_expense(client, headers[0], [a, b, c], 90)
+    add_expense(client, headers[1], [a, b, c], 30)
+
+    if settle == "whole_expense":
+        responses = [client.post(f"/expenses/settle_whole_expense/{expense_id}", headers=headers[0])]
+    elif settle == "all":
+        # The creator settling everything they owe includes their own split of their expense
+        responses = [client.post("/expenses/settle_all", headers=headers[0])]
+    else:
+        responses = [client.post(f"/expenses/settle_expense/{expense_id}", headers=header) for header in headers]
+    assert all(response.status_code == 200 for response in responses), [response.text for response in responses]
+
+    amounts = balances(db)
+    assert sum(amounts.values()) == pytest.approx(0)
+    if settle == "all":
+        # a paid b back for the second expense; a's own shares move nothing
+        assert amounts == pytest.approx({a: 60, b: -20, c: -40})
+    else:
+        # The first expense is fully settled: only the second one's shares remain owed to b
+        assert amounts == pytest.approx({a: -10, b: 20, c: -10})
+
+    # The incrementally maintained rollups match a rebuild from the splits
+    incremental = rollups(db)
+    SpendingRollupService.rebuild(db)
+    db.flush()
+    assert rollups(db) == pytest.approx(incremental)
+    db.rollback()
+
+def test_bulk_settle_writes_zero_sum_ledger_entries(client, db, users):
+    (a, b, c), headers = users(3)
+    expense_id = add_expense(client, headers[0], [a, b, c], 90)
+    assert client.post(f"/expenses/settle_whole_expense/{expense_id}", headers=headers[0]).status_code == 200
+    assert db.execute(select(func.sum(BalanceEntry.amount))).scalar() == pytest.approx(0)
+
+def test_updating_a_settled_expense_reopens_its_splits(client, db, users):
+    (a, b), headers = users(2)
+    payload = {"description": "dinner", "currency": "USD", "amount": 100, "split_type": "equal",
+               "splits": [{"user_id": a}, {"user_id": b}]}
+    expense_id = client.post("/expenses/add_expense", json=payload, headers=headers[0]).json()["id"]
+    assert client.post(f"/expenses/settle_expense/{expense_id}", headers=headers[1]).status_code == 200
+    assert balances(db) == pytest.approx({a: 0, b: 0})
+
+    # The update reverses the settlement along with the old splits: b owes a their share again
+    response = client.put(f"/expenses/update_expense/{expense_id}", json=payload, headers=headers[0])
+    assert response.status_code == 200, response.text
+    assert balances(db) == pytest.approx({a: 50, b: -50})
+    # Pairs are stored as (lower id, higher id); negative means the higher id owes the lower
+    assert db.execute(select(Debt.amount).where(Debt.user_id == a, Debt.other_user_id == b)).scalar() == pytest.approx(-50)
+
+    assert client.post(f"/expenses/settle_expense/{expense_id}", headers=headers[1]).status_code == 200
+    assert balances(db) == pytest.approx({a: 0, b: 0})
+    assert db.execute(select(Debt.amount).where(Debt.user_id == a, Debt.other_user_id == b)).scalar() == pytest.approx(0)
+
+    incremental = rollups(db)
+    SpendingRollupService.rebuild(db)
+    db.flush()
+    assert rollups(db) == pytest.approx(incremental)
+    db.rollback()
@@ -0,0 +1,96 @@
+"""
+Shares add up to the expense amount exactly in the currency's minor units, and the batch
+path gives the same shares as the per-expense path.
+"""
+import random
+import pytest
+from app.utils.split_strategies import (
+    EqualSplitStrategy, PercentageSplitStrategy, UnequalSplitStrategy, minor_unit_exponent, to_minor,
+)
+
+equal = EqualSplitStrategy()
+percentage = PercentageSplitStrategy()
+unequal = UnequalSplitStrategy()
+
+def total_minor(shares, exponent):
+    return sum(to_minor(share, exponent) for share in shares.values())
+
+@pytest.mark.parametrize("amount, currency, expected", [
+    (100, "USD", {1: 33.34, 2: 33.33, 3: 33.33}),
+    (100, "JPY", {1: 34.0, 2: 33.0, 3: 33.0}),
+    (100, "BHD", {1: 33.334, 2: 33.333, 3: 33.333}),
+    (0.05, "USD", {1: 0.02, 2: 0.02, 3: 0.01}),
+])
+def test_equal_split_gives_leftover_units_to_the_first_participants(amount, currency, expected):
+    exponent = minor_unit_exponent(currency)
+    shares = equal.calculate_splits(amount, [1, 2, 3], exponent=exponent)
+    assert shares == expected
+    assert total_minor(shares, exponent) == to_minor(amount, exponent)
+    assert equal.calculate_many([amount], [[1, 2, 3]], exponent=exponent).to_dicts() == [expected]
+
+@pytest.mark.parametrize("amount, percentages, expected", [
+    # Equal remainders: the earlier participants get the leftover units
+    (0.01, {1: 50, 2: 50}, {1: 0.01, 2: 0.0}),
+    (0.02, {1: 25, 2: 25, 3: 25, 4: 25}, {1: 0.01, 2: 0.01, 3: 0.0, 4: 0.0}),
+    # The largest remainder goes first, then the tie between the others
+    (0.02, {1: 33.3333, 2: 33.3333, 3: 33.3334}, {1: 0.01, 2: 0.0, 3: 0.01}),
+    (100, {1: 33.3333, 2: 33.3333, 3: 33.3334}, {1: 33.33, 2: 33.33, 3: 33.34}),
+])
+def test_percentage_split_uses_the_largest_remainder_with_ties_in_order(amount, percentages, expected):
+    shares = percentage.calculate_splits(amount, list(percentages), percentages)
+    assert shares == expected
+    assert total_minor(shares, 2) == to_minor(amount, 2)
+    assert percentage.calculate_many([amount], [list(percentages)], [percentages]).to_dicts() == [expected]
+
+def test_invalid_rows_do_not_affect_the_rest_of_a_batch():
+    batch = percentage.calculate_many([10, 10, 10], [[1, 2], [1, 2], [1, 2]], [{1: 50, 2: 50}, {1: 60, 2: 50}, {1: 30, 2: 70}])
+    assert batch.to_dicts() == [{1: 5.0, 2: 5.0}, None, {1: 3.0, 2: 7.0}]
+    assert batch.errors == {1: "Total percentage must sum up to 100"}
+
+    batch = unequal.calculate_many([10, 10], [[1, 2], [1, 2]], [{1: 4, 2: 5}, {1: 4, 2: 6}])
+    assert batch.to_dicts() == [None, {1: 4.0, 2: 6.0}]
+    assert batch.errors == {0: "Total split amounts do not sum up to total amount"}
+
+    batch = equal.calculate_many([10, 10], [[], [1, 2, 3]])
+    assert batch.to_dicts() == [None, {1: 3.34, 2: 3.33, 3: 3.33}]
+    assert batch.errors == {0: "Splits must be provided"}
+
+    with pytest.raises(ValueError):
+        percentage.calculate_splits(10, [1, 2], {1: 60, 2: 50})
+    with pytest.raises(ValueError):
+        unequal.calculate_splits(10, [1, 2], {1: 4, 2: 5})
+
+@pytest.mark.parametrize("exponent", [0, 2, 3])
+def test_batch_matches_the_per_expense_path(exponent):
+    rng = random.Random(exponent)
+    amounts, users, percentages, amounts_owed = [], [], [], []
+    for _ in range(500):
+        total = rng.randint(0, 10 ** 6)
+        participants = rng.sample(range(1, 50), rng.randint(1, 8))
+        # Percentages with 4 decimals that sum to exactly 100
+        cuts = sorted(rng.randint(0, 100 * 10 ** 4) for _ in participants[1:])
+        parts = [high - low for low, high in zip([0, *cuts], [*cuts, 100 * 10 ** 4])]
+        # Unequal amounts in minor units, every tenth row off by one unit
+        owed_cuts = sorted(rng.randint(0, total) for _ in participants[1:])
+        owed = [high - low for low, high in zip([0, *owed_cuts], [*owed_cuts, total])]
+        if rng.random() < 0.1:
+            owed[0] += 1
+        amounts.append(total / 10 ** exponent)
+        users.append(participants)
+        percentages.append({user_id: part / 10 ** 4 for user_id, part in zip(participants, parts)})
+        amounts_owed.append({user_id: units / 10 ** exponent for user_id, units in zip(participants, owed)})
+
+    def scalar(strategy, amount, participants, info):
+        try:
+            shares = strategy.calculate_splits(amount, participants, info, exponent=exponent)
+        except ValueError:
+            return None
+        assert total_minor(shares, exponent) == to_minor(amount, exponent)
+        return shares
+
+    for strategy, infos in ((equal, [None] * len(amounts)), (percentage, percentages), (unequal, amounts_owed)):
+        expected = [scalar(strategy, amount, participants, info) for amount, participants, info in zip(amounts, users, infos)]
+        batch = strategy.calculate_many(amounts, users, None if strategy is equal else infos, exponent=exponent)
+        assert batch.to_dicts() == expected
+    # The randomized unequal rows include invalid ones
+    assert None in expected